@@ -4,6 +4,7 @@ HXRSnD IPython Shell
 import logging
 import os  # noqa
 import socket
+import time
 import warnings
 from importlib import reload  # noqa
 from pathlib import Path  # noqa
@@ -13,6 +14,9 @@ warnings.filterwarnings('ignore')
 
 logger = logging.getLogger(__name__)
 
+# Time the session startup
+_t0 = time.time()
+
 try:
     from snd_devices import *  # noqa
 
@@ -36,5 +40,7 @@ else:
         raise
     # Notify the user that everything went smoothly
     else:
-        logger.info("Successfully initialized new SnD session on '{0}'".format(
-            socket.gethostname()))
+        logger.info("Successfully initialized new SnD session on '{0}' in "
+                    "{1:.2f}s".format(socket.gethostname(), time.time()-_t0))
+        logger.debug("Run 'hxrsnd.utils.import_times()' for a breakdown of "
+                     "the import times.")
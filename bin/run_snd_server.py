@@ -0,0 +1,30 @@
+"""
+HXRSnD Server
+
+Creates the SplitAndDelay system once and serves it to the thin clients in
+hxrsnd.server.
+"""
+import warnings
+
+# Ignore python warnings (Remove when ophyd stops warning about 'signal_names')
+warnings.filterwarnings('ignore')
+
+from bluesky import RunEngine  # noqa: E402
+
+from snd_devices import snd  # noqa: E402
+from hxrsnd.plans.preprocessors import pending_returns_preprocessor  # noqa: E402
+from hxrsnd.server import SndServer  # noqa: E402
+
+# Plans requested by the clients are run by the RunEngine of the system, which
+# keeps the returns started without waiting from one plan to the next
+if snd.RE is None:
+    snd.RE = RunEngine({})
+    snd.RE.preprocessors.append(pending_returns_preprocessor())
+
+server = SndServer(snd)
+try:
+    server.serve_forever()
+except KeyboardInterrupt:
+    pass
+finally:
+    server.stop()
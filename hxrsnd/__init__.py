@@ -1,7 +1,26 @@
 from ._version import get_versions
-from .plans.alignment import maximize_lorentz, rocking_curve
 
 __version__ = get_versions()['version']
 del get_versions
 
 __all__ = ['maximize_lorentz', 'rocking_curve']
+
+
+# The alignment plans pull in lmfit and pswalker, so they are only imported
+# once one of the plans is actually run rather than on ``import hxrsnd``
+def maximize_lorentz(*args, **kwargs):
+    """
+    Maximize a signal with a Lorentzian relationship to a motor. See
+    :func:`hxrsnd.plans.alignment.maximize_lorentz`.
+    """
+    from .plans.alignment import maximize_lorentz
+    return (yield from maximize_lorentz(*args, **kwargs))
+
+
+def rocking_curve(*args, **kwargs):
+    """
+    Travel to the maxima of a bell curve. See
+    :func:`hxrsnd.plans.alignment.rocking_curve`.
+    """
+    from .plans.alignment import rocking_curve
+    return (yield from rocking_curve(*args, **kwargs))
@@ -8,6 +8,7 @@ import numpy as np
 from ophyd import Component as Cmp
 from ophyd import FormattedComponent as FrmCmp
 from ophyd.signal import EpicsSignal, EpicsSignalRO, Signal
+from ophyd.status import DeviceStatus
 from ophyd.status import wait as status_wait
 from ophyd.utils import LimitError
 
@@ -20,6 +21,47 @@ from .utils import absolute_submodule_path, as_list, stop_on_keyboardinterrupt
 logger = logging.getLogger(__name__)
 
 
+def _chain_status(device, steps):
+    """
+    Runs each step once the status returned by the previous one finished.
+
+    Parameters
+    ----------
+    device : Device
+        Device the steps are run on.
+
+    steps : list
+        Functions that start a step and return its status object.
+
+    Returns
+    -------
+    status : DeviceStatus
+        Status that finishes after the last step, or fails with the first
+        step that fails.
+    """
+    status = DeviceStatus(device)
+
+    def run(remaining):
+        try:
+            step_status = remaining[0]()
+        except Exception as e:
+            logger.error("Failed to run a step on '{0}'. Got error: {1}"
+                         "".format(device.name, e))
+            status._finished(success=False)
+            return
+
+        def step_done(*args, **kwargs):
+            if not step_status.success:
+                status._finished(success=False)
+            elif len(remaining) > 1:
+                run(remaining[1:])
+            else:
+                status._finished()
+        step_status.add_callback(step_done)
+    run(steps)
+    return status
+
+
 class AeroBase(SndEpicsMotor):
     """
     Base Aerotech motor class.
@@ -340,11 +382,11 @@ class AeroBase(SndEpicsMotor):
             logger.error(err)
             raise MotorStopped(err)
 
-        # Check if the current position is valid
-        self.check_value(self.position)
-        # Check if the move position is valid
-        if position:
-            self.check_value(position)
+        # Check the current and move positions against the limits together
+        if position is not None:
+            self.check_values([self.position, position])
+        else:
+            self.check_values(self.position)
 
     def set_position(self, position_des, print_set=True):
         """
@@ -368,7 +410,7 @@ class AeroBase(SndEpicsMotor):
         log_level("'{0}' New position: {0}, offset: {1}".format(self.position,
                                                                 self.offset))
 
-    def enable(self, ret_status=False, print_set=True):
+    def enable(self, ret_status=False, print_set=True, wait=True):
         """
         Enables the motor power.
 
@@ -380,6 +422,9 @@ class AeroBase(SndEpicsMotor):
         print_set : bool, optional
             Print a short statement about the set.
 
+        wait : bool, optional
+            Wait for the set to complete.
+
         Returns
         -------
         Status
@@ -387,9 +432,10 @@ class AeroBase(SndEpicsMotor):
         """
         status = self.power.set(1, timeout=self.set_timeout)
         return self._status_print(status, "Enabled motor '{0}'.".format(
-            self.desc), print_set=print_set, ret_status=ret_status)
+            self.desc), print_set=print_set, ret_status=ret_status,
+            wait=wait)
 
-    def disable(self, ret_status=False, print_set=True):
+    def disable(self, ret_status=False, print_set=True, wait=True):
         """
         Disables the motor power.
 
@@ -401,6 +447,9 @@ class AeroBase(SndEpicsMotor):
         print_set : bool, optional
             Print a short statement about the set.
 
+        wait : bool, optional
+            Wait for the set to complete.
+
         Returns
         -------
         Status
@@ -408,7 +457,8 @@ class AeroBase(SndEpicsMotor):
         """
         status = self.power.set(0, timeout=self.set_timeout)
         return self._status_print(status, "Disabled motor '{0}'.".format(
-            self.desc), print_set=print_set, ret_status=ret_status)
+            self.desc), print_set=print_set, ret_status=ret_status,
+            wait=wait)
 
     @property
     def enabled(self):
@@ -422,7 +472,7 @@ class AeroBase(SndEpicsMotor):
         """
         return bool(self.power.get())
 
-    def clear(self, ret_status=False, print_set=True):
+    def clear(self, ret_status=False, print_set=True, wait=True):
         """
         Clears the motor error.
 
@@ -434,6 +484,9 @@ class AeroBase(SndEpicsMotor):
         print_set : bool, optional
             Print a short statement about the set.
 
+        wait : bool, optional
+            Wait for the set to complete.
+
         Returns
         -------
         Status
@@ -441,7 +494,8 @@ class AeroBase(SndEpicsMotor):
         """
         status = self.clear_error.set(1, timeout=self.set_timeout)
         return self._status_print(status, "Cleared motor '{0}'.".format(
-            self.desc), print_set=print_set, ret_status=ret_status)
+            self.desc), print_set=print_set, ret_status=ret_status,
+            wait=wait)
 
     def reconfig(self, ret_status=False, print_set=True):
         """
@@ -542,7 +596,7 @@ class AeroBase(SndEpicsMotor):
             logger.info("State must be one of the following: {0}".format(
                 self._state_list))
 
-    def set_state(self, state, ret_status=True, print_set=False):
+    def set_state(self, state, ret_status=True, print_set=False, wait=True):
         """
         Sets the state of the motor. Inputted state can be one of the following
         states or the index of the desired state:
@@ -558,6 +612,9 @@ class AeroBase(SndEpicsMotor):
         print_set : bool, optional
             Print a short statement about the set.
 
+        wait : bool, optional
+            Wait for the set to complete.
+
         Returns
         -------
         Status
@@ -579,9 +636,9 @@ class AeroBase(SndEpicsMotor):
 
         return self._status_print(
             status, "Changed state of '{0} to '{1}'.".format(self.desc, val),
-            print_set=print_set, ret_status=ret_status)
+            print_set=print_set, ret_status=ret_status, wait=wait)
 
-    def ready_motor(self, ret_status=False, print_set=True):
+    def ready_motor(self, ret_status=False, print_set=True, wait=True):
         """
         Sets the motor to the ready state by clearing any errors, enabling it,
         and setting the state to be 'Go'.
@@ -594,17 +651,54 @@ class AeroBase(SndEpicsMotor):
         print_set : bool, optional
             Print a short statement about the set.
 
+        wait : bool, optional
+            Wait for the set to complete.
+
         Returns
         -------
         Status
             The status object for all the sets.
         """
-        status = [self.clear(ret_status=True, print_set=False)]
-        status.append(self.enable(ret_status=True, print_set=False))
-        status.append(self.set_state("Go", ret_status=True, print_set=False))
+        # Each step is only sent once the previous one finished, so many
+        # motors can be readied in parallel without waiting on any of them
+        steps = [lambda: self.clear(ret_status=True, print_set=False,
+                                    wait=False),
+                 lambda: self.enable(ret_status=True, print_set=False,
+                                     wait=False),
+                 lambda: self.set_state("Go", ret_status=True,
+                                        print_set=False, wait=False)]
+        status = _chain_status(self, steps)
         return self._status_print(
             status, "Motor '{0}' is now ready to move.".format(self.desc),
-            print_set=print_set, ret_status=ret_status)
+            print_set=print_set, ret_status=ret_status, wait=wait)
+
+    def stop(self, success=False, ret_status=False, print_set=True):
+        """
+        Stops the motor, finishing the move in progress without waiting for
+        the motor to settle.
+
+        Parameters
+        ----------
+        success : bool, optional
+            Consider the stopped move a success.
+
+        ret_status : bool, optional
+            Return the status object of the stop.
+
+        print_set : bool, optional
+            Print a short statement about the stop.
+
+        Returns
+        -------
+        Status : StatusObject
+            Status that finishes when the controller confirms the stop.
+        """
+        status = self._send_stop()
+        self._run_subs(sub_type=self._SUB_REQ_DONE, success=success)
+        self._reset_sub(self._SUB_REQ_DONE)
+        return self._status_print(status, "Stopped motor '{0}'".format(
+            self.desc), ret_status=ret_status, print_set=print_set,
+            wait=False)
 
     def expert_screen(self, print_msg=True):
         """
@@ -677,7 +771,7 @@ class AeroBase(SndEpicsMotor):
 class InterlockedAero(AeroBase):
     """
     Linear Aerotech stage that has the additional move check for the pressure
-    status.
+    status, and that stops itself if the pressure goes bad during a move.
     """
     # To do the internel pressure check
     _pressure = FrmCmp(PressureSwitch, "{self._prefix}:N2:{self._tower}")
@@ -686,6 +780,18 @@ class InterlockedAero(AeroBase):
         self._tower = prefix.split(":")[-2]
         self._prefix = ":".join(prefix.split(":")[:2])
         super().__init__(prefix, *args, **kwargs)
+        # Watch the pressure continuously rather than only before moves
+        self._pressure.pressure.subscribe(self._pressure_changed, run=False)
+
+    def _pressure_changed(self, value=None, **kwargs):
+        """
+        Stops the stage as soon as the pressure in its tower goes bad while it
+        is moving.
+        """
+        if self._pressure._states.get(value) == "BAD" and self._moving:
+            logger.error("Pressure in {0} went bad while '{1}' was moving. "
+                         "Stopping the motor.".format(self._tower, self.desc))
+            self.stop()
 
     def check_status(self, *args, **kwargs):
         """
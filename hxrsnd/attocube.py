@@ -3,11 +3,13 @@ Attocube devices
 """
 import logging
 import os
+import threading
 
 import numpy as np
 from ophyd import Component as Cmp
 from ophyd import PositionerBase
 from ophyd.signal import EpicsSignal, EpicsSignalRO
+from ophyd.status import MoveStatus
 from ophyd.status import wait as status_wait
 from ophyd.utils import LimitError
 
@@ -60,6 +62,7 @@ class EccBase(SndMotor, PositionerBase):
         'error',
         'expert_screen',
         'high_limit',
+        'in_range_dwell',
         'limits',
         'low_limit',
         'move',
@@ -71,6 +74,7 @@ class EccBase(SndMotor, PositionerBase):
         'set_limits',
         'status',
         'stop',
+        'target_tolerance',
     ]
 
     # position
@@ -103,6 +107,29 @@ class EccBase(SndMotor, PositionerBase):
     motor_reset = Cmp(EpicsSignal, ":CMD:RESET.PROC")
     motor_enable = Cmp(EpicsSignal, ":CMD:ENABLE")
 
+    # Seconds the motor has to stay stopped and in range before a move is done
+    in_range_dwell = 0.1
+    # Distance from the target within which a move that never reported any
+    # motion counts as arrived, e.g. a move to the current position
+    target_tolerance = 1e-3
+
+    def __init__(self, prefix, name=None, *args, in_range_dwell=None,
+                 **kwargs):
+        super().__init__(prefix, name=name, *args, **kwargs)
+        if in_range_dwell is not None:
+            self.in_range_dwell = in_range_dwell
+        self._move_lock = threading.RLock()
+        self._motion_subscribed = False
+        self._move_pending = False
+        self._target_sent = False
+        self._target = None
+        self._motion_seen = False
+        self._is_moving = False
+        self._in_range = False
+        self._dwell_timer = None
+        self._limits = None
+        self._limits_subscribed = False
+
     @property
     def position(self):
         """
@@ -193,7 +220,7 @@ class EccBase(SndMotor, PositionerBase):
             if reraise:
                 raise
 
-    def enable(self, ret_status=False, print_set=True):
+    def enable(self, ret_status=False, print_set=True, wait=True):
         """
         Enables the motor power.
 
@@ -205,6 +232,9 @@ class EccBase(SndMotor, PositionerBase):
         print_set : bool, optional
             Print a short statement about the set.
 
+        wait : bool, optional
+            Wait for the set to complete.
+
         Returns
         -------
         Status
@@ -212,9 +242,9 @@ class EccBase(SndMotor, PositionerBase):
         """
         status = self.motor_enable.set(1, timeout=self.set_timeout)
         return self._status_print(status, "Enabled motor '{0}'".format(
-            self.desc), ret_status=ret_status, print_set=print_set)
+            self.desc), ret_status=ret_status, print_set=print_set, wait=wait)
 
-    def disable(self, ret_status=False, print_set=True):
+    def disable(self, ret_status=False, print_set=True, wait=True):
         """
         Disables the motor power.
 
@@ -226,6 +256,9 @@ class EccBase(SndMotor, PositionerBase):
         print_set : bool, optional
             Print a short statement about the set.
 
+        wait : bool, optional
+            Wait for the set to complete.
+
         Returns
         -------
         Status
@@ -233,7 +266,7 @@ class EccBase(SndMotor, PositionerBase):
         """
         status = self.motor_enable.set(0, timeout=self.set_timeout)
         return self._status_print(status, "Disabled motor '{0}'".format(
-            self.desc), ret_status=ret_status, print_set=print_set)
+            self.desc), ret_status=ret_status, print_set=print_set, wait=wait)
 
     @property
     def enabled(self):
@@ -300,6 +333,12 @@ class EccBase(SndMotor, PositionerBase):
         """
         Move to a specified position.
 
+        The returned status completes once the controller has the new target
+        and the motor has been stopped and in range for ``in_range_dwell``
+        seconds. The dwell restarts whenever the motor moves or leaves the
+        range, so it also covers the moving and in range flags taking a moment
+        to update after the target changes.
+
         Parameters
         ----------
         position
@@ -308,6 +347,9 @@ class EccBase(SndMotor, PositionerBase):
         check_status : bool, optional
             Check if the motors are in a valid state to move.
 
+        timeout : float, optional
+            Maximum time to wait for the motion.
+
         Returns
         -------
         status : MoveStatus
@@ -328,8 +370,139 @@ class EccBase(SndMotor, PositionerBase):
         if check_status:
             self.check_status(position)
         logger.debug("Moving {0} to {1}".format(self.name, position))
+        self._subscribe_motion()
+
+        # Fail any move still in progress and start tracking the new one
+        with self._move_lock:
+            self._cancel_dwell()
+            self._move_pending = False
+        self._run_subs(sub_type=self._SUB_REQ_DONE, success=False)
+        self._reset_sub(self._SUB_REQ_DONE)
+        status = MoveStatus(self, position, settle_time=self._settle_time,
+                            timeout=timeout if timeout is not None
+                            else self._timeout)
+        self.subscribe(status._finished, event_type=self._SUB_REQ_DONE,
+                       run=False)
+        with self._move_lock:
+            self._move_pending = True
+            self._target_sent = False
+            self._target = position
+            self._motion_seen = False
+
         # Begin the move process
-        return self.user_setpoint.set(position, timeout=timeout)
+        put_status = self.user_setpoint.set(position, timeout=timeout)
+        put_status.add_callback(self._target_acknowledged)
+        return status
+
+    def _subscribe_motion(self):
+        """
+        Starts monitoring the moving and in range signals. Only done on the
+        first move, so motors that are never moved don't open the monitors.
+        """
+        if self._motion_subscribed:
+            return
+        self._motion_subscribed = True
+        self.motor_is_moving.subscribe(self._moving_changed)
+        self.motor_done_move.subscribe(self._in_range_changed)
+
+    def _subscribe_limits(self):
+        """
+        Starts monitoring the limit fields so the cached limits are cleared
+        when they change. Only done the first time the limits are read.
+        """
+        if self._limits_subscribed:
+            return
+        self._limits_subscribed = True
+        self.upper_ctrl_limit.subscribe(self._limits_changed, run=False)
+        self.lower_ctrl_limit.subscribe(self._limits_changed, run=False)
+
+    def _limits_changed(self, **kwargs):
+        self._limits = None
+
+    def _moving_changed(self, value=None, **kwargs):
+        with self._move_lock:
+            self._is_moving = bool(value)
+            if self._is_moving:
+                self._motion_seen = True
+            self._check_move_done()
+
+    def _in_range_changed(self, value=None, **kwargs):
+        with self._move_lock:
+            self._in_range = bool(value)
+            if not self._in_range:
+                self._motion_seen = True
+            self._check_move_done()
+
+    def _at_target(self):
+        """
+        Returns whether the readback agrees with the target of the move.
+        """
+        try:
+            return abs(self.position - self._target) <= self.target_tolerance
+        except TypeError:
+            return False
+
+    def _target_acknowledged(self, status=None, **kwargs):
+        if status is not None and not status.success:
+            logger.error("Failed to send the target of motor '{0}'.".format(
+                self.desc))
+            with self._move_lock:
+                self._move_pending = False
+            self._done_moving(success=False)
+            return
+        with self._move_lock:
+            self._target_sent = True
+            self._check_move_done()
+
+    def _check_move_done(self):
+        """
+        Starts the in range dwell once the target was sent and the motor is
+        stopped in range, and cancels it if the motor moves or leaves the range
+        before the dwell is over. Must be called with the move lock held.
+
+        The flags can still describe the previous target when the new one is
+        sent, so the motor only counts as settled once it reported motion
+        since the move began, or if its readback already agrees with the
+        target.
+        """
+        if not self._move_pending:
+            return
+        settled = (self._target_sent and self._in_range and
+                   not self._is_moving and
+                   (self._motion_seen or self._at_target()))
+        if settled and self._dwell_timer is None:
+            self._dwell_timer = threading.Timer(self.in_range_dwell,
+                                                self._dwell_finished)
+            self._dwell_timer.daemon = True
+            self._dwell_timer.start()
+        elif not settled:
+            self._cancel_dwell()
+
+    def _cancel_dwell(self):
+        if self._dwell_timer is not None:
+            self._dwell_timer.cancel()
+            self._dwell_timer = None
+
+    def _abort_move(self, success=False):
+        """
+        Finishes the move in progress without waiting for the motor to arrive.
+        """
+        with self._move_lock:
+            self._cancel_dwell()
+            pending, self._move_pending = self._move_pending, False
+        # Device.stop does not reach PositionerBase, so finish the move here
+        if pending:
+            self._done_moving(success=success)
+
+    def _dwell_finished(self):
+        with self._move_lock:
+            if not self._move_pending or self._dwell_timer is None:
+                return
+            self._dwell_timer = None
+            self._move_pending = False
+        logger.debug("Motor '{0}' arrived at {1}.".format(
+            self.desc, self.position))
+        self._done_moving(success=True)
 
     def mv(self, position, print_move=True, wait=None,
            *args, **kwargs):
@@ -415,11 +588,11 @@ class EccBase(SndMotor, PositionerBase):
             logger.error(err)
             raise MotorError(err)
 
-        # Check if the current position is valid
-        self.check_value(self.position)
-        # Check if the move position is valid
-        if position:
-            self.check_value(position)
+        # Check the current and move positions against the limits together
+        if position is not None:
+            self.check_values([self.position, position])
+        else:
+            self.check_values(self.position)
 
     def check_value(self, position):
         """
@@ -442,10 +615,11 @@ class EccBase(SndMotor, PositionerBase):
             raise ValueError("Invalid value inputted: '{0}'".format(position))
 
         # Check if it is within the soft limits
-        if not (self.low_limit <= position <= self.high_limit):
+        low_limit, high_limit = self.limits
+        if not (low_limit <= position <= high_limit):
             err_str = (
                 "Requested value {0} outside of range: [{1}, {2}]"
-                "".format(position, self.low_limit, self.high_limit)
+                "".format(position, low_limit, high_limit)
             )
             logger.warn(err_str)
             raise LimitError(err_str)
@@ -465,12 +639,14 @@ class EccBase(SndMotor, PositionerBase):
         Returns
         -------
         Status : StatusObject
-            Status of the set.
+            Status that finishes when the controller confirms the stop.
         """
-        status = self.motor_stop.set(1, wait=False, timeout=self.set_timeout)
+        status = self._send_stop()
         super().stop(success=success)
+        self._abort_move(success=success)
         return self._status_print(status, "Stopped motor '{0}'".format(
-            self.desc), ret_status=ret_status, print_set=print_set)
+            self.desc), ret_status=ret_status, print_set=print_set,
+            wait=False)
 
     def expert_screen(self, print_msg=True):
         """
@@ -511,7 +687,7 @@ class EccBase(SndMotor, PositionerBase):
         -------
         high_limit : float
         """
-        return self.upper_ctrl_limit.get()
+        return self.limits[1]
 
     @high_limit.setter
     def high_limit(self, value):
@@ -519,6 +695,7 @@ class EccBase(SndMotor, PositionerBase):
         Sets the high limit for user setpoint.
         """
         self.upper_ctrl_limit.put(value)
+        self._limits = None
 
     @property
     def low_limit(self):
@@ -529,7 +706,7 @@ class EccBase(SndMotor, PositionerBase):
         -------
         low_limit : float
         """
-        return self.lower_ctrl_limit.get()
+        return self.limits[0]
 
     @low_limit.setter
     def low_limit(self, value):
@@ -537,17 +714,27 @@ class EccBase(SndMotor, PositionerBase):
         Sets the high limit for user setpoint.
         """
         self.lower_ctrl_limit.put(value)
+        self._limits = None
 
     @property
     def limits(self):
         """
         Returns the limits of the motor.
 
+        The limits are read once and cached, and monitors on the limit fields
+        clear the cache whenever either of them changes.
+
         Returns
         -------
         limits : tuple
         """
-        return (self.low_limit, self.high_limit)
+        limits = self._limits
+        if limits is None:
+            self._subscribe_limits()
+            limits = (self.lower_ctrl_limit.get(),
+                      self.upper_ctrl_limit.get())
+            self._limits = limits
+        return limits
 
     @limits.setter
     def limits(self, value):
@@ -0,0 +1,347 @@
+"""
+Buffers for keeping recent samples of signals.
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class RingBuffer:
+    """
+    Fixed size buffer that keeps the most recent samples and their timestamps
+    in preallocated numpy arrays. Appending a sample never allocates, and once
+    the buffer is full the oldest sample is overwritten.
+
+    Parameters
+    ----------
+    size : int
+        Maximum number of samples to keep.
+
+    shape : tuple, optional
+        Shape of each sample. Defaults to scalar samples.
+    """
+    def __init__(self, size, shape=()):
+        if size < 1:
+            raise ValueError("Buffer size must be at least 1, got {0}."
+                             "".format(size))
+        self.size = int(size)
+        self.shape = tuple(shape)
+        self._lock = threading.RLock()
+        self._data = np.full((self.size,) + self.shape, np.nan)
+        self._timestamps = np.full(self.size, np.nan)
+        self._index = 0
+        self._count = 0
+        self._total = 0
+        self._callbacks = []
+
+    def append(self, value, timestamp=None):
+        """
+        Adds a sample to the buffer, overwriting the oldest sample if the
+        buffer is full.
+
+        Parameters
+        ----------
+        value : float or np.ndarray
+            Sample to add. Must have the shape of the buffer.
+
+        timestamp : float, optional
+            Time of the sample. Uses the current time if None.
+        """
+        with self._lock:
+            self._store(value, timestamp)
+            callbacks, self._callbacks = self._callbacks, []
+        # Run the callbacks outside of the lock so they can read the buffer
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error("Buffer callback %r failed with error: %s",
+                             callback, e)
+
+    def _store(self, value, timestamp):
+        """
+        Writes a sample into the arrays. Must be called with the lock held.
+        """
+        self._data[self._index] = value
+        self._timestamps[self._index] = (time.time() if timestamp is None
+                                         else timestamp)
+        self._index = (self._index + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+        self._total += 1
+
+    def call_on_next(self, callback):
+        """
+        Calls a function once, after the next sample is added to the buffer.
+
+        Parameters
+        ----------
+        callback : callable
+            Function that takes no arguments. It is called from the thread
+            that adds the sample.
+        """
+        with self._lock:
+            self._callbacks.append(callback)
+
+    @property
+    def total(self):
+        """
+        Returns the number of samples ever added to the buffer. Unlike the
+        length, this keeps counting once the buffer is full and is not reset
+        by ``clear``, so the difference between two totals is the number of
+        samples that arrived in between.
+        """
+        return self._total
+
+    def clear(self):
+        """
+        Removes all the samples from the buffer.
+        """
+        with self._lock:
+            self._index = 0
+            self._count = 0
+
+    def _indices(self, num=None):
+        """
+        Returns the indices of the last num samples in chronological order.
+        """
+        num = self._count if num is None else min(int(num), self._count)
+        return (np.arange(self._index - num, self._index)) % self.size
+
+    def last(self, num=None):
+        """
+        Returns the most recent samples and their timestamps in chronological
+        order.
+
+        Parameters
+        ----------
+        num : int, optional
+            Number of samples to return. Returns every sample if None.
+
+        Returns
+        -------
+        data : np.ndarray
+            Array of shape (num,) + shape with the samples.
+
+        timestamps : np.ndarray
+            Array of shape (num,) with the time of each sample.
+        """
+        with self._lock:
+            idx = self._indices(num)
+            return self._data[idx], self._timestamps[idx]
+
+    @property
+    def data(self):
+        """
+        Returns all the samples in the buffer in chronological order.
+        """
+        return self.last()[0]
+
+    @property
+    def timestamps(self):
+        """
+        Returns the timestamps of all the samples in chronological order.
+        """
+        return self.last()[1]
+
+    @property
+    def full(self):
+        """
+        Returns if the buffer has been completely filled.
+        """
+        return self._count == self.size
+
+    def __len__(self):
+        return self._count
+
+
+class SignalBuffer(RingBuffer):
+    """
+    Ring buffer filled by the monitor updates of a scalar signal.
+
+    Running sums of the buffered values are kept as the shots arrive, so the
+    mean and variance of the whole buffer cost the same regardless of its
+    size. Statistics over a subset of the shots copy the shots they select
+    and cost time in proportion to them: the last ``num`` shots only copy
+    those, while a ``since`` window searches the whole buffer. Filters are
+    called once on all the selected shots when they accept arrays, such as
+    ``lambda x: x > 0``, and once per shot otherwise.
+
+    Parameters
+    ----------
+    signal : :class:`ophyd.Signal`
+        Signal to buffer.
+
+    size : int, optional
+        Maximum number of shots to keep.
+
+    start : bool, optional
+        Start buffering the signal right away.
+    """
+    def __init__(self, signal, size=1200, start=True):
+        super().__init__(size)
+        self.signal = signal
+        self._sum = 0.
+        self._sum_sq = 0.
+        self._cid = None
+        if start:
+            self.start()
+
+    def _value_changed(self, *args, value=None, timestamp=None, **kwargs):
+        """
+        Subscription callback that adds each new value to the buffer.
+        """
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            logger.debug("Skipping non-numeric value %r of %s", value,
+                         self.signal.name)
+            return
+        self.append(value, timestamp=timestamp)
+
+    def _store(self, value, timestamp):
+        """
+        Writes a shot into the arrays and updates the running sums.
+        """
+        # Take the shot being overwritten out of the sums
+        if self.full:
+            old = self._data[self._index]
+            self._sum -= old
+            self._sum_sq -= old**2
+        super()._store(value, timestamp)
+        self._sum += value
+        self._sum_sq += value**2
+        # Resum once per pass through the buffer so rounding errors from the
+        # running sums cannot accumulate
+        if self._index == 0:
+            self._sum = float(np.sum(self._data))
+            self._sum_sq = float(np.sum(self._data**2))
+
+    def clear(self):
+        """
+        Removes all the shots from the buffer.
+        """
+        with self._lock:
+            super().clear()
+            self._data[:] = np.nan
+            self._sum = 0.
+            self._sum_sq = 0.
+
+    def start(self):
+        """
+        Starts buffering the monitor updates of the signal.
+        """
+        if self._cid is None:
+            self._cid = self.signal.subscribe(self._value_changed, run=False)
+
+    def stop(self):
+        """
+        Stops buffering the monitor updates of the signal.
+        """
+        if self._cid is not None:
+            self.signal.unsubscribe(self._cid)
+            self._cid = None
+
+    def _select(self, num=None, filt=None, since=None):
+        """
+        Returns the buffered values that match the inputted selection.
+        """
+        # Only copy the last num shots unless a time window needs the rest
+        data, timestamps = self.last(num if since is None else None)
+        if since is not None:
+            data = data[timestamps >= since]
+            if num is not None:
+                data = data[len(data)-min(int(num), len(data)):]
+        if filt is not None:
+            data = data[_filter_mask(filt, data)]
+        return data
+
+    def count(self, num=None, filt=None, since=None):
+        """
+        Returns the number of buffered shots that match the selection.
+
+        Parameters
+        ----------
+        num : int, optional
+            Only use the last num shots.
+
+        filt : callable, optional
+            Single input function that evaluates to True for the shots to use.
+
+        since : float, optional
+            Only use the shots with timestamps at or after this time. The
+            timestamps come from the signal, which for EPICS signals is the
+            clock of the IOC rather than the local one.
+
+        Returns
+        -------
+        count : int
+            Number of shots.
+        """
+        if num is None and filt is None and since is None:
+            return len(self)
+        return len(self._select(num=num, filt=filt, since=since))
+
+    def mean(self, num=None, filt=None, since=None):
+        """
+        Returns the mean of the buffered shots. See ``count`` for the
+        selection parameters.
+
+        Returns
+        -------
+        mean : float
+            Mean of the selected shots, nan if no shots are selected.
+        """
+        if num is None and filt is None and since is None:
+            with self._lock:
+                return self._sum / self._count if self._count else np.nan
+        data = self._select(num=num, filt=filt, since=since)
+        return float(np.mean(data)) if len(data) else np.nan
+
+    def var(self, num=None, filt=None, since=None):
+        """
+        Returns the population variance of the buffered shots. See ``count``
+        for the selection parameters.
+
+        Returns
+        -------
+        var : float
+            Variance of the selected shots, nan if no shots are selected.
+        """
+        if num is None and filt is None and since is None:
+            with self._lock:
+                if not self._count:
+                    return np.nan
+                mean = self._sum / self._count
+                return max(self._sum_sq / self._count - mean**2, 0.)
+        data = self._select(num=num, filt=filt, since=since)
+        return float(np.var(data)) if len(data) else np.nan
+
+    def std(self, num=None, filt=None, since=None):
+        """
+        Returns the standard deviation of the buffered shots. See ``count``
+        for the selection parameters.
+
+        Returns
+        -------
+        std : float
+            Standard deviation of the selected shots.
+        """
+        return float(np.sqrt(self.var(num=num, filt=filt, since=since)))
+
+
+def _filter_mask(filt, data):
+    """
+    Evaluates a filter on every value at once if it accepts arrays, and value
+    by value otherwise.
+    """
+    try:
+        mask = np.asarray(filt(data))
+    except Exception:
+        mask = None
+    if mask is None or mask.dtype != bool or mask.shape != data.shape:
+        mask = np.array([bool(filt(val)) for val in data], dtype=bool)
+    return mask
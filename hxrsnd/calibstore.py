@@ -0,0 +1,314 @@
+"""
+On-disk store for motor calibrations.
+
+Each calibration is saved as a numbered version in its own directory. The
+numeric tables are saved as ``.npy`` files so they can be memory-mapped on
+load, and everything else goes into a small json metadata file::
+
+    <root>/<motor name>/v0001/meta.json
+    <root>/<motor name>/v0001/calib.npy
+    <root>/<motor name>/v0001/calib_index.npy
+    <root>/<motor name>/v0001/scan.npy
+    <root>/<motor name>/v0001/scan_index.npy
+
+Versions are never overwritten. Saving a new calibration adds the next
+version, so older calibrations can always be reloaded.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CALIB_DIR = os.path.join(os.path.expanduser("~"), ".hxrsnd",
+                                 "calibrations")
+
+# Bumped whenever the on-disk layout changes
+FORMAT_VERSION = 1
+
+
+class CalibrationStore:
+    """
+    Versioned on-disk store of calibrations keyed by motor name.
+
+    Parameters
+    ----------
+    root : str, optional
+        Directory holding the calibrations. Defaults to
+        ``~/.hxrsnd/calibrations``.
+    """
+    def __init__(self, root=None):
+        self.root = root or DEFAULT_CALIB_DIR
+
+    def _motor_dir(self, name):
+        return os.path.join(self.root, name)
+
+    def _version_dir(self, name, version):
+        return os.path.join(self._motor_dir(name), "v{0:04d}".format(version))
+
+    def versions(self, name):
+        """
+        Returns the saved versions of the calibration for a motor.
+
+        Parameters
+        ----------
+        name : str
+            Name of the motor.
+
+        Returns
+        -------
+        versions : list
+            Sorted list of the saved version numbers.
+        """
+        try:
+            entries = os.listdir(self._motor_dir(name))
+        except FileNotFoundError:
+            return []
+        versions = []
+        for entry in entries:
+            if entry.startswith("v") and entry[1:].isdigit():
+                versions.append(int(entry[1:]))
+        return sorted(versions)
+
+    def save(self, name, calib, motors, axes=None, model=None, scan=None,
+             scale=None, start=None, timestamps=None):
+        """
+        Saves a calibration as the next version for the motor.
+
+        Parameters
+        ----------
+        name : str
+            Name of the motor.
+
+        calib : pd.DataFrame
+            Correction table.
+
+        motors : list
+            Calibration motors or their names.
+
+        axes : list, optional
+            Extra grid axes of an N-D correction table, or their names.
+
+        model : object, optional
+            Model fit to the correction table. Only the type and parameters of
+            the model are saved, it is refit when the calibration is loaded.
+
+        scan : pd.DataFrame, optional
+            Dataframe of the centroid scan used to compute the correction table
+
+        scale : list, optional
+            List of scales in the units of motor egu / detector value
+
+        start : list, optional
+            List of the initial positions of the motors before the walk
+
+        timestamps : dict, optional
+            Times each of the calibration parameters were configured.
+
+        Returns
+        -------
+        version : int
+            Version number the calibration was saved as.
+
+        Raises
+        ------
+        TypeError
+            If a column or the index of the tables is not numeric.
+        """
+        os.makedirs(self._motor_dir(name), exist_ok=True)
+        meta = {
+            "format": FORMAT_VERSION,
+            "name": name,
+            "timestamp": time.time(),
+            "motors": [getattr(mot, "name", mot) for mot in motors],
+            "axes": [getattr(ax, "name", ax) for ax in axes or []],
+            "model": (None if model is None else
+                      {"type": type(model).__name__, "params": model.params}),
+            "scale": _to_list(scale),
+            "start": _to_list(start),
+            "timestamps": dict(timestamps or {}),
+            "tables": {},
+        }
+
+        # Write everything into a temporary directory and rename it into
+        # place, so a partially written version is never visible
+        tmp_dir = tempfile.mkdtemp(dir=self._motor_dir(name), prefix=".tmp")
+        try:
+            for key, df in (("calib", calib), ("scan", scan)):
+                if df is None:
+                    continue
+                dtypes = _numeric_dtypes(key, df)
+                np.save(os.path.join(tmp_dir, key + ".npy"),
+                        df.to_numpy(dtype=float))
+                np.save(os.path.join(tmp_dir, key + "_index.npy"),
+                        np.asarray(df.index, dtype=float))
+                meta["tables"][key] = {"columns": [str(col) for col in
+                                                   df.columns],
+                                       "dtypes": dtypes[:-1],
+                                       "index_dtype": dtypes[-1]}
+            version = self._rename_into_place(name, tmp_dir, meta)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        logger.info("Saved calibration for '{0}' as version {1} in {2}."
+                    "".format(name, version, self._motor_dir(name)))
+        return version
+
+    def _rename_into_place(self, name, tmp_dir, meta):
+        """
+        Moves a written temporary directory to the next free version.
+        """
+        while True:
+            versions = self.versions(name)
+            version = versions[-1] + 1 if versions else 1
+            meta["version"] = version
+            with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+                json.dump(meta, f, indent=2)
+            try:
+                os.rename(tmp_dir, self._version_dir(name, version))
+                return version
+            except OSError:
+                # Another session saved this version first, try the next one
+                if not os.path.isdir(self._version_dir(name, version)):
+                    raise
+
+    def metadata(self, name, version=None):
+        """
+        Returns the metadata of a saved calibration without touching its
+        tables.
+
+        Parameters
+        ----------
+        name : str
+            Name of the motor.
+
+        version : int, optional
+            Version to read. Defaults to the latest version.
+
+        Returns
+        -------
+        meta : dict
+            Metadata of the calibration.
+        """
+        version = self._resolve_version(name, version)
+        with open(os.path.join(self._version_dir(name, version),
+                               "meta.json")) as f:
+            return json.load(f)
+
+    def load(self, name, version=None, mmap=True):
+        """
+        Loads a saved calibration.
+
+        The tables are memory-mapped by default, so loading costs the same
+        regardless of the scan size and only the rows that get used are read
+        from disk. Memory-mapped tables are read-only.
+
+        Parameters
+        ----------
+        name : str
+            Name of the motor.
+
+        version : int, optional
+            Version to load. Defaults to the latest version.
+
+        mmap : bool, optional
+            Memory-map the tables instead of reading them into memory.
+
+        Returns
+        -------
+        calibration : dict
+            Dictionary with the calib, scan, motors, axes, model, scale,
+            start, timestamps, timestamp and version of the calibration. Motors
+            and axes are returned as names and the model unfitted.
+        """
+        import pandas as pd
+
+        meta = self.metadata(name, version)
+        path = self._version_dir(name, meta["version"])
+        tables = {}
+        for key in ("calib", "scan"):
+            if key not in meta["tables"]:
+                tables[key] = None
+                continue
+            data = np.load(os.path.join(path, key + ".npy"),
+                           mmap_mode="r" if mmap else None)
+            index = np.load(os.path.join(path, key + "_index.npy"))
+            table = meta["tables"][key]
+            df = pd.DataFrame(data, index=index, copy=False,
+                              columns=table["columns"])
+            # Restore the dtypes that are not the stored floats. Tables saved
+            # before the dtypes were recorded are loaded as floats
+            casts = {col: dtype for col, dtype in zip(table["columns"],
+                                                      table.get("dtypes", []))
+                     if np.dtype(dtype) != data.dtype}
+            if casts:
+                df = df.astype(casts)
+            if table.get("index_dtype", index.dtype.str) != index.dtype.str:
+                df.index = df.index.astype(table["index_dtype"])
+            tables[key] = df
+        return {"calib": tables["calib"],
+                "scan": tables["scan"],
+                "motors": meta["motors"],
+                "axes": meta.get("axes", []),
+                "model": _model_from_meta(meta.get("model")),
+                "scale": meta["scale"],
+                "start": meta["start"],
+                "timestamps": meta["timestamps"],
+                "timestamp": meta["timestamp"],
+                "version": meta["version"]}
+
+    def _resolve_version(self, name, version):
+        """
+        Returns the inputted version or the latest one, raising if it doesn't
+        exist.
+        """
+        versions = self.versions(name)
+        if version is None:
+            if not versions:
+                raise FileNotFoundError("No saved calibrations for '{0}' in "
+                                        "{1}.".format(name, self.root))
+            return versions[-1]
+        if version not in versions:
+            raise FileNotFoundError("No calibration version {0} for '{1}' in "
+                                    "{2}.".format(version, name, self.root))
+        return version
+
+
+def _numeric_dtypes(key, df):
+    """
+    Returns the dtypes of the columns and then the index of a table, raising
+    if any of them can't be stored as floats.
+    """
+    dtypes = list(df.dtypes) + [df.index.dtype]
+    labels = ["column '{0}'".format(col) for col in df.columns] + ["index"]
+    for label, dtype in zip(labels, dtypes):
+        if getattr(dtype, "kind", None) not in ("b", "i", "u", "f"):
+            raise TypeError("Calibration tables must be numeric, but the {0} "
+                            "of the {1} table has dtype '{2}'.".format(
+                                label, key, dtype))
+    return [np.dtype(dtype).str for dtype in dtypes]
+
+
+def _to_list(value):
+    """
+    Converts array-likes of numbers to lists of floats for json.
+    """
+    if value is None:
+        return None
+    return [float(val) for val in value]
+
+
+def _model_from_meta(meta):
+    """
+    Recreates an unfitted calibration model from its saved type and
+    parameters.
+    """
+    if meta is None:
+        return None
+    from . import interpolation
+    return getattr(interpolation, meta["type"])(**meta["params"])
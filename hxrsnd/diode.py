@@ -9,6 +9,7 @@ from ophyd.device import Component as C
 from ophyd.device import FormattedComponent as FC
 
 from .aerotech import DiodeAero
+from .buffers import RingBuffer, SignalBuffer
 from .snddevice import SndDevice
 
 logger = logging.getLogger(__name__)
@@ -52,14 +53,55 @@ class HamamatsuXMotionDiode(SndDevice):
         """
         Returns if the diode is in the blocked position.
         """
-        if np.isclose(self.x.position, self.block_pos, atol=self.block_atol):
+        return self._blocked_state(self.x.position)
+
+    def _blocked_state(self, position, **snapshot):
+        """
+        Returns the blocking state of the diode for the inputted position of
+        the x motor.
+
+        Parameters
+        ----------
+        position : float
+            Position of the x motor.
+
+        snapshot : dict, optional
+            Tower angles and lengths to evaluate the state with. Unused for
+            this diode since the blocking positions are fixed.
+
+        Returns
+        -------
+        blocked : bool or str
+            True or False if it is close to the blocked or unblocked positions.
+            Returns 'Unknown' if it is far from either of those positions.
+        """
+        if np.isclose(position, self.block_pos, atol=self.block_atol):
             return True
-        elif np.isclose(self.x.position, self.unblock_pos,
-                        atol=self.block_atol):
+        elif np.isclose(position, self.unblock_pos, atol=self.block_atol):
             return False
         else:
             return "Unknown"
 
+    def _block_position(self, blocked, **snapshot):
+        """
+        Returns the position of the x motor that blocks or unblocks the beam.
+
+        Parameters
+        ----------
+        blocked : bool
+            Return the blocking position if True, otherwise the unblocking
+            position.
+
+        snapshot : dict, optional
+            Unused for this diode since the blocking positions are fixed.
+
+        Returns
+        -------
+        position : float
+            Position of the x motor.
+        """
+        return self.block_pos if blocked else self.unblock_pos
+
     def block(self, *args, **kwargs):
         """
         Moves the diode into the blocking position.
@@ -135,6 +177,28 @@ class HamamatsuXYMotionCamDiode(SndDevice):
         """
         Returns if the diode is in the blocked position.
 
+        Returns
+        -------
+        blocked : bool or str
+            True or False if it is close to the blocked or unblocked positions.
+            Returns 'Unknown' if it is far from either of those positions.
+        """
+        return self._blocked_state(self.x.position)
+
+    def _blocked_state(self, position, **snapshot):
+        """
+        Returns the blocking state of the diode for the inputted position of
+        the x motor. The position function is evaluated only once.
+
+        Parameters
+        ----------
+        position : float
+            Position of the x motor.
+
+        snapshot : dict, optional
+            Tower angles and lengths passed to the position function so it
+            does not have to read them from the towers itself.
+
         Returns
         -------
         blocked : bool or str
@@ -142,14 +206,37 @@ class HamamatsuXYMotionCamDiode(SndDevice):
             Returns 'Unknown' if it is far from either of those positions.
         """
         if callable(self.pos_func):
-            if np.isclose(self.x.position, self.pos_func()+self.block_pos,
+            unblock_pos = self.pos_func(**snapshot)
+            if np.isclose(position, unblock_pos+self.block_pos,
                           atol=self.block_atol):
                 return True
-            elif np.isclose(self.x.position, self.pos_func(),
-                            atol=self.block_atol):
+            elif np.isclose(position, unblock_pos, atol=self.block_atol):
                 return False
         return "Unknown"
 
+    def _block_position(self, blocked, **snapshot):
+        """
+        Returns the position of the x motor that blocks or unblocks the beam.
+        The position function is evaluated only once.
+
+        Parameters
+        ----------
+        blocked : bool
+            Return the blocking position if True, otherwise the unblocking
+            position.
+
+        snapshot : dict, optional
+            Tower angles and lengths passed to the position function so it
+            does not have to read them from the towers itself.
+
+        Returns
+        -------
+        position : float
+            Position of the x motor.
+        """
+        unblock_pos = self.pos_func(**snapshot)
+        return unblock_pos + self.block_pos if blocked else unblock_pos
+
     def block(self, *args, **kwargs):
         """
         Moves the diode by the blocking position defined by the position
@@ -232,8 +319,11 @@ class DiodeIO(SndDevice):
     """
     tab_component_names = True
 
-    peakA = FC(EpicsSignalRO, '{self.prefix}:_peakA_{self.channel}')
-    peakT = FC(EpicsSignalRO, '{self.prefix}:_peakT_{self.channel}')
+    # Monitored so reading every channel of the Wave8 doesn't cost a get each
+    peakA = FC(EpicsSignalRO, '{self.prefix}:_peakA_{self.channel}',
+               auto_monitor=True)
+    peakT = FC(EpicsSignalRO, '{self.prefix}:_peakT_{self.channel}',
+               auto_monitor=True)
 
     def __init__(self, prefix, channel, name, *,
                  read_attrs=None, **kwargs):
@@ -244,6 +334,34 @@ class DiodeIO(SndDevice):
             read_attrs = ['peakT']
         # Initialize device
         super().__init__(prefix, name=name, read_attrs=read_attrs, **kwargs)
+        self.buffers = {}
+
+    def start_buffers(self, size=1200):
+        """
+        Starts buffering the shots of both peaks so averages can be taken from
+        the buffers instead of reading the peaks once per shot.
+
+        Parameters
+        ----------
+        size : int, optional
+            Number of shots to keep for each peak.
+
+        Returns
+        -------
+        buffers : dict
+            Dictionary of :class:`.SignalBuffer` keyed by the signal names.
+        """
+        self.stop_buffers()
+        self.buffers = {sig.name: SignalBuffer(sig, size=size)
+                        for sig in (self.peakA, self.peakT)}
+        return self.buffers
+
+    def stop_buffers(self):
+        """
+        Stops buffering the shots of the peaks.
+        """
+        for buf in self.buffers.values():
+            buf.stop()
 
 
 class Wave8(SndDevice):
@@ -251,8 +369,35 @@ class Wave8(SndDevice):
     Wave8 Device
 
     A system of sixteen diodes, each with two peaks; A and T.
+
+    All the peaks are monitored, so ``peaks`` returns every channel at once
+    from the latest monitor updates. Calling ``start_buffer`` additionally
+    records each update of the last channel's peakT as a sample of all the
+    channels in ``buffer``.
+
+    Each sample is taken from a single pass over the cached monitor values
+    when diode_15's peakT updates, so a sample only holds a single shot if
+    the IOC posts every other channel of the shot before that PV. A channel
+    whose monitor arrives after that update, or that was not posted because
+    its value did not change, holds its value from an earlier shot in the
+    sample. Check the timestamps returned by ``peaks`` when the channels must
+    come from the same shot.
+
+    Parameters
+    ----------
+    prefix : str
+        Base name of device
+
+    name : str, optional
+        Name of Wave8 device
+
+    buffer_size : int, optional
+        Number of recent samples to keep in the buffer. Keyword only.
     """
     tab_component_names = True
+    tab_whitelist = ['buffer', 'peaks', 'start_buffer', 'stop_buffer']
+    num_channels = 16
+
     diode_0 = C(DiodeIO, '', channel=0, name='Diode 0')
     diode_1 = C(DiodeIO, '', channel=1, name='Diode 1')
     diode_2 = C(DiodeIO, '', channel=2, name='Diode 2')
@@ -269,3 +414,61 @@ class Wave8(SndDevice):
     diode_13 = C(DiodeIO, '', channel=13, name='Diode 13')
     diode_14 = C(DiodeIO, '', channel=14, name='Diode 14')
     diode_15 = C(DiodeIO, '', channel=15, name='Diode 15')
+
+    def __init__(self, prefix, name=None, *args, buffer_size=1200, **kwargs):
+        super().__init__(prefix, name=name, *args, **kwargs)
+        self._diodes = [getattr(self, "diode_{0}".format(i))
+                        for i in range(self.num_channels)]
+        self._peak_signals = [(diode.peakA, diode.peakT)
+                              for diode in self._diodes]
+        self.buffer = RingBuffer(buffer_size, shape=(self.num_channels, 2))
+        self._buffer_cid = None
+
+    def peaks(self):
+        """
+        Returns peakA and peakT of every channel along with their timestamps.
+
+        Returns
+        -------
+        values : np.ndarray
+            Array of shape (16, 2) with the peakA and peakT of each channel.
+
+        timestamps : np.ndarray
+            Array of shape (16, 2) with the timestamp of each value.
+        """
+        values = np.array([[sig.get() for sig in sigs]
+                           for sigs in self._peak_signals], dtype=float)
+        timestamps = np.array([[sig.timestamp for sig in sigs]
+                               for sigs in self._peak_signals], dtype=float)
+        return values, timestamps
+
+    def _record_sample(self, *args, timestamp=None, **kwargs):
+        """
+        Callback that adds the current peaks of all the channels to the buffer.
+        """
+        values, _ = self.peaks()
+        self.buffer.append(values, timestamp=timestamp)
+
+    def start_buffer(self, clear=True):
+        """
+        Starts recording every update of the Wave8 into the buffer. See the
+        class docstring for how the channels of each sample line up.
+
+        Parameters
+        ----------
+        clear : bool, optional
+            Remove any previously recorded samples.
+        """
+        if clear:
+            self.buffer.clear()
+        if self._buffer_cid is None:
+            self._buffer_cid = self.diode_15.peakT.subscribe(
+                self._record_sample, run=False)
+
+    def stop_buffer(self):
+        """
+        Stops recording updates of the Wave8 into the buffer.
+        """
+        if self._buffer_cid is not None:
+            self.diode_15.peakT.unsubscribe(self._buffer_cid)
+            self._buffer_cid = None
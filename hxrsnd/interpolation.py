@@ -0,0 +1,301 @@
+"""
+Interpolation and fitting of calibration tables.
+"""
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class GridInterpolator:
+    """
+    Multilinear interpolator over a rectilinear N-D grid.
+
+    Every cell of the grid is converted once into the coefficients of its
+    multilinear polynomial, so an evaluation only has to find the cell and
+    take a dot product. When an axis is evenly spaced the cell is found
+    arithmetically, so the cost of an evaluation does not depend on the size
+    of the grid. Points outside the grid are extrapolated linearly from the
+    edge cells.
+
+    Parameters
+    ----------
+    axes : list of array-like
+        Sorted coordinates of the grid along each axis. Every axis needs at
+        least two points.
+
+    values : array-like
+        Grid values of shape ``(len(axes[0]), ..., len(axes[-1]), n_outputs)``.
+    """
+    def __init__(self, axes, values):
+        self.axes = [np.asarray(ax, dtype=float) for ax in axes]
+        values = np.asarray(values, dtype=float)
+        self.ndim = len(self.axes)
+        shape = tuple(len(ax) for ax in self.axes)
+        if values.shape[:self.ndim] != shape or values.ndim != self.ndim + 1:
+            raise ValueError("Grid values of shape {0} do not match the axes "
+                             "shape {1}.".format(values.shape, shape))
+        if any(len(ax) < 2 for ax in self.axes):
+            raise ValueError("Every grid axis needs at least two points.")
+        if any((np.diff(ax) <= 0).any() for ax in self.axes):
+            raise ValueError("Grid axes must be strictly increasing.")
+
+        # Evenly spaced axes can be indexed without a search
+        self._steps = [ax[1] - ax[0] if np.allclose(np.diff(ax), ax[1] - ax[0])
+                       else None for ax in self.axes]
+        # Bits of each monomial, indexed by the bitmask of the axes in it
+        self._bits = [[k for k in range(self.ndim) if mask >> k & 1]
+                      for mask in range(2**self.ndim)]
+        self._coeffs = self._cell_coefficients(values)
+
+    def _cell_coefficients(self, values):
+        """
+        Returns the monomial coefficients of every cell, with shape
+        ``cells + (2**ndim, n_outputs)``.
+        """
+        ncells = tuple(len(ax) - 1 for ax in self.axes)
+
+        def corner(mask):
+            # Values at the corner of every cell offset by the bitmask
+            return values[tuple(slice(mask >> k & 1, (mask >> k & 1) + n)
+                                for k, n in enumerate(ncells))]
+
+        coeffs = np.zeros(ncells + (2**self.ndim, values.shape[-1]))
+        # Mobius inversion of the corner values into monomial coefficients
+        for mask in range(2**self.ndim):
+            sub = mask
+            while True:
+                sign = (-1)**(bin(mask).count("1") - bin(sub).count("1"))
+                coeffs[..., mask, :] += sign * corner(sub)
+                if sub == 0:
+                    break
+                sub = (sub - 1) & mask
+        return coeffs
+
+    @classmethod
+    def from_dataframe(cls, df, axis_columns, value_columns):
+        """
+        Builds an interpolator from a table with one row per grid point.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            Table holding every point of the grid.
+
+        axis_columns : list
+            Columns with the grid coordinates.
+
+        value_columns : list
+            Columns with the values to interpolate.
+
+        Returns
+        -------
+        interpolator : :class:`.GridInterpolator`
+            Interpolator of the value columns.
+
+        Raises
+        ------
+        ValueError
+            If the rows do not fill a complete rectilinear grid.
+        """
+        coords = [np.asarray(df[col], dtype=float) for col in axis_columns]
+        axes = [np.unique(coord) for coord in coords]
+        shape = tuple(len(ax) for ax in axes)
+        if len(df) != np.prod(shape):
+            raise ValueError("Table with {0} rows does not fill a {1} grid."
+                             "".format(len(df), " x ".join(map(str, shape))))
+        index = tuple(np.searchsorted(ax, coord)
+                      for ax, coord in zip(axes, coords))
+        values = np.full(shape + (len(value_columns),), np.nan)
+        values[index] = np.asarray(df[list(value_columns)], dtype=float)
+        if np.isnan(values).any():
+            raise ValueError("Table has repeated points and does not fill a "
+                             "complete grid.")
+        return cls(axes, values)
+
+    def __call__(self, point):
+        """
+        Interpolates the grid values at a point.
+
+        Parameters
+        ----------
+        point : array-like
+            Coordinates along each axis.
+
+        Returns
+        -------
+        values : np.ndarray
+            Interpolated values of every output.
+        """
+        if len(point) != self.ndim:
+            raise ValueError("Expected {0} coordinates, got {1}.".format(
+                self.ndim, len(point)))
+        cell = []
+        local = []
+        for x, ax, step in zip(point, self.axes, self._steps):
+            if step is not None:
+                i = int(np.floor((x - ax[0]) / step))
+            else:
+                i = int(np.searchsorted(ax, x, side='right')) - 1
+            i = min(max(i, 0), len(ax) - 2)
+            cell.append(i)
+            local.append((x - ax[i]) / (ax[i+1] - ax[i]))
+        monomials = np.array([np.prod([local[k] for k in bits])
+                              for bits in self._bits])
+        return monomials @ self._coeffs[tuple(cell)]
+
+
+class PolynomialModel:
+    """
+    Least squares polynomial fit of every column of a 1-D correction table.
+
+    Parameters
+    ----------
+    order : int, optional
+        Order of the polynomials.
+    """
+    def __init__(self, order=3):
+        self.order = int(order)
+        self.coeffs = None
+
+    @property
+    def params(self):
+        """
+        Returns the parameters needed to recreate the unfitted model.
+        """
+        return {'order': self.order}
+
+    def fit(self, x, values):
+        """
+        Fits the polynomials and caches their coefficients.
+
+        Parameters
+        ----------
+        x : array-like
+            Positions of the main motor.
+
+        values : array-like
+            Array of shape (len(x), n_outputs) with the corrections.
+
+        Returns
+        -------
+        model : :class:`.PolynomialModel`
+            The fitted model.
+        """
+        x = np.asarray(x, dtype=float)
+        if len(x) <= self.order:
+            raise ValueError("Need more than {0} points to fit a polynomial of "
+                             "order {0}, got {1}.".format(self.order, len(x)))
+        # Columns of the result are the coefficients of each output
+        self.coeffs = np.polyfit(x, np.asarray(values, dtype=float),
+                                 self.order).reshape(self.order + 1, -1)
+        return self
+
+    def __call__(self, x):
+        """
+        Evaluates the fitted polynomials at every inputted position at once.
+
+        Parameters
+        ----------
+        x : float or array-like
+            Positions of the main motor.
+
+        Returns
+        -------
+        values : np.ndarray
+            Array of shape (len(x), n_outputs) with the corrections.
+        """
+        return np.vander(np.atleast_1d(x).astype(float),
+                         self.order + 1) @ self.coeffs
+
+
+class SplineModel:
+    """
+    Smoothing spline fit of every column of a 1-D correction table.
+
+    Parameters
+    ----------
+    smoothing : float, optional
+        Smoothing factor passed to ``scipy.interpolate.splrep``, the largest
+        allowed sum of the squared residuals. Larger values give smoother
+        splines and 0 interpolates every point. Defaults to the number of
+        points times the noise variance of each column, estimated from its
+        second differences.
+
+    degree : int, optional
+        Degree of the spline.
+    """
+    def __init__(self, smoothing=None, degree=3):
+        self.smoothing = smoothing
+        self.degree = int(degree)
+        self.tcks = None
+
+    @property
+    def params(self):
+        """
+        Returns the parameters needed to recreate the unfitted model.
+        """
+        return {'smoothing': self.smoothing, 'degree': self.degree}
+
+    def fit(self, x, values):
+        """
+        Fits the splines and caches their knots and coefficients.
+
+        Parameters
+        ----------
+        x : array-like
+            Positions of the main motor.
+
+        values : array-like
+            Array of shape (len(x), n_outputs) with the corrections.
+
+        Returns
+        -------
+        model : :class:`.SplineModel`
+            The fitted model.
+        """
+        # Only calibrations that use splines pay for the scipy import
+        from scipy.interpolate import splrep
+
+        x = np.asarray(x, dtype=float)
+        values = np.asarray(values, dtype=float).reshape(len(x), -1)
+        order = np.argsort(x)
+        if len(x) <= self.degree or (np.diff(x[order]) <= 0).any():
+            raise ValueError("Need more than {0} distinct positions to fit a "
+                             "spline of degree {0}.".format(self.degree))
+        self.tcks = [splrep(x[order], col[order], k=self.degree,
+                            s=self._smoothing(col[order]))
+                     for col in values.T]
+        return self
+
+    def _smoothing(self, col):
+        """
+        Returns the smoothing factor of a sorted column.
+        """
+        if self.smoothing is not None:
+            return self.smoothing
+        if len(col) < 3:
+            return 0.
+        # White noise of variance v gives second differences of variance 6v,
+        # while a smooth curve contributes little to them
+        return len(col) * np.mean(np.diff(col, 2)**2) / 6
+
+    def __call__(self, x):
+        """
+        Evaluates the fitted splines at every inputted position at once.
+
+        Parameters
+        ----------
+        x : float or array-like
+            Positions of the main motor.
+
+        Returns
+        -------
+        values : np.ndarray
+            Array of shape (len(x), n_outputs) with the corrections.
+        """
+        from scipy.interpolate import splev
+
+        x = np.atleast_1d(x).astype(float)
+        return np.column_stack([splev(x, tck) for tck in self.tcks])
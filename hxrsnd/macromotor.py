@@ -4,8 +4,11 @@ Script to hold the energy macromotors
 All units of time are in picoseconds, units of length are in mm.
 """
 import logging
+import threading
+import time
 from functools import reduce
 
+import numpy as np
 from ophyd.device import Component as Cmp
 from ophyd.signal import AttributeSignal
 from ophyd.sim import NullStatus
@@ -26,6 +29,122 @@ logger = logging.getLogger(__name__)
 _UNSET = object()
 
 
+class MacroReadback(AttributeSignal):
+    """
+    Readback of a macro-motor that is pushed to subscribers whenever one of
+    the tower motors it is computed from moves, instead of only when it is
+    polled.
+
+    The readbacks of the input motors are only monitored while something is
+    subscribed to this signal, and the value is recomputed at most once every
+    ``min_interval`` seconds. Changes that arrive sooner are combined into one
+    update at the end of the interval, so the last value is always sent.
+
+    Parameters
+    ----------
+    attr : str
+        Attribute of the parent with the value of the readback.
+
+    min_interval : float, optional
+        Minimum number of seconds between updates.
+    """
+    def __init__(self, attr, *, min_interval=0.1, **kwargs):
+        super().__init__(attr, write_access=False, **kwargs)
+        self.min_interval = min_interval
+        self._inputs_subscribed = False
+        self._input_cids = []
+        self._update_lock = threading.Lock()
+        self._update_timer = None
+        self._last_update = 0
+        self._last_value = _UNSET
+
+    def subscribe(self, callback, event_type=None, run=True):
+        cid = super().subscribe(callback, event_type=event_type, run=run)
+        if (event_type or self._default_sub) == self.SUB_VALUE:
+            self._subscribe_inputs()
+        return cid
+
+    def unsubscribe(self, cid):
+        super().unsubscribe(cid)
+        if not self._callbacks[self.SUB_VALUE]:
+            self._unsubscribe_inputs()
+
+    def _subscribe_inputs(self):
+        """
+        Starts monitoring the readbacks the value is computed from, and sends
+        the current value to the subscribers.
+        """
+        with self._update_lock:
+            if self._inputs_subscribed:
+                return
+            self._inputs_subscribed = True
+        for signal in self.parent._readback_inputs():
+            cid = signal.subscribe(self._input_changed, run=False)
+            self._input_cids.append((signal, cid))
+        self._update()
+
+    def _unsubscribe_inputs(self):
+        """
+        Stops monitoring the readbacks once nothing is subscribed to the value.
+        """
+        with self._update_lock:
+            if not self._inputs_subscribed:
+                return
+            self._inputs_subscribed = False
+            input_cids, self._input_cids = self._input_cids, []
+            if self._update_timer is not None:
+                self._update_timer.cancel()
+                self._update_timer = None
+        for signal, cid in input_cids:
+            signal.unsubscribe(cid)
+
+    def _input_changed(self, **kwargs):
+        if not self._callbacks[self.SUB_VALUE]:
+            return
+        with self._update_lock:
+            if self._update_timer is not None:
+                # An update is already waiting for the end of the interval
+                return
+            wait = self._last_update + self.min_interval - time.time()
+            if wait > 0:
+                self._update_timer = threading.Timer(wait, self._update)
+                self._update_timer.daemon = True
+                self._update_timer.start()
+                return
+        self._update()
+
+    def _update(self):
+        """
+        Recomputes the value and sends it to the subscribers if it changed.
+        """
+        with self._update_lock:
+            self._update_timer = None
+            self._last_update = time.time()
+        try:
+            value = self.get()
+        except Exception as e:
+            logger.error("Failed to update the readback of '{0}'. Got error: "
+                         "{1}".format(self.parent.name, e))
+            return
+        old_value, self._last_value = self._last_value, value
+        if old_value is _UNSET:
+            old_value = None
+        elif _same_value(old_value, value):
+            return
+        self._run_subs(sub_type=self.SUB_VALUE, old_value=old_value,
+                       value=value, timestamp=self._last_update)
+
+
+def _same_value(old, new):
+    """
+    Compares two readback values, which may be tuples or contain NaNs.
+    """
+    try:
+        return bool(np.all(np.asarray(old) == np.asarray(new)))
+    except (TypeError, ValueError):
+        return False
+
+
 class MacroBase(SndMotor):
     """
     Base pseudo-motor class for the SnD macro-motions.
@@ -35,11 +154,12 @@ class MacroBase(SndMotor):
     gap = 55                    # m
 
     tab_component_names = True
-    tab_whitelist = ['aligned', 'move', 'position', 'set', 'set_position',
-                     'status', 'wait', 'c', 'gap']
+    tab_whitelist = ['aligned', 'check_value', 'check_values', 'move',
+                     'position', 'set', 'set_position', 'status', 'wait',
+                     'c', 'gap']
 
     # Set add_prefix to be blank so cmp doesnt append the parent prefix
-    readback = Cmp(AttributeSignal, "position", add_prefix='')
+    readback = Cmp(MacroReadback, "position", add_prefix='')
 
     def __init__(self, prefix, name=None, read_attrs=None, *args, **kwargs):
         read_attrs = read_attrs or ["readback"]
@@ -87,8 +207,27 @@ class MacroBase(SndMotor):
         energy : float
             Energy the channel cut line is set to in eV.
         """
-        return (self.parent.t1.energy, self.parent.t2.energy,
-                self._length_to_delay())
+        with self.parent.consistent_reads():
+            return (self.parent.t1.energy, self.parent.t2.energy,
+                    self._length_to_delay())
+
+    def _readback_inputs(self):
+        """
+        Returns the motor readbacks the position is computed from, which
+        trigger updates of the readback signal.
+        """
+        if not self.parent:
+            return []
+        return [self.parent.t1.tth.user_readback,
+                self.parent.t2.th.user_readback,
+                self.parent.t1.L.user_readback]
+
+    def _consistent_reads(self):
+        """
+        Returns the read-consistent context of the whole system, or of just
+        the macro-motor if it has no parent.
+        """
+        return (self.parent or self).consistent_reads()
 
     def _verify_move(self, *args, **kwargs):
         """
@@ -98,6 +237,54 @@ class MacroBase(SndMotor):
         """
         pass
 
+    def check_value(self, position, use_diag=_UNSET):
+        """
+        Checks that the macro-motor can be moved to the inputted position
+        without moving anything, raising the same errors a move would.
+
+        Parameters
+        ----------
+        position : float
+            Position to check.
+
+        use_diag : bool, optional
+            Check the position of the diagnostic motors.
+        """
+        use_diag = use_diag if use_diag is not _UNSET else self.use_diag
+        self._check_towers_and_diagnostics(position, use_diag=use_diag)
+
+    def _enforced_limits(self):
+        """
+        Macro-motors have no soft limits of their own. The limits of the
+        motors they move are checked by ``check_value``.
+        """
+        return None
+
+    def check_values(self, positions, use_diag=_UNSET):
+        """
+        Checks that the macro-motor can be moved to each of the inputted
+        positions, e.g. every step of a planned trajectory. The system is read
+        once for all of the positions.
+
+        Parameters
+        ----------
+        positions : float or array-like
+            Positions to check.
+
+        use_diag : bool, optional
+            Check the position of the diagnostic motors.
+
+        Returns
+        -------
+        positions : np.ndarray
+            Inputted positions as a float array.
+        """
+        positions = super().check_values(positions)
+        with self._consistent_reads():
+            for position in positions.ravel():
+                self.check_value(position, use_diag=use_diag)
+        return positions
+
     def _check_towers_and_diagnostics(self, *args, **kwargs):
         """
         Checks the towers in the delay line and the channel cut line to make
@@ -224,17 +411,19 @@ class MacroBase(SndMotor):
         if verify_move is _UNSET:
             verify_move = self.verify_move
 
-        # Check the towers and diagnostics
-        diag_pos = self._check_towers_and_diagnostics(position,
-                                                      use_diag=use_diag)
+        # Check, confirm and send the move from one snapshot of the system
+        with self._consistent_reads():
+            # Check the towers and diagnostics
+            diag_pos = self._check_towers_and_diagnostics(position,
+                                                          use_diag=use_diag)
 
-        # Prompt the user about the move before making it
-        if verify_move and self._verify_move(position, use_diag=use_diag):
-            return
+            # Prompt the user about the move before making it
+            if verify_move and self._verify_move(position, use_diag=use_diag):
+                return
 
-        # Send the move commands to all the motors
-        status_list = flatten(self._move_towers_and_diagnostics(
-            position, diag_pos, use_diag=use_diag))
+            # Send the move commands to all the motors
+            status_list = flatten(self._move_towers_and_diagnostics(
+                position, diag_pos, use_diag=use_diag))
 
         # Aggregate the status objects
         status = reduce(lambda x, y: x & y, status_list)
@@ -441,7 +630,8 @@ class DelayTowerMacro(MacroBase):
         length = ((delay*self.c/2 + self.gap*(1 - cosd(2*theta2)) / sind(theta2)) / (1 - cosd(2*theta1)))
         return length
 
-    def _get_delay_diagnostic_position(self, E1=None, E2=None, delay=None):
+    def _get_delay_diagnostic_position(self, E1=None, E2=None, delay=None,
+                                       theta1=None, length=None):
         """
         Gets the position the delay diagnostic needs to move to based on the
         inputted energies and delay or the current bragg angles and current
@@ -461,6 +651,14 @@ class DelayTowerMacro(MacroBase):
             Delay in picoseconds to use for the calculation. Uses current delay
             if None is inputted.
 
+        theta1 : float or None, optional
+            Already read bragg angle of the delay line to use in place of the
+            current one. Ignored if E1 is inputted.
+
+        length : float or None, optional
+            Already read position of the delay stage to use in place of the
+            current one. Ignored if delay is inputted.
+
         Returns
         -------
         position : float
@@ -468,14 +666,15 @@ class DelayTowerMacro(MacroBase):
             inputted parameters.
         """
         # Use current bragg angle
-        if E1 is None:
-            theta1 = self.parent.theta1
-        else:
+        if E1 is not None:
             theta1 = bragg_angle(E=E1)
+        elif theta1 is None:
+            theta1 = self.parent.theta1
 
         # Use current delay stage position if no delay is inputted
         if delay is None:
-            length = self.parent.t1.length
+            if length is None:
+                length = self.parent.t1.length
         # Calculate the expected delay position if a delay is inputted
         else:
             if E2 is None:
@@ -526,6 +725,8 @@ class DelayMacro(CalibMotor, DelayTowerMacro):
         if self.parent:
             self.motor_fields = ['readback']
             self.calib_motors = [self.parent.t1.chi1, self.parent.t1.y1]
+            # The correction can also be gridded over the delay energy
+            self.calib_axes = [self.parent.E1]
             self.calib_fields = [field_prepend('user_readback', calib_motor)
                                  for calib_motor in self.calib_motors]
             self.detector_fields = ['stats2_centroid_x', 'stats2_centroid_y', ]
@@ -714,7 +915,8 @@ class DelayMacro(CalibMotor, DelayTowerMacro):
         energy : float
             Energy the channel cut line is set to in eV.
         """
-        return self._length_to_delay()
+        with self.parent.consistent_reads():
+            return self._length_to_delay()
 
     def set_position(self, delay=None, print_set=True, use_diag=_UNSET,
                      verify_move=_UNSET):
@@ -954,7 +1156,8 @@ class Energy1Macro(DelayTowerMacro):
 
         return status
 
-    def _get_delay_diagnostic_position(self, E1=None):
+    def _get_delay_diagnostic_position(self, E1=None, theta1=None,
+                                       length=None):
         """
         Gets the position the delay diagnostic needs to move to based on the
         inputted energies and delay or the current bragg angles and current
@@ -966,13 +1169,22 @@ class Energy1Macro(DelayTowerMacro):
             Energy in eV to use for the delay line. Uses the current energy if
             None is inputted.
 
+        theta1 : float or None, optional
+            Already read bragg angle of the delay line to use in place of the
+            current one. Ignored if E1 is inputted.
+
+        length : float or None, optional
+            Already read position of the delay stage to use in place of the
+            current one.
+
         Returns
         -------
         position : float
             Position in mm the delay diagnostic should move to given the
             inputted parameters.
         """
-        return super()._get_delay_diagnostic_position(E1=E1)
+        return super()._get_delay_diagnostic_position(E1=E1, theta1=theta1,
+                                                      length=length)
 
     @property
     @nan_if_no_parent
@@ -987,6 +1199,11 @@ class Energy1Macro(DelayTowerMacro):
         """
         return self.parent.t1.energy
 
+    def _readback_inputs(self):
+        if not self.parent:
+            return []
+        return [self.parent.t1.tth.user_readback]
+
     def set_position(self, E1=None, print_set=True, verify_move=_UNSET,
                      use_diag=_UNSET):
         """
@@ -1217,7 +1434,7 @@ class Energy2Macro(MacroBase):
     Macro-motor for the energy 2 macro-motor.
     """
 
-    def _get_channelcut_diagnostic_position(self, E2=None):
+    def _get_channelcut_diagnostic_position(self, E2=None, theta2=None):
         """
         Gets the position the channel cut diagnostic needs to move to based on
         the inputted energy or the current energy of the channel cut line.
@@ -1228,6 +1445,10 @@ class Energy2Macro(MacroBase):
             Energy in eV to use for the channel cut line. Uses the current
             energy if None is inputted.
 
+        theta2 : float or None, optional
+            Already read bragg angle of the channel cut line to use in place of
+            the current one. Ignored if E2 is inputted.
+
         Returns
         -------
         position : float
@@ -1235,10 +1456,10 @@ class Energy2Macro(MacroBase):
             inputted parameters.
         """
         # Use the current theta2 of the system or calc based on inputted energy
-        if E2 is None:
-            theta2 = self.parent.theta2
-        else:
+        if E2 is not None:
             theta2 = bragg_angle(E=E2)
+        elif theta2 is None:
+            theta2 = self.parent.theta2
 
         # Calculate position the diagnostic needs to move to
         position = 2*cosd(theta2)*self.gap
@@ -1419,6 +1640,11 @@ class Energy2Macro(MacroBase):
         """
         return self.parent.t2.energy
 
+    def _readback_inputs(self):
+        if not self.parent:
+            return []
+        return [self.parent.t2.th.user_readback]
+
     def set_position(self, E2=None, print_set=True, verify_move=_UNSET,
                      use_diag=_UNSET):
         """
@@ -0,0 +1,49 @@
+"""
+Notepad PVs that publish the progress of a scan to the DAQ
+"""
+import logging
+
+from ophyd import Component as Cmp
+from ophyd import Device, EpicsSignal
+
+logger = logging.getLogger(__name__)
+
+
+class NotepadScanStatus(Device):
+    """
+    Notepad PVs with the status of the current scan.
+    """
+    istep = Cmp(EpicsSignal, ":ISTEP")
+    isscan = Cmp(EpicsSignal, ":ISSCAN")
+    nshots = Cmp(EpicsSignal, ":NSHOTS")
+    nsteps = Cmp(EpicsSignal, ":NSTEPS")
+    var0 = Cmp(EpicsSignal, ":SCANVAR00")
+    var1 = Cmp(EpicsSignal, ":SCANVAR01")
+    var2 = Cmp(EpicsSignal, ":SCANVAR02")
+    var0_max = Cmp(EpicsSignal, ":MAX00")
+    var1_max = Cmp(EpicsSignal, ":MAX01")
+    var2_max = Cmp(EpicsSignal, ":MAX02")
+    var0_min = Cmp(EpicsSignal, ":MIN00")
+    var1_min = Cmp(EpicsSignal, ":MIN01")
+    var2_min = Cmp(EpicsSignal, ":MIN02")
+
+    # Values the fields are reset to between scans
+    _defaults = {'istep': 0, 'isscan': 0, 'nshots': 0, 'nsteps': 0,
+                 'var0': '', 'var1': '', 'var2': '',
+                 'var0_max': 0, 'var1_max': 0, 'var2_max': 0,
+                 'var0_min': 0, 'var1_min': 0, 'var2_min': 0}
+
+    @property
+    def defaults(self):
+        """
+        Returns the values every field is reset to by :meth:`clean_fields`.
+        """
+        return dict(self._defaults)
+
+    def clean_fields(self):
+        """
+        Resets every field to its default. The puts are all sent at once
+        without reading the current values first.
+        """
+        for field, value in self._defaults.items():
+            getattr(self, field).put(value)
@@ -10,17 +10,17 @@ from bluesky.plans import list_scan
 from bluesky.preprocessors import msg_mutator, subs_decorator
 from lmfit.models import LorentzianModel
 from pswalker.callbacks import LiveBuild
-from pswalker.plans import measure_average
 
 from ..exceptions import UndefinedBounds
-from .plan_stubs import block_run_control
+from .plan_stubs import averaged_read, block_run_control
 
 logger = logging.getLogger(__name__)
 
 
 def maximize_lorentz(detector, motor, read_field, step_size=1,
                      bounds=None, average=None, filters=None,
-                     position_field='user_readback', initial_guess=None):
+                     position_field='user_readback', initial_guess=None,
+                     buffers=None):
     """
     Maximize a signal with a Lorentzian relationship to a motor
 
@@ -64,6 +64,10 @@ def maximize_lorentz(detector, motor, read_field, step_size=1,
     initial_guess : dict, optional
         Initial guess to the Lorentz model parameters of `sigma` `center`
         `amplitude`
+
+    buffers : list, optional
+        Signal buffers of the detector fields to average instead of reading
+        the detector once per shot. See :func:`.averaged_read`
     """
     average = average or 1
     # Define bounds
@@ -83,8 +87,11 @@ def maximize_lorentz(detector, motor, read_field, step_size=1,
     # Create Lorentz fit and live model build
     fit = LorentzianModel(missing='drop')
     i_vars = {'x': position_field}
+    # Buffered averages are not in the event stream, so they are passed to the
+    # model by each step instead of averaging the events of the scan
     model = LiveBuild(fit, read_field, i_vars, filters=filters,
-                      average=average, init_guess=initial_guess)
+                      average=1 if buffers else average,
+                      init_guess=initial_guess)
     # update_every=len(steps)) # Set to fit only on last step
 
     # Create per_step plan
@@ -94,13 +101,16 @@ def maximize_lorentz(detector, motor, read_field, step_size=1,
         yield from checkpoint()
         yield from abs_set(motor, step, wait=True)
         # Measure the average
-        return (yield from measure_average([motor, detector],
-                                           num=average,
-                                           filters=filters))
+        reads = (yield from averaged_read([motor, detector],
+                                          num=average,
+                                          filters=filters,
+                                          buffers=buffers))
+        if buffers:
+            model.event(dict(data=dict(reads)))
+        return reads
     # Create linear scan
     plan = list_scan([detector], motor, steps, per_step=measure)
 
-    @subs_decorator(model)
     def inner():
         # Run plan (stripping open/close run messages)
         yield from msg_mutator(plan, block_run_control)
@@ -118,6 +128,8 @@ def maximize_lorentz(detector, motor, read_field, step_size=1,
         yield from abs_set(motor, model.result.values['center'], wait=True)
 
     # Run the assembled plan
+    if not buffers:
+        inner = subs_decorator(model)(inner)
     yield from inner()
     # Return the fit
     return model
@@ -125,7 +137,8 @@ def maximize_lorentz(detector, motor, read_field, step_size=1,
 
 def rocking_curve(detector, motor, read_field, coarse_step, fine_step,
                   bounds=None, average=None, fine_space=5, initial_guess=None,
-                  position_field='user_readback', show_plot=True):
+                  position_field='user_readback', show_plot=True,
+                  buffers=None):
     """
     Travel to the maxima of a bell curve
 
@@ -177,6 +190,10 @@ def rocking_curve(detector, motor, read_field, coarse_step, fine_step,
 
     show_plot : bool, optional
         Create a plot displaying the progress of the `rocking_curve`
+
+    buffers : list, optional
+        Signal buffers of the detector fields to average instead of reading
+        the detector once per shot. See :func:`.averaged_read`
     """
     # Define bounds
     if not bounds:
@@ -198,7 +215,8 @@ def rocking_curve(detector, motor, read_field, coarse_step, fine_step,
                                             step_size=coarse_step,
                                             bounds=bounds, average=average,
                                             position_field=position_field,
-                                            initial_guess=initial_guess)
+                                            initial_guess=initial_guess,
+                                            buffers=buffers)
     except ValueError as exc:
         raise ValueError("Unable to find a proper maximum value"
                          "during rough scan") from exc
@@ -222,7 +240,8 @@ def rocking_curve(detector, motor, read_field, coarse_step, fine_step,
                                           step_size=fine_step, bounds=bounds,
                                           average=average,
                                           position_field=position_field,
-                                          initial_guess=model.result.values)
+                                          initial_guess=model.result.values,
+                                          buffers=buffers)
     except ValueError as exc:
         raise ValueError("Unable to find a proper maximum value"
                          "during fine scan") from exc
@@ -3,16 +3,122 @@ Calibration of the delay macromotor
 """
 import logging
 
+import numpy as np
 import pandas as pd
+from bluesky.plan_stubs import abs_set, checkpoint, wait
+from bluesky.utils import short_uid
 from ophyd.utils import LimitError
-from pswalker.plans import measure_average, walk_to_pixel
+from pswalker.plans import walk_to_pixel
+from pswalker.utils import field_prepend
 
 from ..utils import as_list
+from .plan_stubs import averaged_read
 from .preprocessors import return_to_start as _return_to_start
 from .scans import centroid_scan
 
 logger = logging.getLogger(__name__)
 
+# Detector to motor gradients measured by previous walks, keyed by the motor
+# name and the detector field
+_gradient_cache = {}
+
+
+def clear_gradient_cache():
+    """
+    Forgets the gradients measured by previous detector scaling walks.
+    """
+    _gradient_cache.clear()
+
+
+def _scan_fields(df_scan, detector, detector_fields=None, calib_fields=None):
+    """Returns the detector and calibration fields of a calibration scan
+    dataframe.
+
+    Fields that aren't passed are picked out of the column names, taking the
+    columns that contain the detector name as detector fields and the columns
+    ending in '_pre' as calibration fields.
+    """
+    if detector_fields is None:
+        detector_fields = [col for col in df_scan.columns
+                           if detector.name in col]
+    if calib_fields is None:
+        calib_fields = [col[:-4] for col in df_scan.columns
+                        if col.endswith("_pre")]
+    detector_fields = as_list(detector_fields)
+    calib_fields = as_list(calib_fields)
+    if len(detector_fields) != len(calib_fields):
+        raise ValueError("Must have same number of calibration fields as "
+                         "detector fields, but got {0} and {1}.".format(
+                             len(calib_fields), len(detector_fields)))
+    return detector_fields, calib_fields
+
+
+def estimate_gradients(df_scan, detector_fields, calib_fields):
+    """Estimates the detector to calibration motor gradients from a centroid
+    scan using a least squares line fit.
+
+    The gradient of a field can only be estimated if its calibration motor
+    positions vary over the scan, otherwise it is returned as None.
+
+    Parameters
+    ----------
+    df_scan : pd.DataFrame
+        Dataframe containing the results of a centroid scan performed using the
+        detector, motor, and calibration motors.
+
+    detector_fields : list
+        Detector fields in the scan dataframe
+
+    calib_fields : list
+        Calibration motor fields matching each detector field, without the
+        '_pre' suffix
+
+    Returns
+    -------
+    gradients : list
+        List of gradients in units of detector value / motor egu, or None for
+        the fields that could not be estimated.
+    """
+    gradients = []
+    for dfld, cfld in zip(detector_fields, calib_fields):
+        positions = np.asarray(df_scan[cfld+"_pre"], dtype=float)
+        values = np.asarray(df_scan[dfld], dtype=float)
+        if len(positions) < 2 or np.ptp(positions) <= 0:
+            gradients.append(None)
+            continue
+        gradient = np.polyfit(positions, values, 1)[0]
+        gradients.append(gradient if np.isfinite(gradient) and gradient
+                         else None)
+    return gradients
+
+
+def _initial_gradients(df_scan, detector_fields, calib_fields, calib_motors,
+                       gradients):
+    """
+    Fills in the gradients that weren't passed using the scan data first and
+    then the gradients measured by previous walks.
+    """
+    estimates = estimate_gradients(df_scan, detector_fields, calib_fields)
+    filled = []
+    for grad, est, dfld, cmotor in zip(gradients, estimates, detector_fields,
+                                       calib_motors):
+        if grad is None:
+            grad = est
+        if grad is None:
+            grad = _gradient_cache.get((cmotor.name, dfld))
+        filled.append(grad)
+    logger.debug("Using initial gradients {0}".format(filled))
+    return filled
+
+
+def _cache_gradients(detector_fields, calib_motors, scaling):
+    """
+    Saves the gradients measured by a walk for the next calibrations.
+    """
+    for dfld, cmotor, scale in zip(detector_fields, calib_motors, scaling):
+        if np.isfinite(scale) and scale:
+            _gradient_cache[(cmotor.name, dfld)] = 1 / scale
+
 
 def calibrate_motor(detector, detector_fields, motor, motor_fields,
                     calib_motors, calib_fields, start, stop, steps,
@@ -93,7 +199,8 @@ def calibrate_motor(detector, detector_fields, motor, motor_fields,
 def calibration_scan(detector, detector_fields, motor, motor_fields,
                      calib_motors, calib_fields, start, stop, steps,
                      first_step=0.01, average=None, filters=None,
-                     return_to_start=True, *args, **kwargs):
+                     return_to_start=True, *args, archive=None,
+                     buffers=None, **kwargs):
     """Performs a calibration scan for the main motor and returns a correction
     table for the calibration motors.
 
@@ -149,6 +256,13 @@ def calibration_scan(detector, detector_fields, motor, motor_fields,
         Move all the motors to their original positions after the scan has been
         completed
 
+    archive : :class:`.ScanArchive`, optional
+        Archive to record every step of the centroid scan in. Keyword only
+
+    buffers : list, optional
+        Signal buffers of the detector fields to average instead of reading
+        the detector once per shot. See :func:`.averaged_read`. Keyword only
+
     Returns
     -------
     df_calibration : pd.DataFrame
@@ -178,6 +292,10 @@ def calibration_scan(detector, detector_fields, motor, motor_fields,
         raise ValueError("Must have same number of calibration fields as "
                          "detector fields.")
 
+    # Columns of the detector fields in the scan dataframe
+    scan_fields = [field_prepend(fld, detector)
+                   for fld in as_list(detector_fields)]
+
     @_return_to_start(motor, *calib_motors, perform=return_to_start)
     def inner():
         # Perform the main scan, reading the positions of all the devices
@@ -189,7 +307,10 @@ def calibration_scan(detector, detector_fields, motor, motor_fields,
             motor_fields=motor_fields,
             calib_fields=calib_fields,
             average=average,
-            filters=filters)
+            filters=filters,
+            archive=archive,
+            buffers=buffers,
+            md=dict(plan='calibration_scan'))
 
         # Find the distance per detector value scaling and initial positions
         scaling, start_positions = yield from detector_scaling_walk(
@@ -200,11 +321,16 @@ def calibration_scan(detector, detector_fields, motor, motor_fields,
             average=average,
             filters=filters,
             system=[motor],
+            buffers=buffers,
+            detector_fields=scan_fields,
+            calib_fields=calib_fields,
             *args, **kwargs)
 
         # Build the calibration table
-        df_calibration = build_calibration_df(df_scan, scaling, start_positions,
-                                              detector)
+        df_calibration = build_calibration_df(
+            df_scan, scaling, start_positions, detector,
+            detector_fields=scan_fields, calib_fields=calib_fields,
+            motor_fields=motor_fields)
 
         logger.debug("Completed calibration scan.")
         return df_calibration, df_scan, scaling, start_positions
@@ -283,7 +409,9 @@ def calibration_centroid_scan(detector, motor, calib_motors, start, stop, steps,
 def detector_scaling_walk(df_scan, detector, calib_motors,
                           first_step=0.01, average=None, filters=None,
                           tolerance=1, delay=None, max_steps=5, system=None,
-                          drop_missing=True, gradients=None, *args, **kwargs):
+                          drop_missing=True, gradients=None, *args,
+                          concurrent=False, buffers=None, detector_fields=None,
+                          calib_fields=None, **kwargs):
     """Performs a walk to to the detector value farthest from the current value
     using each of calibration motors, and then determines the motor to detector
     scaling
@@ -328,7 +456,27 @@ def detector_scaling_walk(df_scan, detector, calib_motors,
 
     gradients : float, optional
         Assume an initial gradient for the relationship between detector value
-        and calibration motor position
+        and calibration motor position. Gradients that aren't passed are
+        estimated from the scan if the calibration motors moved during it, or
+        taken from the previous walk of the same motor and field.
+
+    concurrent : bool, optional
+        Walk all the calibration motors at the same time, sharing one averaged
+        measurement per step between them. Only valid when each detector field
+        responds to its own calibration motor alone. Keyword only.
+
+    buffers : list, optional
+        Signal buffers of the detector fields to average instead of reading
+        the detector once per shot. The walks to each pixel still read the
+        detector once per shot. Keyword only.
+
+    detector_fields : list, optional
+        Detector fields in the scan dataframe. Defaults to the columns that
+        contain the detector name. Keyword only.
+
+    calib_fields : list, optional
+        Calibration motor fields matching each detector field, without the
+        '_pre' suffix. Defaults to the columns ending in '_pre'. Keyword only.
 
     Returns
     -------
@@ -338,12 +486,8 @@ def detector_scaling_walk(df_scan, detector, calib_motors,
     start_positions : list
         List of the initial positions of the motors before the walk
     """
-    detector_fields = [col for col in df_scan.columns if detector.name in col]
-    calib_fields = [col[:-4] for col in df_scan.columns if col.endswith("_pre")]
-    if len(detector_fields) != len(calib_fields):
-        raise ValueError("Must have same number of calibration fields as "
-                         "detector fields, but got {0} and {1}.".format(
-                             len(calib_fields), len(detector_fields)))
+    detector_fields, calib_fields = _scan_fields(
+        df_scan, detector, detector_fields, calib_fields)
 
     # Perform all the initial necessities
     num = len(detector_fields)
@@ -351,10 +495,19 @@ def detector_scaling_walk(df_scan, detector, calib_motors,
     calib_motors = as_list(calib_motors)
     first_step = as_list(first_step, num, float)
     tolerance = as_list(tolerance, num)
-    gradients = as_list(gradients, num)
+    gradients = _initial_gradients(df_scan, detector_fields, calib_fields,
+                                   calib_motors, as_list(gradients, num))
     max_steps = as_list(max_steps, num)
     system = as_list(system or []) + calib_motors
 
+    if concurrent:
+        scaling, start_positions = yield from _concurrent_scaling_walk(
+            df_scan, detector, detector_fields, calib_motors, calib_fields,
+            system, first_step, tolerance, gradients, max_steps, average,
+            filters, delay, drop_missing, buffers)
+        _cache_gradients(detector_fields, calib_motors, scaling)
+        return scaling, start_positions
+
     # Define the list that will hold the scaling
     scaling, start_positions = [], []
 
@@ -367,9 +520,12 @@ def detector_scaling_walk(df_scan, detector, calib_motors,
         inp_system.remove(cmotor)
 
         # Store the current motor and detector value and position
-        reads = yield from measure_average([detector]+system,
-                                           num=average,
-                                           filters=filters)
+        reads = yield from averaged_read([detector]+system,
+                                         num=average,
+                                         filters=filters,
+                                         delay=delay,
+                                         drop_missing=drop_missing,
+                                         buffers=buffers)
         motor_start = reads[cfld]
         dfld_start = reads[dfld]
 
@@ -387,7 +543,7 @@ def detector_scaling_walk(df_scan, detector, calib_motors,
                 target_fields=[dfld, cfld],
                 first_step=first_step[i], tolerance=tolerance[i],
                 system=inp_system, average=average, max_steps=max_steps[i],
-                **kwargs
+                delay=delay, drop_missing=drop_missing, **kwargs
             )
 
         except RuntimeError:
@@ -400,22 +556,131 @@ def detector_scaling_walk(df_scan, detector, calib_motors,
                            "calculation.".format(cmotor.desc, cmotor.position))
 
         # Get the positions and values we moved to
-        reads = (yield from measure_average([detector]+system,
-                                            num=average,
-                                            filters=filters))
+        reads = (yield from averaged_read([detector]+system,
+                                          num=average,
+                                          filters=filters,
+                                          delay=delay,
+                                          drop_missing=drop_missing,
+                                          buffers=buffers))
         motor_end = reads[cfld]
         dfld_end = reads[dfld]
 
         # Now lets find the conversion from signal value to motor distance
-        scaling.append((motor_end - motor_start)/(dfld_end - dfld_start))
+        scaling.append(_scaling(cmotor, dfld, motor_end - motor_start,
+                                dfld_end - dfld_start))
         # Add the starting position to the motor start list
         start_positions.append(motor_start)
 
+    # Remember the measured gradients for the next calibration
+    _cache_gradients(detector_fields, calib_motors, scaling)
+
     # Return the final scaling list
     return scaling, start_positions
 
 
-def build_calibration_df(df_scan, scaling, start_positions, detector):
+def _concurrent_scaling_walk(df_scan, detector, detector_fields, calib_motors,
+                             calib_fields, system, first_step, tolerance,
+                             gradients, max_steps, average, filters, delay,
+                             drop_missing, buffers):
+    """Walks every calibration motor towards its farthest detector value at the
+    same time, then determines the motor to detector scaling.
+
+    Each step moves all the motors that haven't reached their targets together
+    and then takes a single averaged measurement that is used by all of them,
+    so the number of measurements does not grow with the number of motors. The
+    steps use the secant method on each motor independently, which is why the
+    detector fields must be decoupled.
+
+    See ``detector_scaling_walk`` for the parameters and return values.
+    """
+    num = len(calib_motors)
+    reads = yield from averaged_read([detector]+system, num=average,
+                                     filters=filters, delay=delay,
+                                     drop_missing=drop_missing,
+                                     buffers=buffers)
+    start_positions = [reads[cfld] for cfld in calib_fields]
+    dfld_starts = [reads[dfld] for dfld in detector_fields]
+
+    # Get the farthest detector value we know we can move to for each field
+    targets = [df_scan[dfld].iloc[abs(df_scan[dfld] - start).values.argmax()]
+               for dfld, start in zip(detector_fields, dfld_starts)]
+    positions, values = list(start_positions), list(dfld_starts)
+    gradients = list(gradients)
+    steps = [0] * num
+    active = [abs(val - target) > tol
+              for val, target, tol in zip(values, targets, tolerance)]
+
+    while any(active):
+        yield from checkpoint()
+        # Move every active motor at once
+        group = short_uid('walk')
+        new_positions = list(positions)
+        for i in range(num):
+            if not active[i]:
+                continue
+            if gradients[i]:
+                new_positions[i] = (positions[i] +
+                                    (targets[i] - values[i]) / gradients[i])
+            else:
+                new_positions[i] = positions[i] + first_step[i]
+            try:
+                yield from abs_set(calib_motors[i], new_positions[i],
+                                   group=group)
+            except LimitError:
+                logger.warning("Walk tried to exceed the limits of motor "
+                               "'{0}'. Using its current position for scale "
+                               "calculation.".format(calib_motors[i].name))
+                active[i] = False
+        yield from wait(group=group)
+
+        # One measurement for all the motors
+        reads = yield from averaged_read([detector]+system, num=average,
+                                         filters=filters, delay=delay,
+                                         drop_missing=drop_missing,
+                                         buffers=buffers)
+        for i, (dfld, cfld) in enumerate(zip(detector_fields, calib_fields)):
+            if not active[i]:
+                continue
+            steps[i] += 1
+            new_value, new_position = reads[dfld], reads[cfld]
+            if new_position != positions[i]:
+                gradients[i] = ((new_value - values[i]) /
+                                (new_position - positions[i]))
+            positions[i], values[i] = new_position, new_value
+            if abs(values[i] - targets[i]) <= tolerance[i]:
+                active[i] = False
+            elif steps[i] >= max_steps[i]:
+                logger.warning("Walk of motor '{0}' did not converge in {1} "
+                               "steps. Using its current position for scale "
+                               "calculation.".format(calib_motors[i].name,
+                                                     max_steps[i]))
+                active[i] = False
+
+    # The last measurement holds the end positions of every motor
+    scaling = [_scaling(cmotor, dfld, reads[cfld] - motor_start,
+                        reads[dfld] - dfld_start)
+               for cmotor, cfld, dfld, motor_start, dfld_start in zip(
+                   calib_motors, calib_fields, detector_fields,
+                   start_positions, dfld_starts)]
+    return scaling, start_positions
+
+
+def _scaling(motor, detector_field, motor_step, detector_step):
+    """Returns the motor to detector scaling of a walk, or zero if the
+    detector field did not change, so the calibration does not correct that
+    field rather than dividing by zero.
+    """
+    if not detector_step:
+        logger.warning("Detector field '{0}' did not change while walking "
+                       "motor '{1}', so it will not be corrected by the "
+                       "calibration.".format(detector_field, motor.name))
+        return 0.
+    return motor_step / detector_step
+
+
+def build_calibration_df(df_scan, scaling, start_positions, detector,
+                         detector_fields=None, calib_fields=None,
+                         motor_fields=None):
     """Takes the scan dataframe, scaling, and starting positions to build a
     calibration table for the calibration motors.
 
@@ -438,35 +703,45 @@ def build_calibration_df(df_scan, scaling, start_positions, detector):
     detector : :class:`.Detector`
         Detector from which to take the value measurements
 
+    detector_fields : list, optional
+        Detector fields in the scan dataframe. Defaults to the columns that
+        contain the detector name.
+
+    calib_fields : list, optional
+        Calibration motor fields matching each detector field, without the
+        '_pre' suffix. Defaults to the columns ending in '_pre'.
+
+    motor_fields : list, optional
+        Scan motor fields to put in the calibration table. Defaults to the
+        columns that are neither detector nor calibration fields.
+
     Returns
     -------
     df_calibration : pd.DataFrame
         Calibration dataframe that has all the scan motor fields and the
         corrections required of the calibration motors in both absolute and
-        relative corrections.
+        relative corrections. Every column is float64.
     """
     # Get the fields being used in the scan df
-    detector_fields = [col for col in df_scan.columns if detector.name in col]
-    calib_fields = [col[:-4] for col in df_scan.columns if col.endswith("_pre")]
-    motor_fields = [col for col in df_scan.columns
-                    if col not in detector_fields and not col.endswith("_pre")]
-
-    # Ensure these two are equal
-    if len(detector_fields) != len(calib_fields):
-        raise ValueError("Must have same number of calibration fields as "
-                         "detector fields, but got {0} and {1}.".format(
-                             len(calib_fields), len(detector_fields)))
-
-    df_corrections = pd.DataFrame(index=df_scan.index)
-
-    # Use the conversion to create an expected correction table
-    for scale, start, cfld, dfld in zip(scaling, start_positions, calib_fields,
-                                        detector_fields):
-        # Absolute move to make to perform correction for this motor
-        df_corrections[cfld+"_post"] = \
-            start - (df_scan[dfld] - df_scan[dfld].iloc[0]) * scale
-
-    # Put together the calibration table
-    df_calibration = pd.concat([df_scan[motor_fields], df_corrections], axis=1)
+    detector_fields, calib_fields = _scan_fields(
+        df_scan, detector, detector_fields, calib_fields)
+    if motor_fields is None:
+        pre_fields = [cfld+"_pre" for cfld in calib_fields]
+        motor_fields = [col for col in df_scan.columns
+                        if col not in detector_fields + pre_fields]
+    motor_fields = as_list(motor_fields)
+
+    # Absolute move to make to perform the correction for every motor at every
+    # step, broadcasting the scales and starts across the steps
+    detector_values = df_scan[detector_fields].to_numpy(dtype=float)
+    corrections = (np.asarray(start_positions, dtype=float) -
+                   (detector_values - detector_values[0]) *
+                   np.asarray(scaling, dtype=float))
+
+    # Put together the calibration table as a single float block
+    df_calibration = pd.DataFrame(
+        np.hstack([df_scan[motor_fields].to_numpy(dtype=float), corrections]),
+        index=df_scan.index,
+        columns=motor_fields + [cfld+"_post" for cfld in calib_fields])
 
     return df_calibration
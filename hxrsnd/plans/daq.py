@@ -0,0 +1,163 @@
+"""
+DAQ scans for HXRSnD
+"""
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+from bluesky import Msg
+from bluesky.plan_stubs import abs_set, checkpoint
+from bluesky.plan_stubs import wait as plan_wait
+from bluesky.plan_stubs import trigger_and_read
+from bluesky.plans import scan
+from bluesky.preprocessors import finalize_wrapper
+from bluesky.utils import short_uid as _short_uid
+
+from .preprocessors import return_to_start as _return_to_start
+
+logger = logging.getLogger(__name__)
+
+# Columns of the per-step timing returned by the DAQ scans
+TIMING_COLUMNS = ['move', 'acquire', 'overhead', 'total']
+
+
+def update_notepad(notepad, **values):
+    """
+    Sets several notepad fields at once, waiting once for all of the puts.
+
+    Parameters
+    ----------
+    notepad : :class:`.NotepadScanStatus`
+        Notepad PVs of the scan.
+
+    values : dict
+        Field names of the notepad mapped to their new values.
+    """
+    group = _short_uid('notepad')
+    for field, value in values.items():
+        yield from abs_set(getattr(notepad, field), value, group=group)
+    yield from plan_wait(group=group)
+
+
+def daq_ascan(daq, motor, start, stop, num, events_per_point=360,
+              record=False, controls=None, notepad=None, return_to_start=True,
+              md=None, **kwargs):
+    """
+    Step scan of a motor that takes a fixed number of DAQ events at each step.
+
+    The DAQ is configured once before the scan, and each step only moves the
+    motor and triggers the DAQ, which begins the acquisition with the current
+    values of the controls. The notepad PVs are filled in a single batch
+    before the scan and reset in a single batch afterwards, and the step
+    number is set alongside the motor move.
+
+    Parameters
+    ----------
+    daq : :class:`pcdsdaq.daq.Daq`
+        DAQ to acquire with at every step.
+
+    motor : object
+        Any 'setable' object (motor, temp controller, etc.)
+
+    start : float
+        Starting position of the motor.
+
+    stop : float
+        Ending position of the motor.
+
+    num : int
+        Number of steps.
+
+    events_per_point : int, optional
+        Number of DAQ events to take at each step.
+
+    record : bool, optional
+        Record the data taken by the DAQ.
+
+    controls : dict, optional
+        Additional names and devices to record in the DAQ as control
+        variables. The motor is always included.
+
+    notepad : :class:`.NotepadScanStatus`, optional
+        Notepad PVs to publish the status of the scan in.
+
+    return_to_start : bool, optional
+        Move the motor back to its initial position after the scan.
+
+    md : dict, optional
+        Metadata of the scan.
+
+    **kwargs
+        Passed to the ``set`` of the motor at every step, e.g.
+        ``verify_move=False``.
+
+    Returns
+    -------
+    timing : pd.DataFrame
+        Seconds spent at each step moving, acquiring, in everything else and
+        in total, indexed by the target positions. Each step is counted from
+        the end of the previous acquisition, and the overhead is the time
+        between it and the start of the move.
+    """
+    scan_controls = {motor.name: motor}
+    scan_controls.update(controls or {})
+    steps = np.linspace(start, stop, num)
+    timing = pd.DataFrame(np.nan, index=steps, columns=TIMING_COLUMNS)
+    # End of the previous acquisition, so the time between steps is counted
+    last = [None]
+    _md = {'plan_name': 'daq_ascan',
+           'events_per_point': events_per_point}
+    _md.update(md or {})
+
+    def step_index(position):
+        # Found from the position rather than counted, so a step that is run
+        # again after a pause keeps its index. Repeated positions take the
+        # first row that has not been timed yet
+        rows = np.flatnonzero(np.isclose(steps, position))
+        untimed = [row for row in rows if np.isnan(timing.iat[row, -1])]
+        return int((untimed or rows)[0])
+
+    def per_step(detectors, step, pos_cache):
+        i = step_index(step[motor])
+        logger.info("Step {0}: Moving to {1}".format(i+1, step[motor]))
+        t0 = last[0] or time.time()
+        yield from checkpoint()
+        grp = _short_uid('set')
+        t_move = time.time()
+        yield Msg('set', motor, step[motor], group=grp, **kwargs)
+        if notepad is not None:
+            yield Msg('set', notepad.istep, i, group=grp)
+        yield Msg('wait', None, group=grp)
+        t1 = time.time()
+        # Triggering the DAQ begins the run and finishes with the events
+        yield from trigger_and_read(list(detectors) + [motor])
+        t2 = last[0] = time.time()
+        timing.iloc[i] = [t1 - t_move, t2 - t1, np.nan, t2 - t0]
+
+    def cleanup():
+        if notepad is not None:
+            yield from update_notepad(notepad, **notepad.defaults)
+        # Unstaging the DAQ ends the run if one was begun
+        yield Msg('unstage', daq)
+
+    @_return_to_start(motor, perform=return_to_start)
+    def inner():
+        # The DAQ only needs to be configured once for the whole scan
+        yield Msg('configure', daq, events=events_per_point, record=record,
+                  controls=scan_controls)
+        if notepad is not None:
+            yield from update_notepad(
+                notepad, isscan=1, nshots=events_per_point, nsteps=num,
+                var0=motor.name, var0_max=max(start, stop),
+                var0_min=min(start, stop))
+        yield from scan([daq], motor, start, stop, num, per_step=per_step,
+                        md=_md)
+
+    yield from finalize_wrapper(inner(), cleanup())
+
+    timing['overhead'] = timing['total'] - timing['move'] - timing['acquire']
+    logger.info("Scan complete. Average step of {0:.3f}s with {1:.3f}s "
+                "outside of the moves and acquisitions.".format(
+                    timing['total'].mean(), timing['overhead'].mean()))
+    return timing
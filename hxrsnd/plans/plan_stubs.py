@@ -2,9 +2,13 @@
 Small plans used in HXRSnD
 """
 
+import asyncio
 import logging
 import math
+import time
+from functools import partial
 
+from bluesky.plan_stubs import wait_for
 from pswalker.plans import measure_average
 from pswalker.utils import field_prepend
 
@@ -26,7 +30,7 @@ def block_run_control(msg):
 
 
 def euclidean_distance(device, device_fields, targets, average=None,
-                       filters=None):
+                       filters=None, buffers=None):
     """
     Calculates the euclidean distance between the device_fields and targets.
 
@@ -44,6 +48,14 @@ def euclidean_distance(device, device_fields, targets, average=None,
     average : int, optional
         Number of averages to take for each measurement
 
+    filters : dict, optional
+        Key, callable pairs of event keys and single input functions that
+        evaluate to True for the shots to use
+
+    buffers : list, optional
+        Signal buffers to average the shots of instead of reading the fields
+        once per shot. See :func:`.averaged_read`
+
     Returns
     -------
     distance : float
@@ -64,10 +76,167 @@ def euclidean_distance(device, device_fields, targets, average=None,
             "Got {0} and {1}".format(len(device_fields), len(targets))
         )
     # Measure the average
-    read = (yield from measure_average([device], num=average, filters=filters))
+    read = (yield from averaged_read([device], num=average, filters=filters,
+                                     buffers=buffers))
     # Get the squared differences between the centroids
     squared_differences = [(read[fld]-target)**2 for fld, target in zip(
         prep_dev_fields, targets)]
     # Combine into euclidean distance
     distance = math.sqrt(sum(squared_differences))
     return distance
+
+
+def averaged_read(devices, num=1, filters=None, delay=None,
+                  drop_missing=True, buffers=None, timeout=None):
+    """
+    Takes an averaged reading of the devices, averaging the shots of the signal
+    buffers for the fields that have one.
+
+    Without buffers this is ``measure_average``. With buffers, the devices are
+    read once for the fields that are not buffered, such as the motor
+    positions, and the buffered fields are replaced by the average of the
+    shots that arrive after that read.
+
+    Parameters
+    ----------
+    devices : list
+        Devices to read.
+
+    num : int, optional
+        Number of shots to average.
+
+    filters : dict, optional
+        Key, callable pairs of event keys and single input functions that
+        evaluate to True for the shots to use.
+
+    delay : float, optional
+        Time to wait inbetween reads when the devices are read once per shot.
+
+    drop_missing : bool, optional
+        Choice to include events where event keys are missing.
+
+    buffers : :class:`.SignalBuffer`, list or dict, optional
+        Buffers of the signals to average. See :func:`.buffered_average`.
+
+    timeout : float, optional
+        Maximum time in seconds to wait for the buffered shots.
+
+    Returns
+    -------
+    average : dict
+        Dictionary of the average values keyed by the field names.
+    """
+    if not buffers:
+        return (yield from measure_average(devices, num=num, filters=filters,
+                                           delay=delay,
+                                           drop_missing=drop_missing))
+    read = yield from measure_average(devices, num=1,
+                                      drop_missing=drop_missing)
+    read.update((yield from buffered_average(buffers, num=num,
+                                             filters=filters,
+                                             timeout=timeout)))
+    return read
+
+
+def buffered_average(buffers, num=1, filters=None, fresh=True, timeout=None):
+    """
+    Averages the shots collected by signal buffers rather than triggering and
+    reading the detectors once per shot. The plan only waits for the shots
+    that have not arrived yet, so a large number of averages costs no more
+    than the time the shots take to come in.
+
+    Shots are selected by the order they arrived in rather than by their
+    timestamps, which come from the clock of the IOC and cannot be compared
+    with the local time.
+
+    Parameters
+    ----------
+    buffers : :class:`.SignalBuffer`, list or dict
+        Buffers to average. A dictionary, such as the one returned by
+        :meth:`.DiodeIO.start_buffers`, is averaged over its values.
+
+    num : int, optional
+        Minimum number of shots to average for each buffer. Every shot that
+        passes the filters is used, so more than num shots are averaged if
+        they arrived while waiting on the other buffers.
+
+    filters : dict, optional
+        Key, callable pairs of signal names and single input functions that
+        evaluate to True for the shots to use. Unlike ``measure_average``, the
+        buffers are not aligned shot by shot, so each filter only applies to
+        the shots of its own signal.
+
+    fresh : bool, optional
+        Only use the shots that arrive after the plan starts, so shots from
+        before a preceding move are not used. Pass False to also use the shots
+        that are already in the buffers.
+
+    timeout : float, optional
+        Maximum time in seconds to wait for the shots to arrive.
+
+    Returns
+    -------
+    average : dict
+        Dictionary of the average values keyed by the signal names.
+
+    Raises
+    ------
+    TimeoutError
+        If the shots did not arrive before the timeout.
+    """
+    if isinstance(buffers, dict):
+        buffers = list(buffers.values())
+    buffers = as_list(buffers)
+    filters = filters or dict()
+    # Total number of shots each buffer had before the ones we can use
+    first = [buf.total if fresh else buf.total - len(buf) for buf in buffers]
+
+    def selection(buf, start):
+        return dict(num=buf.total - start, filt=filters.get(buf.signal.name))
+
+    # Wait for enough shots in every buffer, waking up on every new shot
+    deadline = None if timeout is None else time.time() + timeout
+    while True:
+        # Count the shots before checking them so none can be missed
+        totals = [buf.total for buf in buffers]
+        waiting = [(buf, total)
+                   for buf, start, total in zip(buffers, first, totals)
+                   if buf.count(**selection(buf, start)) < num]
+        if not waiting:
+            break
+        remaining = None
+        if deadline is not None:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError("Did not receive {0} shots from {1} within "
+                                   "{2}s.".format(
+                                       num, [buf.signal.name
+                                             for buf, _ in waiting], timeout))
+        yield from wait_for([partial(_next_shot, waiting, remaining)])
+
+    return {buf.signal.name: buf.mean(**selection(buf, start))
+            for buf, start in zip(buffers, first)}
+
+
+async def _next_shot(waiting, timeout):
+    """
+    Returns once any of the buffers has more shots than its total in the
+    inputted (buffer, total) pairs, or after the timeout.
+    """
+    loop = asyncio.get_event_loop()
+    event = asyncio.Event()
+
+    def wake():
+        # The buffers call this from the thread of the signal monitors
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(event.set)
+
+    for buf, _ in waiting:
+        buf.call_on_next(wake)
+    # A shot may have arrived before the callbacks were added
+    if any(buf.total != total for buf, total in waiting):
+        return
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
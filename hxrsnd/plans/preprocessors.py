@@ -1,29 +1,182 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import ExitStack
 from functools import wraps
 
 from bluesky.plan_stubs import abs_set
 from bluesky.plan_stubs import wait as plan_wait
-from bluesky.utils import short_uid
+from bluesky.plan_stubs import wait_for
+from bluesky.preprocessors import plan_mutator
+from bluesky.utils import Msg, make_decorator, short_uid
 
+logger = logging.getLogger(__name__)
 
-def return_to_start(*devices, perform=True):
+
+def _status_waiter(status):
+    """
+    Returns a function that makes an awaitable of the status object, for the
+    RunEngine to wait on with a ``wait_for`` message.
+    """
+    async def wait():
+        loop = asyncio.get_event_loop()
+        done = asyncio.Event()
+        status.add_callback(
+            lambda *args, **kwargs: loop.call_soon_threadsafe(done.set))
+        await done.wait()
+    return wait
+
+
+def _wait_for_pending(pending, devices):
+    """
+    Waits for the pending returns of the inputted devices, only removing them
+    from ``pending`` once they have been waited on.
+    """
+    waiting = [(dev, pending[dev]) for dev in devices if dev in pending]
+    if not waiting:
+        return
+    yield from wait_for([_status_waiter(status) for _, status in waiting])
+    for dev, status in waiting:
+        # Leave any return that was started while waiting
+        if pending.get(dev) is status:
+            del pending[dev]
+        if not status.success:
+            logger.warning("Device '{0}' failed to return to its starting "
+                           "position.".format(dev.name))
+
+
+def wait_for_returns(*devices):
+    """
+    Waits for return moves started by ``return_to_start(wait=False)`` to
+    finish.
+
+    The pending returns are kept by ``wait_for_returns_wrapper``, so this only
+    waits on the returns started inside the plan it wraps, or in any plan run
+    by a RunEngine with ``pending_returns_preprocessor`` installed.
+
+    Parameters
+    ----------
+    devices : devices, optional
+        Devices to wait for. Waits for every pending return if none are
+        inputted.
+    """
+    yield Msg('null', None, wait_returns=devices)
+
+
+def wait_for_returns_wrapper(plan, pending=None):
+    """
+    Keeps track of the return moves started by ``return_to_start(wait=False)``
+    in the plan, and waits for the pending return move of a device before any
+    set of it, so a move never races a return.
+
+    Parameters
+    ----------
+    plan : iterable or iterator
+        Plan to wrap.
+
+    pending : OrderedDict, optional
+        Status objects of the pending returns keyed by device, shared with
+        other plans. Defaults to an empty one that only lives as long as the
+        plan. See ``pending_returns_preprocessor``.
+    """
+    pending = OrderedDict() if pending is None else pending
+
+    def insert_wait(msg):
+        if msg.command == 'null' and 'returns' in msg.kwargs:
+            pending.update(msg.kwargs['returns'])
+            return None, None
+        if msg.command == 'null' and 'wait_returns' in msg.kwargs:
+            devices = msg.kwargs['wait_returns'] or list(pending)
+        elif msg.command == 'set' and msg.obj in pending:
+            devices = [msg.obj]
+        else:
+            return None, None
+        if not any(dev in pending for dev in devices):
+            return None, None
+
+        def wait_then_send():
+            yield from _wait_for_pending(pending, devices)
+            return (yield msg)
+        return wait_then_send(), None
+    return (yield from plan_mutator(plan, insert_wait))
+
+
+wait_for_returns_decorator = make_decorator(wait_for_returns_wrapper)
+
+
+def pending_returns_preprocessor():
+    """
+    Returns a preprocessor for ``RE.preprocessors`` that wraps every plan of
+    the RunEngine with ``wait_for_returns_wrapper``, keeping the pending
+    returns from one plan to the next. Without it, a return started with
+    ``return_to_start(wait=False)`` is only waited on by the rest of the plan
+    that started it.
+
+    Returns
+    -------
+    preprocessor : callable
+        Function that takes a plan and returns the wrapped plan.
+    """
+    pending = OrderedDict()
+
+    def preprocessor(plan):
+        return (yield from wait_for_returns_wrapper(plan, pending=pending))
+    return preprocessor
+
+
+def _snapshot_positions(devices):
+    """
+    Returns the positions of all the inputted devices. Devices of the same
+    system are read under one ``consistent_reads`` context, so every signal
+    is only read once and the positions come from a single snapshot.
+    """
+    with ExitStack() as stack:
+        roots = []
+        for dev in devices:
+            root = getattr(dev, 'root', dev)
+            if hasattr(root, 'consistent_reads') and root not in roots:
+                roots.append(root)
+                stack.enter_context(root.consistent_reads())
+        return OrderedDict((dev, dev.position) for dev in devices)
+
+
+def return_to_start(*devices, perform=True, wait=True):
     """
     Decorator that will find the current positions of all the inputted devices,
     and them move them back to those positions after running the inner plan.
+
+    With ``wait=False`` the return moves are started but not waited on, so
+    whatever runs next can get going while the devices travel home. The
+    returns are kept by the enclosing ``wait_for_returns_wrapper``, or by
+    ``pending_returns_preprocessor`` across the plans of a RunEngine. Any
+    later ``return_to_start`` on the same devices then waits for their return
+    before taking its own starting positions, and so do the sets of the
+    devices.
     """
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
+            # A previous plan may still be bringing these devices home
+            if devices:
+                yield from wait_for_returns(*devices)
             # Get the initial positions of all the inputted devices
-            initial_positions = {dev: dev.position for dev in devices}
+            initial_positions = _snapshot_positions(devices)
             try:
-                return (yield from func(*args, **kwargs))
+                return (yield from wait_for_returns_wrapper(
+                    func(*args, **kwargs)))
             finally:
                 # Start returning all the devices to their initial positions
                 if perform:
                     group = short_uid('set')
+                    returns = OrderedDict()
                     for dev, pos in initial_positions.items():
-                        yield from abs_set(dev, pos, group=group)
-                    # Wait for all the moves to finish if they haven't already
-                    yield from plan_wait(group=group)
+                        returns[dev] = yield from abs_set(dev, pos,
+                                                          group=group)
+                    # Wait for all the moves to finish if they haven't already,
+                    # or hand them to the wait_for_returns_wrapper around us
+                    if wait:
+                        yield from plan_wait(group=group)
+                    else:
+                        yield Msg('null', None, returns=returns)
         return wrapper
     return decorator
@@ -10,17 +10,17 @@ from bluesky.plan_stubs import abs_set, checkpoint, trigger_and_read
 from bluesky.plans import scan
 from bluesky.preprocessors import run_decorator, stub_wrapper
 from bluesky.utils import short_uid as _short_uid
-from pswalker.plans import measure_average
 from pswalker.utils import field_prepend
 
 from ..utils import as_list
+from .plan_stubs import averaged_read
 from .preprocessors import return_to_start as _return_to_start
 
 logger = logging.getLogger(__name__)
 
 
 def linear_scan(motor, start, stop, num, use_diag=True, return_to_start=True,
-                md=None, *args, **kwargs):
+                md=None, *args, pipeline=False, follow=None, **kwargs):
     """
     Linear scan of a motor without a detector.
 
@@ -48,6 +48,20 @@ def linear_scan(motor, start, stop, num, use_diag=True, return_to_start=True,
 
     md : dict, optional
         metadata
+
+    pipeline : bool, optional
+        Prepare the next step while the current one is measured. The next
+        position is validated with the ``check_value`` method of the motor so
+        a bad step stops the scan before anything moves, and the ``follow``
+        axes start moving to their next positions. Keyword only.
+
+    follow : dict, optional
+        Axes that do not affect the beam, mapped to the position they should
+        be at for each step. They are moved alongside the scan motor, or during
+        the measurement of the previous step when pipelining. Keyword only.
+
+    Motors with a ``check_values`` method have all of their positions checked
+    against their soft limits at once before the scan begins.
     """
     # Save some metadata on this scan
     _md = {'motors': [motor.name],
@@ -67,23 +81,69 @@ def linear_scan(motor, start, stop, num, use_diag=True, return_to_start=True,
 
     # Build the list of steps
     steps = np.linspace(**_md['plan_pattern_args'])
+    follow = follow or {}
+    for axis, positions in follow.items():
+        if len(positions) != num:
+            raise ValueError("Got {0} positions for '{1}' in a scan of {2} "
+                             "steps.".format(len(positions), axis.name, num))
+
+    # Check the whole trajectory against the soft limits before moving
+    for axis, positions in [(motor, steps)] + list(follow.items()):
+        check_values = getattr(axis, 'check_values', None)
+        if check_values is not None:
+            check_values(positions)
 
     # Let's store this for now
     start = motor.position
 
+    def move_follow(i, grp):
+        # Start moving the axes that don't affect the beam to step i
+        for axis, positions in follow.items():
+            yield Msg('set', axis, positions[i], group=grp)
+
     # Define the inner scan
     # @stage_decorator([motor])
     @run_decorator(md=_md)
     def inner_scan():
+        grp = _short_uid('set')
+        if pipeline:
+            check_value = getattr(motor, 'check_value', None)
+            if check_value is not None:
+                check_value(steps[0])
+            yield from move_follow(0, grp)
 
         for i, step in enumerate(steps):
             logger.info("\nStep {0}: Moving to {1}".format(i+1, step))
-            grp = _short_uid('set')
             yield Msg('checkpoint')
+            if not pipeline:
+                yield from move_follow(i, grp)
             # Set wait to be false in set once the status object is implemented
             yield Msg('set', motor, step, group=grp, *args, **kwargs)
             yield Msg('wait', None, group=grp)
-            yield from trigger_and_read([motor])
+            grp = _short_uid('set')
+            if not pipeline:
+                yield from trigger_and_read([motor])
+                continue
+
+            # Get the next step ready while this one is measured
+            trig_grp = _short_uid('trigger')
+            yield Msg('trigger', motor, group=trig_grp)
+            bad_step = None
+            if i + 1 < len(steps):
+                try:
+                    if check_value is not None:
+                        check_value(steps[i+1])
+                except Exception as exc:
+                    # Keep the measurement of this step before stopping
+                    bad_step = exc
+                else:
+                    yield from move_follow(i+1, grp)
+            yield Msg('wait', None, group=trig_grp)
+            yield Msg('create', None, name='primary')
+            yield Msg('read', motor)
+            yield Msg('save')
+            if bad_step is not None:
+                raise bad_step
 
         if return_to_start:
             logger.info("\nScan complete. Moving back to starting position: {0}"
@@ -97,7 +157,8 @@ def linear_scan(motor, start, stop, num, use_diag=True, return_to_start=True,
 def centroid_scan(detector, motor, start, stop, steps, average=None,
                   detector_fields=['stats2_centroid_x', 'stats2_centroid_y'],
                   motor_fields=None, system=None, system_fields=None,
-                  filters=None, return_to_start=True, *args, **kwargs):
+                  filters=None, return_to_start=True, *args, archive=None,
+                  md=None, buffers=None, **kwargs):
     """
     Performs a scan and returns the centroids of the inputted detector.
 
@@ -145,6 +206,16 @@ def centroid_scan(detector, motor, start, stop, steps, average=None,
     return_to_start : bool, optional
         Move the scan motor back to its initial position after the scan
 
+    archive : :class:`.ScanArchive`, optional
+        Archive to record every step of the scan in. Keyword only
+
+    md : dict, optional
+        Additional metadata to archive with the scan. Keyword only
+
+    buffers : list, optional
+        Signal buffers of the detector fields to average instead of reading
+        the detector once per shot. See :func:`.averaged_read`. Keyword only
+
     Returns
     -------
     df : pd.DataFrame
@@ -168,6 +239,15 @@ def centroid_scan(detector, motor, start, stop, steps, average=None,
     # Build the dataframe with the centroids
     df = pd.DataFrame(columns=all_fields, index=np.linspace(start, stop, steps))
 
+    # Start the archive record before any motion
+    recorder = None
+    if archive is not None:
+        scan_md = dict(detector=detector.name, start=start, stop=stop,
+                       steps=steps, average=average)
+        scan_md.update(md or {})
+        recorder = archive.record(scan_md.pop('plan', 'centroid_scan'),
+                                  motor.name, all_fields, md=scan_md)
+
     # Create a basic measuring plan
     def per_step(detectors, motor, step):
         # Perform step
@@ -175,11 +255,14 @@ def centroid_scan(detector, motor, start, stop, steps, average=None,
         logger.debug("Measuring average at step {0} ...".format(step))
         yield from abs_set(motor, step, wait=True)
         # Measure the average
-        reads = (yield from measure_average(all_devices, num=average,
-                                            filters=filters, *args, **kwargs))
+        reads = (yield from averaged_read(all_devices, num=average,
+                                          filters=filters, buffers=buffers,
+                                          *args, **kwargs))
         # Fill the dataframe at this step with the centroid difference
         for fld in all_fields:
             df.loc[step, fld] = reads[fld]
+        if recorder is not None:
+            recorder.append(step, reads)
 
     # Run the inner plan
     @_return_to_start(motor, perform=return_to_start)
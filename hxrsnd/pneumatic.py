@@ -145,7 +145,11 @@ class PressureSwitch(PneuBase):
         Pressure readbac signal.
     """
     tab_whitelist = ['bad', 'good', 'position']
-    pressure = Cmp(EpicsSignalRO, ":GPS")
+    # Monitored so the state is served from the last update
+    pressure = Cmp(EpicsSignalRO, ":GPS", auto_monitor=True)
+
+    # Pressure readback values of each state
+    _states = {0: "GOOD", 1: "BAD"}
 
     @property
     def position(self):
@@ -155,15 +159,10 @@ class PressureSwitch(PneuBase):
         Returns
         -------
         position : str
-            String saying the current position of the valve. Can be "OPEN" or
-            "CLOSED".
+            String saying the current state of the pressure. Can be "GOOD",
+            "BAD" or "UNKNOWN".
         """
-        if self.pressure.get() == 0:
-            return "GOOD"
-        elif self.pressure.get() == 1:
-            return "BAD"
-        else:
-            return "UNKNOWN"
+        return self._states.get(self.pressure.get(), "UNKNOWN")
 
     @property
     def good(self):
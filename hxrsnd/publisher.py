@@ -0,0 +1,265 @@
+"""
+Soft IOC that publishes the computed SnD quantities
+
+One process that owns the :class:`.SplitAndDelay` object computes the
+energies, delay, beam path and diagnostic states, and serves them as soft PVs
+so other consoles can read a handful of scalar PVs instead of creating the
+whole system themselves::
+
+    <prefix>E1              Energy of the delay line in eV
+    <prefix>E2              Energy of the channel cut line in eV
+    <prefix>DELAY           Delay of the system in ps
+    <prefix>BEAM_PATH       Name of the current beam path
+    <prefix>DI:BLOCKED      Blocking state of each diagnostic (DI, DD, DO, DCI,
+                            DCC and DCO)
+    <prefix>STATUS          All of the above as a json string
+    <prefix>HEARTBEAT       Incremented after every update
+
+Requires caproto, which is not needed by the rest of hxrsnd.
+"""
+import asyncio
+import json
+import logging
+import math
+import threading
+
+try:
+    from caproto import ChannelType
+    from caproto.asyncio.server import Context
+    from caproto.server import PVGroup, pvproperty
+except ImportError as e:
+    raise ImportError("The SnD publisher requires caproto, which can be "
+                      "installed with 'pip install caproto'.") from e
+
+logger = logging.getLogger(__name__)
+
+# States a diagnostic can be published as
+BLOCKED_STATES = ['Clear', 'Blocked', 'Unknown']
+
+# Diagnostics of the system that have a blocked PV
+DIAGNOSTICS = ['di', 'dd', 'do', 'dci', 'dcc', 'dco']
+
+
+def _blocked_pv(name):
+    return pvproperty(name="{0}:BLOCKED".format(name.upper()),
+                      value='Unknown', dtype=ChannelType.ENUM,
+                      enum_strings=BLOCKED_STATES, read_only=True,
+                      doc="Blocking state of {0}".format(name))
+
+
+class SndStatusGroup(PVGroup):
+    """
+    Soft PVs with the computed quantities of the SnD system.
+    """
+    E1 = pvproperty(value=0.0, read_only=True, precision=3,
+                    doc="Energy of the delay line in eV")
+    E2 = pvproperty(value=0.0, read_only=True, precision=3,
+                    doc="Energy of the channel cut line in eV")
+    DELAY = pvproperty(value=0.0, read_only=True, precision=3,
+                       doc="Delay of the system in ps")
+    BEAM_PATH = pvproperty(value='Unknown', dtype=ChannelType.STRING,
+                           read_only=True, doc="Name of the beam path")
+    STATUS = pvproperty(value='', dtype=ChannelType.CHAR, max_length=4096,
+                        read_only=True,
+                        doc="Status of the system as a json string")
+    HEARTBEAT = pvproperty(value=0, read_only=True,
+                           doc="Incremented after every update")
+    di_blocked = _blocked_pv('di')
+    dd_blocked = _blocked_pv('dd')
+    do_blocked = _blocked_pv('do')
+    dci_blocked = _blocked_pv('dci')
+    dcc_blocked = _blocked_pv('dcc')
+    dco_blocked = _blocked_pv('dco')
+
+
+class SndPublisher:
+    """
+    Serves the computed quantities of an SnD system as soft PVs.
+
+    The quantities are all computed from one consistent snapshot of the
+    system every ``period`` seconds, and each PV is only written when its
+    value changes. The server runs in a background thread of the process that
+    owns the system.
+
+    Parameters
+    ----------
+    snd : :class:`.SplitAndDelay`
+        System to publish.
+
+    prefix : str
+        Prefix of the published PVs.
+
+    period : float, optional
+        Seconds between updates.
+
+    interfaces : list, optional
+        Network interfaces to serve on. Defaults to all of them, use
+        ``['127.0.0.1']`` to only serve the local host.
+    """
+    def __init__(self, snd, prefix, period=1.0, interfaces=None):
+        self.snd = snd
+        self.prefix = prefix
+        self.period = period
+        self.interfaces = interfaces
+        self.group = SndStatusGroup(prefix=prefix)
+        self._loop = None
+        self._task = None
+        self._thread = None
+        self._started = threading.Event()
+        self._error = None
+        self._last_status = None
+
+    @property
+    def pvnames(self):
+        """
+        Returns the names of the published PVs.
+        """
+        return list(self.group.pvdb)
+
+    @property
+    def running(self):
+        """
+        Returns whether the server is running.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def snapshot(self):
+        """
+        Computes every published quantity from one read of the system. See
+        :meth:`.SplitAndDelay.snapshot`.
+
+        Returns
+        -------
+        snapshot : OrderedDict
+            Energies, delay, beam path and the blocking state and position of
+            each diagnostic.
+        """
+        return self.snd.snapshot()
+
+    def start(self, timeout=5):
+        """
+        Starts serving the PVs in a background thread.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Seconds to wait for the server to start.
+        """
+        if self.running:
+            return
+        self._started.clear()
+        self._error = None
+        self._last_status = None
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name="snd_publisher")
+        self._thread.start()
+        if not self._started.wait(timeout):
+            error = self._error
+            self.stop()
+            raise RuntimeError("The SnD publisher did not publish the status "
+                               "of the system within {0}s. Last error: {1}"
+                               "".format(timeout, error))
+        logger.info("Publishing the SnD status under '{0}'.".format(
+            self.prefix))
+
+    def stop(self, timeout=5):
+        """
+        Stops the server.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Seconds to wait for the server to stop.
+        """
+        if not self.running:
+            return
+        self._loop.call_soon_threadsafe(self._task.cancel)
+        self._thread.join(timeout)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._task = self._loop.create_task(self._serve())
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            # Let the tasks of the server clean up before closing the loop
+            pending = _all_tasks(self._loop)
+            for task in pending:
+                task.cancel()
+            self._loop.run_until_complete(
+                asyncio.gather(*pending, return_exceptions=True))
+            self._loop.close()
+
+    async def _serve(self):
+        context = Context(self.group.pvdb, self.interfaces)
+        await asyncio.gather(context.run(log_pv_names=False),
+                             self._update_loop())
+
+    async def _update_loop(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            try:
+                # Reading the system blocks, so it is done off of the loop
+                snapshot = await loop.run_in_executor(None, self.snapshot)
+                await self._publish(snapshot)
+            except Exception as e:
+                self._error = e
+                logger.error("Failed to update the SnD publisher. Got error: "
+                             "{0}".format(e))
+            else:
+                # Only count as started once the PVs hold real values
+                self._started.set()
+            await asyncio.sleep(self.period)
+
+    async def _publish(self, snapshot):
+        """
+        Writes the values of a snapshot to the PVs that changed.
+        """
+        group = self.group
+        values = [(group.E1, snapshot['E1']),
+                  (group.E2, snapshot['E2']),
+                  (group.DELAY, snapshot['delay']),
+                  (group.BEAM_PATH, snapshot['beam_path'])]
+        for name, state in snapshot['diagnostics'].items():
+            if name in DIAGNOSTICS:
+                values.append((getattr(group, name + '_blocked'),
+                               _blocked_string(state['blocked'])))
+
+        for pv, value in values:
+            if isinstance(value, float) and math.isnan(value):
+                continue
+            if pv.value != value:
+                await pv.write(value)
+
+        # The snapshot timestamp changes every update, so it is left out when
+        # checking whether the status changed
+        status = {key: value for key, value in snapshot.items()
+                  if key != 'timestamp'}
+        status = json.dumps(status, default=str)
+        if status != self._last_status:
+            await group.STATUS.write(json.dumps(snapshot, default=str))
+            self._last_status = status
+        await group.HEARTBEAT.write(group.HEARTBEAT.value + 1)
+
+
+def _blocked_string(blocked):
+    """
+    Converts a blocking state of a diagnostic into its enum string.
+    """
+    if blocked is True:
+        return 'Blocked'
+    elif blocked is False:
+        return 'Clear'
+    return 'Unknown'
+
+
+def _all_tasks(loop):
+    """
+    Returns the unfinished tasks of a loop. ``asyncio.all_tasks`` was only
+    added in python 3.7.
+    """
+    all_tasks = getattr(asyncio, 'all_tasks', None) or asyncio.Task.all_tasks
+    return {task for task in all_tasks(loop) if not task.done()}
@@ -0,0 +1,309 @@
+"""
+Append-only on-disk archive of scan steps.
+
+Every archived scan gets a raw float64 file that grows by one row per step,
+and a line in the archive index with the scan metadata::
+
+    <root>/index.jsonl
+    <root>/scan_000001.dat
+    <root>/scan_000002.dat
+
+Each row holds the time of the step, the target position of the scan motor
+and then one column per recorded field. Archived scans are read back as
+memory-mapped arrays, so selecting a field or a range of steps returns a view
+of the file rather than a copy.
+"""
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCAN_DIR = os.path.join(os.path.expanduser("~"), ".hxrsnd", "scans")
+
+# Columns written before the recorded fields in every row
+BASE_COLUMNS = ['time', 'target']
+
+
+class ScanArchive:
+    """
+    Append-only archive of scans.
+
+    Parameters
+    ----------
+    root : str, optional
+        Directory holding the archive. Defaults to ``~/.hxrsnd/scans``.
+    """
+    def __init__(self, root=None):
+        self.root = root or DEFAULT_SCAN_DIR
+
+    @property
+    def _index_path(self):
+        return os.path.join(self.root, "index.jsonl")
+
+    def _data_path(self, scan_id):
+        return os.path.join(self.root, "scan_{0:06d}.dat".format(scan_id))
+
+    def record(self, plan, motor, fields, md=None):
+        """
+        Starts archiving a new scan.
+
+        Parameters
+        ----------
+        plan : str
+            Name of the plan performing the scan.
+
+        motor : str
+            Name of the scan motor.
+
+        fields : list
+            Names of the fields recorded at each step.
+
+        md : dict, optional
+            Additional metadata to store with the scan. Must be json
+            serializable.
+
+        Returns
+        -------
+        recorder : :class:`.ScanRecorder`
+            Recorder to append the steps of the scan with.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        scan_id = self._next_id()
+        meta = {'scan_id': scan_id,
+                'plan': plan,
+                'motor': motor,
+                'fields': list(fields),
+                'time': time.time(),
+                'md': dict(md or {})}
+        # Create the data file first so the id is taken before it is indexed
+        open(self._data_path(scan_id), 'xb').close()
+        with open(self._index_path, 'a') as f:
+            f.write(json.dumps(meta) + '\n')
+        logger.debug("Archiving scan {0} of '{1}'.".format(scan_id, motor))
+        return ScanRecorder(self._data_path(scan_id), meta)
+
+    def _next_id(self):
+        """
+        Returns the first scan id without a data file.
+        """
+        scans = self.scans()
+        scan_id = scans[-1]['scan_id'] + 1 if scans else 1
+        while os.path.exists(self._data_path(scan_id)):
+            scan_id += 1
+        return scan_id
+
+    def scans(self, motor=None, plan=None, since=None, until=None):
+        """
+        Returns the metadata of the archived scans, optionally selecting them
+        by motor, plan or start time.
+
+        Parameters
+        ----------
+        motor : str, optional
+            Only return scans of this motor.
+
+        plan : str, optional
+            Only return scans performed by this plan.
+
+        since : float, optional
+            Only return scans started at or after this time.
+
+        until : float, optional
+            Only return scans started before this time.
+
+        Returns
+        -------
+        scans : list
+            List of metadata dictionaries in the order the scans were taken.
+        """
+        try:
+            with open(self._index_path) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+        scans = []
+        for line in lines:
+            try:
+                meta = json.loads(line)
+            except ValueError:
+                # Line from a session that died while writing it
+                continue
+            if motor is not None and meta['motor'] != motor:
+                continue
+            if plan is not None and meta['plan'] != plan:
+                continue
+            if since is not None and meta['time'] < since:
+                continue
+            if until is not None and meta['time'] >= until:
+                continue
+            scans.append(meta)
+        return scans
+
+    def load(self, scan_id):
+        """
+        Returns an archived scan.
+
+        Parameters
+        ----------
+        scan_id : int
+            Id of the scan to load.
+
+        Returns
+        -------
+        scan : :class:`.ArchivedScan`
+            Memory-mapped scan.
+        """
+        for meta in self.scans():
+            if meta['scan_id'] == scan_id:
+                return ArchivedScan(self._data_path(scan_id), meta)
+        raise KeyError("No scan {0} in the archive at {1}.".format(
+            scan_id, self.root))
+
+    def last(self, motor=None, plan=None):
+        """
+        Returns the most recent archived scan, optionally of a given motor or
+        plan.
+
+        Returns
+        -------
+        scan : :class:`.ArchivedScan`
+            Memory-mapped scan.
+        """
+        scans = self.scans(motor=motor, plan=plan)
+        if not scans:
+            raise KeyError("No matching scans in the archive at {0}.".format(
+                self.root))
+        return self.load(scans[-1]['scan_id'])
+
+
+class ScanRecorder:
+    """
+    Appends the steps of a single scan to its archive file.
+
+    Parameters
+    ----------
+    path : str
+        Path to the data file of the scan.
+
+    meta : dict
+        Metadata of the scan.
+    """
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self.columns = BASE_COLUMNS + meta['fields']
+
+    def append(self, target, reads, timestamp=None):
+        """
+        Appends a step to the archive.
+
+        Parameters
+        ----------
+        target : float
+            Target position of the scan motor at this step.
+
+        reads : dict
+            Values of the fields at this step. Missing or non-numeric values
+            are stored as nan.
+
+        timestamp : float, optional
+            Time of the step. Uses the current time if None.
+        """
+        row = np.empty(len(self.columns))
+        row[0] = time.time() if timestamp is None else timestamp
+        row[1] = target
+        for i, fld in enumerate(self.meta['fields']):
+            try:
+                row[i+2] = float(reads[fld])
+            except (KeyError, TypeError, ValueError):
+                row[i+2] = np.nan
+        # A single write of a whole row keeps the file a whole number of rows
+        with open(self.path, 'ab') as f:
+            f.write(row.tobytes())
+
+
+class ArchivedScan:
+    """
+    Memory-mapped scan read back from the archive.
+
+    Parameters
+    ----------
+    path : str
+        Path to the data file of the scan.
+
+    meta : dict
+        Metadata of the scan.
+    """
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self.columns = BASE_COLUMNS + meta['fields']
+        ncols = len(self.columns)
+        nrows = os.path.getsize(path) // (8 * ncols)
+        if nrows:
+            self.data = np.memmap(path, dtype=np.float64, mode='r',
+                                  shape=(nrows, ncols))
+        else:
+            self.data = np.empty((0, ncols))
+
+    def __len__(self):
+        return len(self.data)
+
+    def field(self, name):
+        """
+        Returns a view of a single column of the scan.
+
+        Parameters
+        ----------
+        name : str
+            Name of the field, or 'time' or 'target'.
+
+        Returns
+        -------
+        column : np.ndarray
+            Values of the field at every step.
+        """
+        return self.data[:, self.columns.index(name)]
+
+    def between(self, start=None, stop=None):
+        """
+        Returns a view of the steps taken between two times. Steps are
+        appended in order, so the selection is a contiguous slice.
+
+        Parameters
+        ----------
+        start : float, optional
+            Earliest time to include.
+
+        stop : float, optional
+            Time to stop before.
+
+        Returns
+        -------
+        rows : np.ndarray
+            Rows of the selected steps.
+        """
+        times = self.data[:, 0]
+        first = 0 if start is None else np.searchsorted(times, start, 'left')
+        last = len(times) if stop is None else np.searchsorted(times, stop,
+                                                               'left')
+        return self.data[first:last]
+
+    def to_dataframe(self):
+        """
+        Returns the scan as a dataframe indexed by the target positions, in the
+        same layout as the dataframe returned by the scan.
+
+        Returns
+        -------
+        df : pd.DataFrame
+            Dataframe of the recorded fields.
+        """
+        import pandas as pd
+        return pd.DataFrame(np.asarray(self.data[:, 2:]),
+                            index=np.asarray(self.data[:, 1]),
+                            columns=self.meta['fields'])
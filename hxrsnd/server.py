@@ -0,0 +1,511 @@
+"""
+Single process that owns the SnD system, with thin clients for the shells
+
+Creating a :class:`.SplitAndDelay` connects to every PV of the system, so each
+shell that creates its own pays for those connections and they all poll the
+same PVs. With the server, one process owns the system and the shells connect
+to it with a :class:`SndClient`, which only needs the standard library and
+starts instantly::
+
+    # Owning process
+    from snd_devices import snd
+    from hxrsnd.server import SndServer
+    SndServer(snd).serve_forever()
+
+    # Any shell on the same host
+    from hxrsnd.server import SndClient
+    snd = SndClient()
+    snd.snapshot()
+    snd.move('E1', 8000)
+
+Reads that arrive while the same read is already being made, such as several
+shells polling the status at once, share the result of that one read.
+
+Requests are sent as pickles over an authenticated local socket, so anyone
+with the key can run code as the user of the server. The key is taken from the
+``HXRSND_SERVER_KEY`` environment variable, or else from a key file only the
+user can read, which is created with a random key the first time.
+"""
+import binascii
+import importlib
+import logging
+import os
+import pickle
+import queue
+import threading
+from collections import namedtuple
+from multiprocessing.connection import Client, Listener
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADDRESS = ('localhost', 50510)
+
+# Modules plans can be run from
+PLAN_MODULES = ('hxrsnd.plans', 'bluesky.plans', 'bluesky.plan_stubs')
+
+# Reference to a device of the system in the arguments of a request
+DeviceRef = namedtuple('DeviceRef', ['path'])
+
+# Key shared by the server and clients of a user if none is set in the
+# environment
+KEY_FILE = os.path.join(os.path.expanduser('~'), '.hxrsnd_server_key')
+
+
+def _default_authkey(key_file=KEY_FILE):
+    """
+    Returns the key in the ``HXRSND_SERVER_KEY`` environment variable, or the
+    one in the key file of the user, creating it with a random key if it
+    doesn't exist yet.
+
+    Raises
+    ------
+    PermissionError
+        If the key file can be read by other users.
+    """
+    key = os.environ.get('HXRSND_SERVER_KEY')
+    if key:
+        return key.encode()
+    try:
+        fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        if os.stat(key_file).st_mode & 0o077:
+            raise PermissionError("The server key file '{0}' can be accessed "
+                                  "by other users. Restrict it with 'chmod "
+                                  "600 {0}'.".format(key_file))
+        with open(key_file, 'rb') as f:
+            return f.read().strip()
+    key = binascii.hexlify(os.urandom(32))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    logger.info("Created the server key file '{0}'.".format(key_file))
+    return key
+
+
+class _Flight:
+    """
+    Result of a read that other requests can wait on.
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Coalescer:
+    """
+    Runs each read once for all of the requests for it that arrive while it
+    is being made.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def call(self, key, func):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if leader:
+            try:
+                flight.result = func()
+            except Exception as e:
+                flight.error = e
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+
+class SndServer:
+    """
+    Serves the devices of an SnD system to :class:`SndClient` connections.
+
+    Each connection is handled in its own thread. Plans are queued and run
+    one at a time by the thread in :meth:`serve_forever`, since the
+    RunEngine has to run in the main thread.
+
+    Parameters
+    ----------
+    snd : :class:`.SplitAndDelay`
+        System to serve.
+
+    address : tuple, optional
+        Host and port to listen on. Port 0 picks a free port.
+
+    authkey : bytes, optional
+        Key the clients have to connect with. Defaults to the
+        ``HXRSND_SERVER_KEY`` environment variable or the key file of the
+        user.
+    """
+    # Requests that only read, which are shared between simultaneous clients
+    shared_requests = ('snapshot', 'status', 'get')
+
+    def __init__(self, snd, address=DEFAULT_ADDRESS, authkey=None):
+        self.snd = snd
+        self.authkey = authkey or _default_authkey()
+        self._listener = Listener(address, authkey=self.authkey)
+        self._coalescer = _Coalescer()
+        self._plans = queue.Queue()
+        # Moves and calls are refused while a plan is running, and plans are
+        # refused while a move requested through the server is running
+        self._plan_lock = threading.Lock()
+        self._plan_running = False
+        self._moves = set()
+        self._connections = []
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @property
+    def address(self):
+        """
+        Returns the host and port the server is listening on.
+        """
+        return self._listener.address
+
+    def start(self):
+        """
+        Starts accepting connections in a background thread.
+        """
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._accept, daemon=True,
+                                        name="snd_server")
+        self._thread.start()
+        logger.info("Serving the SnD system on {0}.".format(self.address))
+
+    def serve_forever(self):
+        """
+        Starts the server and runs the queued plans until :meth:`stop` is
+        called.
+        """
+        self.start()
+        while not self._stopping.is_set():
+            try:
+                plan, reply = self._plans.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            with self._plan_lock:
+                moving = [status for status in self._moves if not status.done]
+                self._plan_running = not moving
+            if moving:
+                reply.error = RuntimeError(
+                    "{0} move(s) requested through the server are still "
+                    "running. Wait for them to finish or stop them first."
+                    "".format(len(moving)))
+                reply.done.set()
+                continue
+            try:
+                reply.result = self._run_plan(*plan)
+            except Exception as e:
+                reply.error = e
+            finally:
+                with self._plan_lock:
+                    self._plan_running = False
+            reply.done.set()
+
+    def stop(self):
+        """
+        Stops accepting connections and closes the open ones.
+        """
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        # Wake the accept up with a connection of our own
+        try:
+            Client(self.address, authkey=self.authkey).close()
+        except OSError:
+            pass
+        if self._thread is not None:
+            self._thread.join(1)
+        self._listener.close()
+        for conn in list(self._connections):
+            conn.close()
+
+    def _accept(self):
+        while not self._stopping.is_set():
+            try:
+                conn = self._listener.accept()
+            except Exception as e:
+                if not self._stopping.is_set():
+                    logger.warning("Failed to accept a connection. Got "
+                                   "error: {0}".format(e))
+                continue
+            if self._stopping.is_set():
+                conn.close()
+                break
+            self._connections.append(conn)
+            threading.Thread(target=self._handle, args=(conn,),
+                             daemon=True).start()
+
+    def _handle(self, conn):
+        try:
+            while True:
+                try:
+                    kind, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    break
+                try:
+                    reply = ('ok', self._dispatch(kind, args, kwargs))
+                except Exception as e:
+                    reply = ('error', e)
+                try:
+                    conn.send(_picklable(reply))
+                except (EOFError, OSError):
+                    break
+        finally:
+            conn.close()
+            if conn in self._connections:
+                self._connections.remove(conn)
+
+    def _dispatch(self, kind, args, kwargs):
+        handler = getattr(self, '_request_' + kind, None)
+        if handler is None:
+            raise ValueError("Unknown request '{0}'.".format(kind))
+        if kind in self.shared_requests:
+            key = (kind, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                return handler(*args, **kwargs)
+            return self._coalescer.call(key, lambda: handler(*args, **kwargs))
+        return handler(*args, **kwargs)
+
+    def _resolve(self, path):
+        """
+        Returns the object at a dotted path of attributes of the system.
+        """
+        obj = self.snd
+        for attr in path.split('.') if path else []:
+            if attr.startswith('_'):
+                raise AttributeError("Private attribute '{0}' can't be "
+                                     "accessed through the server."
+                                     "".format(attr))
+            obj = getattr(obj, attr)
+        return obj
+
+    def _resolve_refs(self, value):
+        if isinstance(value, DeviceRef):
+            return self._resolve(value.path)
+        elif isinstance(value, (list, tuple)):
+            return type(value)(self._resolve_refs(val) for val in value)
+        elif isinstance(value, dict):
+            return {key: self._resolve_refs(val)
+                    for key, val in value.items()}
+        return value
+
+    def _request_ping(self):
+        return 'pong'
+
+    def _request_snapshot(self):
+        return self.snd.snapshot()
+
+    def _request_status(self):
+        return self.snd.status(print_status=False)
+
+    def _request_get(self, path):
+        return self._resolve(path)
+
+    def _check_no_plan(self):
+        """
+        Raises if a plan is running. Must be called with the plan lock held.
+        """
+        if self._plan_running:
+            raise RuntimeError("A plan is running on the server. Wait for it "
+                               "to finish or stop it first.")
+
+    def _request_call(self, path, *args, **kwargs):
+        func = self._resolve(path)
+        with self._plan_lock:
+            self._check_no_plan()
+            return func(*self._resolve_refs(args),
+                        **self._resolve_refs(kwargs))
+
+    def _request_move(self, path, position, wait=True, timeout=None):
+        from ophyd.status import wait as status_wait
+
+        device = self._resolve(path)
+        with self._plan_lock:
+            self._check_no_plan()
+            status = device.move(position, wait=False)
+            # Macro-motors return no status if the move was cancelled
+            if status is None:
+                return None
+            self._moves.add(status)
+        # Called right away if the move is already done
+        status.add_callback(self._move_done)
+        if wait:
+            status_wait(status, timeout)
+            return device.position
+
+    def _move_done(self, status):
+        self._moves.discard(status)
+
+    def _request_stop(self, **kwargs):
+        return self.snd.stop(**kwargs)
+
+    def _request_plan(self, name, *args, **kwargs):
+        # Wait for the thread in serve_forever to run the plan
+        reply = _Flight()
+        self._plans.put(((name, args, kwargs), reply))
+        reply.done.wait()
+        if reply.error is not None:
+            raise reply.error
+        return reply.result
+
+    def _run_plan(self, name, args, kwargs):
+        module_name, _, plan_name = name.rpartition('.')
+        if not module_name.startswith(PLAN_MODULES):
+            raise ValueError("Plans can only be run from {0}, got '{1}'."
+                             "".format(', '.join(PLAN_MODULES), name))
+        if self.snd.RE is None:
+            raise RuntimeError("The served system has no RunEngine.")
+        plan = getattr(importlib.import_module(module_name), plan_name)
+        return self.snd.RE(plan(*self._resolve_refs(args),
+                                **self._resolve_refs(kwargs)))
+
+
+def _picklable(reply):
+    """
+    Replaces a reply that can't be pickled, e.g. one holding a status object,
+    with its repr.
+    """
+    try:
+        pickle.dumps(reply)
+        return reply
+    except Exception:
+        kind, value = reply
+        if kind == 'error':
+            return (kind, RuntimeError(repr(value)))
+        return (kind, repr(value))
+
+
+class SndClient:
+    """
+    Thin client of an :class:`SndServer`.
+
+    Parameters
+    ----------
+    address : tuple, optional
+        Host and port of the server.
+
+    authkey : bytes, optional
+        Key of the server. Defaults to the ``HXRSND_SERVER_KEY`` environment
+        variable or the key file of the user.
+    """
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=None):
+        self.address = address
+        self._conn = Client(address, authkey=authkey or _default_authkey())
+        self._lock = threading.Lock()
+
+    def _request(self, kind, *args, **kwargs):
+        with self._lock:
+            self._conn.send((kind, args, kwargs))
+            status, value = self._conn.recv()
+        if status == 'error':
+            raise value
+        return value
+
+    @staticmethod
+    def ref(path):
+        """
+        Returns a reference to a device of the system, e.g. ``ref('delay')``,
+        to pass in the arguments of :meth:`call` and :meth:`run_plan`.
+        """
+        return DeviceRef(path)
+
+    def ping(self):
+        """
+        Returns 'pong' if the server is responding.
+        """
+        return self._request('ping')
+
+    def snapshot(self):
+        """
+        Returns the energies, delay, beam path and diagnostic states of the
+        system. See :meth:`.SplitAndDelay.snapshot`.
+        """
+        return self._request('snapshot')
+
+    def status(self):
+        """
+        Returns the status string of the system.
+        """
+        return self._request('status')
+
+    def get(self, path):
+        """
+        Returns an attribute of the system, e.g. ``get('E1.position')``.
+        """
+        return self._request('get', path)
+
+    def call(self, path, *args, **kwargs):
+        """
+        Calls a method of the system, e.g. ``call('t1.enable')``, and returns
+        its result. Calls are refused while a plan is running on the server.
+        """
+        return self._request('call', path, *args, **kwargs)
+
+    def move(self, path, position, wait=True, timeout=None):
+        """
+        Moves a motor or macro-motor of the system.
+
+        Parameters
+        ----------
+        path : str
+            Path of the motor in the system, e.g. 'E1' or 't1.L'.
+
+        position : float
+            Position to move to.
+
+        wait : bool, optional
+            Wait for the move to finish.
+
+        timeout : float, optional
+            Seconds to wait for the move.
+
+        Returns
+        -------
+        position : float or None
+            Position after the move if waited on, None if the move was not
+            made.
+
+        Raises
+        ------
+        RuntimeError
+            If a plan is running on the server.
+        """
+        return self._request('move', path, position, wait=wait,
+                             timeout=timeout)
+
+    def stop(self, **kwargs):
+        """
+        Stops every motor of the system. See :meth:`.SplitAndDelay.stop`.
+        """
+        return self._request('stop', **kwargs)
+
+    def run_plan(self, name, *args, **kwargs):
+        """
+        Runs a plan with the RunEngine of the server and waits for it. Plans
+        are refused while a move requested through the server is running.
+
+        Parameters
+        ----------
+        name : str
+            Full name of the plan, e.g. 'hxrsnd.plans.scans.linear_scan'.
+
+        args, kwargs
+            Arguments of the plan. Use :meth:`ref` to pass devices.
+        """
+        return self._request('plan', name, *args, **kwargs)
+
+    def close(self):
+        """
+        Closes the connection to the server.
+        """
+        self._conn.close()
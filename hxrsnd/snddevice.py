@@ -2,12 +2,85 @@
 Common SnD device classes
 """
 import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 
 from ophyd.device import Device
 from pcdsdevices.interface import BaseInterface
 
+from .utils import as_list
+
 logger = logging.getLogger(__name__)
 
+# Wrapped get methods of the signals memoized by open consistent_reads
+# contexts, keyed by the id of the signal
+_memoized = {}
+_memoized_lock = threading.Lock()
+
+
+class _MemoizedGet:
+    """
+    Replacement get method of a signal that, while a ``consistent_reads``
+    context of one of its devices is open in the thread, only reads the signal
+    once and returns that same value on every later get.
+    """
+    def __init__(self, signal):
+        self.signal = signal
+        # Restore an instance level get on unwrap rather than deleting it
+        self.instance_get = vars(signal).get('get')
+        self.get = signal.get
+        self.devices = []
+
+    def __call__(self, *args, **kwargs):
+        # Use the reads of the first device with a context open in the thread
+        for device in self.devices:
+            cache = getattr(device._reads, "cache", None)
+            if cache is not None:
+                break
+        else:
+            return self.get(*args, **kwargs)
+        key = (id(self.signal), args, tuple(sorted(kwargs.items())))
+        try:
+            return cache[key]
+        except KeyError:
+            value = cache[key] = self.get(*args, **kwargs)
+            return value
+        except TypeError:
+            # Unhashable arguments can't be shared
+            return self.get(*args, **kwargs)
+
+
+def _memoize_get(signal, device):
+    """
+    Wraps the get method of a signal so that it is memoized while a
+    ``consistent_reads`` context of the device is open. Must be called with
+    ``_memoized_lock`` held.
+    """
+    memoized = _memoized.get(id(signal))
+    if memoized is None:
+        memoized = _memoized[id(signal)] = _MemoizedGet(signal)
+        signal.get = memoized
+    memoized.devices.append(device)
+
+
+def _unmemoize_get(signal, device):
+    """
+    Removes a device from the wrapped get method of a signal, restoring the
+    original get once no device uses it. Must be called with
+    ``_memoized_lock`` held.
+    """
+    memoized = _memoized[id(signal)]
+    memoized.devices.remove(device)
+    if memoized.devices:
+        return
+    del _memoized[id(signal)]
+    if memoized.instance_get is None:
+        del signal.get
+    else:
+        signal.get = memoized.instance_get
+
 
 class SndDevice(BaseInterface, Device):
     """
@@ -22,6 +95,48 @@ class SndDevice(BaseInterface, Device):
         super().__init__(prefix, name=name, *args, **kwargs)
         self.desc = desc or self.name
         self.set_timeout = set_timeout
+        # Reads of the context open in each thread, and the signals wrapped
+        # while any context of the device is open
+        self._reads = threading.local()
+        self._reads_open = 0
+        self._reads_signals = []
+
+    @contextmanager
+    def consistent_reads(self):
+        """
+        Context in which every signal of the device is read at most once, so
+        everything computed inside it comes from one consistent snapshot of
+        the device. Nested contexts share the reads of the outermost one, and
+        the reads are kept separately for each device and thread.
+
+        The values are those at the first read in the context, so anything
+        that needs to see the result of a move has to be done outside of it.
+        Only the signals that are already instantiated when the first context
+        opens are covered, lazy signals created inside of it are read as usual.
+        The get methods of the signals are restored once every context of the
+        device has closed.
+        """
+        if getattr(self._reads, "cache", None) is not None:
+            yield
+            return
+        with _memoized_lock:
+            if not self._reads_open:
+                self._reads_signals = [walk.item
+                                       for walk in self.walk_signals()]
+                for signal in self._reads_signals:
+                    _memoize_get(signal, self)
+            self._reads_open += 1
+        self._reads.cache = {}
+        try:
+            yield
+        finally:
+            self._reads.cache = None
+            with _memoized_lock:
+                self._reads_open -= 1
+                if not self._reads_open:
+                    for signal in self._reads_signals:
+                        _unmemoize_get(signal, self)
+                    self._reads_signals = []
 
     def _apply_all(self, method, subclass=object, *method_args,
                    **method_kwargs):
@@ -53,6 +168,214 @@ class SndDevice(BaseInterface, Device):
                                                       **method_kwargs))
         return ret
 
+    def _apply_all_at_once(self, method, subclass=object, timeout=None,
+                           **method_kwargs):
+        """
+        Runs the set method for all devices that are of the inputted subclass
+        without waiting on any of the sets, then waits for all of them using a
+        single timeout.
+
+        Parameters
+        ----------
+        method : str
+            Method of each device to run. Must accept the ``ret_status``,
+            ``print_set`` and ``wait`` key word arguments.
+
+        subclass : class
+            Subclass to run the methods for.
+
+        timeout : float, optional
+            Total time in seconds to wait for the sets. Waits until every set
+            has finished if None.
+
+        method_kwargs : dict, optional
+            Key word arguments to pass to the method
+
+        Returns
+        -------
+        failed : list
+            Names of the devices with a set that failed or did not finish
+            before the timeout.
+        """
+        devices = self._find_devices(subclass)
+        status = []
+        for dev in devices:
+            dev_status = getattr(dev, method)(ret_status=True, print_set=False,
+                                              wait=False, **method_kwargs)
+            status.append((dev, as_list(dev_status)))
+        return self._wait_all(status, timeout=timeout)
+
+    def _wait_all(self, status, timeout=None):
+        """
+        Waits on the status objects of several devices using a single
+        deadline.
+
+        Parameters
+        ----------
+        status : list
+            List of (device, list of status objects) tuples.
+
+        timeout : float, optional
+            Total time in seconds to wait. Waits until every status is done if
+            None.
+
+        Returns
+        -------
+        failed : list
+            Names of the devices with a status that failed or did not finish
+            before the timeout.
+        """
+        flat = [st for _, dev_status in status for st in dev_status
+                if st is not None]
+        # Count the statuses down as they finish instead of polling them
+        all_done = threading.Event()
+        lock = threading.Lock()
+        left = [len(flat)]
+
+        def finished(*args, **kwargs):
+            with lock:
+                left[0] -= 1
+                if left[0] <= 0:
+                    all_done.set()
+        if not flat:
+            all_done.set()
+        for st in flat:
+            st.add_callback(finished)
+        all_done.wait(timeout)
+        return [dev.name for dev, dev_status in status
+                if not all(st is not None and st.done and st.success
+                           for st in dev_status)]
+
+    def _find_devices(self, subclass):
+        """
+        Returns every device in the component tree that is of the inputted
+        subclass, without looking inside the devices that match.
+
+        Parameters
+        ----------
+        subclass : class
+            Subclass of the devices to find.
+
+        Returns
+        -------
+        devices : list
+            Devices of the subclass in component order.
+        """
+        found = []
+        for comp_name in self.component_names:
+            component = getattr(self, comp_name)
+            if isinstance(component, subclass):
+                found.append(component)
+            elif isinstance(component, Device):
+                found.extend(SndDevice._find_devices(component, subclass))
+        return found
+
+    def _stop_motors(self, motors, timeout=1, print_status=True):
+        """
+        Stops every inputted motor at once, then waits for the controllers to
+        confirm the stops using a single timeout. The stops do not wait on
+        each other, so the time to stop everything does not grow with the
+        number of motors.
+
+        Parameters
+        ----------
+        motors : list
+            Motors with a ``stop`` method that returns the status of the stop.
+
+        timeout : float, optional
+            Total time in seconds to wait for the stops to be confirmed.
+
+        print_status : bool, optional
+            Print the table of motors that did not confirm the stop.
+
+        Returns
+        -------
+        confirmed : OrderedDict
+            Mapping of each motor name to whether the controller confirmed the
+            stop before the timeout.
+        """
+        t0 = time.time()
+        stops = []
+        for motor in motors:
+            try:
+                stops.append((motor, [motor.stop(ret_status=True,
+                                                 print_set=False)]))
+            except Exception as e:
+                logger.error("Failed to stop '{0}'. Got error: {1}"
+                             "".format(motor.name, e))
+                stops.append((motor, [None]))
+        failed = self._wait_all(stops, timeout=timeout)
+        confirmed = OrderedDict((motor.name, motor.name not in failed)
+                                for motor in motors)
+
+        unconfirmed = [name for name, done in confirmed.items() if not done]
+        status = ""
+        if unconfirmed:
+            status += "\n{0}{1:<40}\n{2}{3}".format(" "*2, "Unconfirmed Stop",
+                                                    " "*2, "-"*40)
+            for name in unconfirmed:
+                status += "\n{0}{1:<40}".format(" "*2, name)
+        status += "\n{0}Stop confirmed by {1} of {2} motors in {3:.3f}s." \
+            "".format(" "*2, len(motors) - len(unconfirmed), len(motors),
+                      time.time() - t0)
+        if print_status:
+            logger.info(status)
+        else:
+            logger.debug(status)
+        return confirmed
+
+    def connect_all(self, timeout=5, print_status=True):
+        """
+        Requests connections for every signal in the device tree at once and
+        then waits on all of them using a single timeout. Signals that did not
+        connect in time are reported as a table.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Total time in seconds to wait for all the signals to connect.
+
+        print_status : bool, optional
+            Print the table of unconnected signals.
+
+        Returns
+        -------
+        unconnected : list
+            List of (signal name, pv name) tuples for every signal that did not
+            connect before the timeout.
+        """
+        # Walking the lazy signals instantiates them, and instantiating an
+        # epics signal sends the connection request without blocking on it
+        signals = [walk.item for walk in self.walk_signals(include_lazy=True)]
+
+        # Wait for the whole tree using a single deadline
+        t0 = time.time()
+        while not all(sig.connected for sig in signals):
+            if time.time() - t0 > timeout:
+                break
+            time.sleep(min(0.05, timeout/10))
+
+        unconnected = [(sig.name, getattr(sig, "pvname", ""))
+                       for sig in signals if not sig.connected]
+
+        # Build the table of all the unconnected signals
+        status = ""
+        if unconnected:
+            status += "\n{0}{1:<40}|{2:^40}\n{3}{4}".format(
+                " "*2, "Signal", "PV", " "*2, "-"*81)
+            for sig_name, pvname in unconnected:
+                status += "\n{0}{1:<40}|{2:^40}".format(" "*2, sig_name,
+                                                        pvname)
+        status += "\n{0}Connected {1} of {2} signals in {3:.3f}s.".format(
+            " "*2, len(signals) - len(unconnected), len(signals),
+            time.time() - t0)
+
+        if print_status:
+            logger.info(status)
+        else:
+            logger.debug(status)
+        return unconnected
+
     def st(self, *args, **kwargs):
         """
         Returns or prints the status of the device. Alias for 'device.status()'.
@@ -1,35 +1,135 @@
 """
 Script for abstract motor classes used in the SnD.
 """
+import copy
 import logging
+import sys
 import time
 from collections import OrderedDict
 from functools import reduce
 
-import pandas as pd
-from bluesky.preprocessors import run_wrapper
+import numpy as np
 from ophyd.device import Component as Cmp
 from ophyd.signal import Signal
+from ophyd.status import DeviceStatus
 from ophyd.utils import LimitError
 from pcdsdevices.epics_motor import PCDSMotorBase
 from pcdsdevices.interface import FltMvInterface
 
+from .calibstore import CalibrationStore
 from .exceptions import InputError
-from .plans.calibration import calibrate_motor
-from .plans.preprocessors import return_to_start as _return_to_start
+from .interpolation import GridInterpolator
 from .snddevice import SndDevice
 from .utils import as_list
 
 logger = logging.getLogger(__name__)
 
 
+def _is_dataframe(obj):
+    """
+    Checks if the inputted object is a pandas DataFrame without importing
+    pandas when it hasn't been already. If pandas isn't loaded, nothing can be
+    a DataFrame yet.
+    """
+    pd = sys.modules.get("pandas")
+    return pd is not None and isinstance(obj, pd.DataFrame)
+
+
+def _get_store(store):
+    """
+    Returns a calibration store from an inputted store, directory or None for
+    the default store.
+    """
+    if isinstance(store, CalibrationStore):
+        return store
+    return CalibrationStore(store)
+
+
+def _end_slope(x, values):
+    """
+    Returns the slope of the corrections from the end row of a table to the
+    next one, or zero if the table has a single position at that end.
+    """
+    if len(x) < 2 or x[1] == x[0]:
+        return np.zeros(values.shape[1])
+    return (values[1] - values[0]) / (x[1] - x[0])
+
+
 class SndMotor(FltMvInterface, SndDevice):
     """
     Base Sndmotor class that has methods common to all the various motors,
     even
     the non-EpicsMotor ones.
     """
-    pass
+    def _send_stop(self):
+        """
+        Sends the stop command of the motor without waiting on it.
+
+        Returns
+        -------
+        status : DeviceStatus
+            Status that finishes when the controller confirms the stop.
+        """
+        status = DeviceStatus(self)
+
+        def confirmed(*args, **kwargs):
+            status._finished()
+        self.motor_stop.put(1, use_complete=True, callback=confirmed)
+        return status
+
+    def _enforced_limits(self):
+        """
+        Returns the soft limits positions are checked against, or None if the
+        motor has no limits set.
+        """
+        return self.limits
+
+    def check_values(self, positions):
+        """
+        Checks many positions against the soft limits at once, e.g. every step
+        of a planned trajectory. The limits are only read once for all of the
+        positions.
+
+        Parameters
+        ----------
+        positions : float or array-like
+            Positions to check for validity.
+
+        Returns
+        -------
+        positions : np.ndarray
+            Inputted positions as a float array.
+
+        Raises
+        ------
+        ValueError
+            If any of the positions are None, NaN or Inf.
+
+        LimitError
+            If any of the positions are outside the soft limits.
+        """
+        try:
+            positions = np.asarray(positions, dtype=float)
+        except TypeError:
+            raise ValueError("Invalid values inputted: '{0}'".format(
+                positions))
+        invalid = ~np.isfinite(positions)
+        if invalid.any():
+            raise ValueError("Invalid values inputted: {0}".format(
+                positions[invalid].tolist()))
+
+        limits = self._enforced_limits()
+        if limits is None:
+            return positions
+        low_limit, high_limit = limits
+        outside = (positions < low_limit) | (positions > high_limit)
+        if outside.any():
+            err_str = ("Requested values {0} outside of range: [{1}, {2}]"
+                       "".format(positions[outside].tolist(), low_limit,
+                                 high_limit))
+            logger.warning(err_str)
+            raise LimitError(err_str)
+        return positions
 
 
 class SndEpicsMotor(PCDSMotorBase, SndMotor):
@@ -40,39 +140,53 @@ class SndEpicsMotor(PCDSMotorBase, SndMotor):
     direction_of_travel = Cmp(Signal)
     motor_spg = Cmp(Signal, value=2)
 
+    def _enforced_limits(self):
+        # Limits of (0, 0) mean the limits are disabled on EpicsMotors
+        limits = self.limits
+        return limits if any(limits) else None
+
 
 class SamMotor(SndMotor):
     offset_freeze_switch = Cmp(Signal)
     home_forward = Cmp(Signal)
     home_reverse = Cmp(Signal)
 
-    def check_value(self, value, retries=5):
+    def _enforced_limits(self, retries=5):
         """
-        Check if the value is within the soft limits of the motor.
+        Reads the soft limits, retrying when the read fails.
 
         Raises
         ------
-        ValueError
+        TypeError
+            If the limits still can't be read after all the retries.
         """
-        if value is None:
-            raise ValueError('Cannot write None to epics PVs')
-
         for i in range(retries):
             try:
                 low_limit, high_limit = self.limits
-                if not (low_limit <= value <= high_limit):
-                    raise LimitError("Value {} outside of range: [{}, {}]"
-                                     .format(value, low_limit, high_limit))
-                return
+                return low_limit, high_limit
             except TypeError:
                 logger.warning("Failed to get limits, retrying...")
                 if i == retries-1:
                     raise
 
+    def check_value(self, value, retries=5):
+        """
+        Check if the value is within the soft limits of the motor.
+
+        Raises
+        ------
+        ValueError
+        """
+        if value is None:
+            raise ValueError('Cannot write None to epics PVs')
+
+        low_limit, high_limit = self._enforced_limits(retries=retries)
+        if not (low_limit <= value <= high_limit):
+            raise LimitError("Value {} outside of range: [{}, {}]"
+                             .format(value, low_limit, high_limit))
+
 
 # TODO: Add a centroid scanning method
-# TODO: Add ability to save caibrations to disk
-# TODO: Add ability to load calibrations from disk
 # TODO: Add ability to display calibrations
 # TODO: Add ability to change post-processing done to scan.
 # TODO: Add ability to redo scaling on scan
@@ -80,7 +194,8 @@ class CalibMotor(SndDevice):
     """
     Provides the calibration macro methods.
     """
-    tab_whitelist = ['calibrate', 'calibration', 'has_calib', 'use_calib']
+    tab_whitelist = ['calibrate', 'calibration', 'has_calib', 'use_calib',
+                     'save_calibration', 'load_calibration', 'calib_positions']
 
     def __init__(self, prefix, name=None, calib_detector=None,
                  calib_motors=None, calib_fields=None, motor_fields=None,
@@ -89,8 +204,11 @@ class CalibMotor(SndDevice):
         self.calib_motors = calib_motors
         self.calib_fields = calib_fields
         self.motor_fields = motor_fields
+        self.calib_axes = None
         self.use_calib = False
         self._calib = OrderedDict()
+        self._calib_grid = None
+        self._calib_model = None
         self.configure()
 
     def calibrate(self, start, stop, steps, average=100, confirm_overwrite=True,
@@ -131,6 +249,13 @@ class CalibMotor(SndDevice):
             Move all the motors to their original positions after the scan has been
             completed
         """
+        # Deferred so that only calibrating pays for the bluesky, pandas and
+        # pswalker imports, not every session that just moves motors
+        from bluesky.preprocessors import run_wrapper
+
+        from .plans.calibration import calibrate_motor
+        from .plans.preprocessors import return_to_start as _return_to_start
+
         # Remove this once the calibration routine has been tested
         logger.warning('Calibration functionality has not been commissioned.')
 
@@ -166,7 +291,7 @@ class CalibMotor(SndDevice):
         Returns
         -------
         calibration : dict
-            Dictionary containing calib, motors, scan, scale, and start
+            Dictionary containing calib, motors, axes, scan, scale, and start
             calibration parameters.
         """
         if self.has_calib:
@@ -175,18 +300,117 @@ class CalibMotor(SndDevice):
             calib = {fld: config[fld]['value']
                      for fld in ['calib', 'scan', 'scale', 'start']}
             # Make sure there are motors before we iterate through the list
-            if config['motors']['value']:
-                # If the motors have name attributes, just return those
-                calib['motors'] = [mot.name if hasattr(mot, 'name') else mot
-                                   for mot in config['motors']['value']]
-            else:
-                calib['motors'] = None
+            for fld in ['motors', 'axes']:
+                if config[fld]['value']:
+                    # If the motors have name attributes, just return those
+                    calib[fld] = [mot.name if hasattr(mot, 'name') else mot
+                                  for mot in config[fld]['value']]
+                else:
+                    calib[fld] = None
             return calib
         else:
             return None
 
-    def configure(self, *, calib=None, motors=None, scan=None, scale=None,
-                  start=None):
+    def save_calibration(self, store=None):
+        """
+        Saves the current calibration as a new version in the calibration
+        store.
+
+        Parameters
+        ----------
+        store : :class:`.CalibrationStore` or str, optional
+            Store or directory to save to. Defaults to the default store.
+
+        Returns
+        -------
+        version : int
+            Version number the calibration was saved as.
+
+        Raises
+        ------
+        InputError
+            If there is no valid calibration to save.
+        """
+        if not self.has_calib:
+            raise InputError("Motor '{0}' has no valid calibration to save."
+                             "".format(self.name))
+        timestamps = {key: val['timestamp'] for key, val in self._calib.items()}
+        return _get_store(store).save(
+            self.name, self._calib['calib']['value'],
+            self._calib['motors']['value'],
+            axes=self._calib['axes']['value'],
+            model=self._calib['model']['value'],
+            scan=self._calib['scan']['value'],
+            scale=self._calib['scale']['value'],
+            start=self._calib['start']['value'],
+            timestamps=timestamps)
+
+    def load_calibration(self, version=None, store=None, motors=None,
+                         axes=None):
+        """
+        Loads a saved calibration from the calibration store and configures
+        the motor with it.
+
+        Parameters
+        ----------
+        version : int, optional
+            Version to load. Defaults to the latest version.
+
+        store : :class:`.CalibrationStore` or str, optional
+            Store or directory to load from. Defaults to the default store.
+
+        motors : list, optional
+            Calibration motors to use. Defaults to matching the saved motor
+            names against this motor and its calibration motors.
+
+        axes : list, optional
+            Extra grid axes to use. Defaults to matching the saved axis names
+            against ``calib_axes``.
+
+        Returns
+        -------
+        configs : tuple of dict
+            old_config, new_config
+
+        Raises
+        ------
+        InputError
+            If the saved motor names could not be matched to motors.
+        """
+        saved = _get_store(store).load(self.name, version=version)
+        candidates = {mot.name: mot for mot in
+                      [self] + list(self.calib_motors or []) +
+                      list(self.calib_axes or [])}
+        if motors is None:
+            motors = self._find_motors(saved['motors'], candidates)
+        if axes is None and saved['axes']:
+            axes = self._find_motors(saved['axes'], candidates)
+
+        configs = self.configure(calib=saved['calib'], motors=motors,
+                                 axes=axes, model=saved['model'] or 'linear',
+                                 scan=saved['scan'], scale=saved['scale'],
+                                 start=saved['start'])
+        # Keep the times the calibration was originally configured
+        for key, timestamp in saved['timestamps'].items():
+            if key in self._calib:
+                self._calib[key]['timestamp'] = timestamp
+        logger.info("Loaded calibration version {0} for '{1}'.".format(
+            saved['version'], self.name))
+        return configs
+
+    def _find_motors(self, names, candidates):
+        """
+        Returns the motors matching the inputted names, raising an InputError
+        if any of them can't be found.
+        """
+        missing = [name for name in names if name not in candidates]
+        if missing:
+            raise InputError("Could not find the calibration motors {0} for "
+                             "'{1}'.".format(missing, self.name))
+        return [candidates[name] for name in names]
+
+    def configure(self, *, calib=None, motors=None, axes=None, model=None,
+                  scan=None, scale=None, start=None):
         """
         Configure the calib-motor's move parameters.
 
@@ -199,6 +423,19 @@ class CalibMotor(SndDevice):
         motors : list, optional
             List of calibration motors
 
+        axes : list, optional
+            Extra motors the correction depends on, making the correction table
+            an N-D grid. The table then has a column for the main motor, one
+            for each axis and then one for each calibration motor, with one
+            row for every point of the grid. Defaults to a 1-D table whenever
+            a new table is passed.
+
+        model : :class:`.PolynomialModel`, :class:`.SplineModel` or str
+            Model to fit to each column of a 1-D correction table. The model is
+            fit once here and the corrections are then evaluated from the
+            fitted coefficients, which smooths out noisy calibration scans.
+            Pass 'linear' to go back to interpolating between the table rows.
+
         scan : pd.DataFrame, optional
             Dataframe of the centroid scan used to compute the correction table
 
@@ -215,7 +452,8 @@ class CalibMotor(SndDevice):
         """
         # Save prev for return statement
         prev_config = self.read_configuration()
-        self._config_calib(calib, motors, scan, scale, start)
+        self._config_calib(calib, motors, scan, scale, start, axes=axes,
+                           model=model)
 
         # If we get a good calibration, change use_calib so we can use it
         if self.has_calib:
@@ -224,7 +462,8 @@ class CalibMotor(SndDevice):
         # Return the previous and new configs
         return prev_config, self.read_configuration()
 
-    def _config_calib(self, calib, motors, scan, scale, start):
+    def _config_calib(self, calib, motors, scan, scale, start, axes=None,
+                      model=None):
         """
         Handle the calibration arguments, and update the config dictionary
         accordingly.
@@ -246,23 +485,92 @@ class CalibMotor(SndDevice):
 
         start : list
             List of the initial positions of the motors before the walk
+
+        axes : list, optional
+            Extra motors the correction table is a grid over
+
+        model : object or str, optional
+            Model to fit to the correction table
         """
         # Start with all the previous calibration parameters
         save_calib = OrderedDict(self._calib)
         motors = as_list(motors) or None
+        # The axes describe the layout of the table, so a new table without
+        # axes is a 1-D table
+        if calib is not None and axes is None:
+            axes = []
+        axes = as_list(axes) if axes is not None else None
 
         # Add in the new parameters if they are not None or empty. If they are,
         # None or empty, check if they already exist as keys in the dict and
         # only add them if they do not.
-        for key, value in {'calib': calib, 'motors': motors, 'scan': scan,
-                           'scale': scale, 'start': start}.items():
+        for key, value in {'calib': calib, 'motors': motors, 'axes': axes,
+                           'model': model, 'scan': scan, 'scale': scale,
+                           'start': start}.items():
             if value is not None or (value is None and key not in save_calib):
                 save_calib[key] = {'value': value, 'timestamp': time.time()}
+        # Linear interpolation of the table is the same as having no model
+        if isinstance(save_calib['model']['value'], str):
+            if save_calib['model']['value'] != 'linear':
+                raise InputError("Unknown calibration model '{0}'.".format(
+                    save_calib['model']['value']))
+            save_calib['model']['value'] = None
 
         # Now check all those changes, raising errors if needed
         self._check_calib(save_calib)
+        grid, fitted = self._calib_grid, self._calib_model
+        if calib is not None or axes is not None or model is not None:
+            grid = self._build_calib_grid(save_calib)
+            fitted = self._fit_calib_model(save_calib)
         # We made it through the check, therefore it is safe to use
         self._calib = save_calib
+        self._calib_grid = grid
+        self._calib_model = fitted
+
+    def _build_calib_grid(self, save_calib):
+        """
+        Returns the interpolator of an N-D correction table, or None for 1-D
+        tables.
+
+        Raises
+        ------
+        InputError
+            If the correction table does not fill a complete grid.
+        """
+        calib = save_calib['calib']['value']
+        n_axes = len(save_calib['axes']['value'] or [])
+        if calib is None or not n_axes:
+            return None
+        columns = list(calib.columns)
+        try:
+            return GridInterpolator.from_dataframe(
+                calib, columns[:n_axes+1], columns[n_axes+1:])
+        except ValueError as e:
+            raise InputError("Invalid N-D correction table: {0}".format(e))
+
+    def _fit_calib_model(self, save_calib):
+        """
+        Returns a fitted copy of the calibration model, or None if the table is
+        interpolated.
+
+        Raises
+        ------
+        InputError
+            If the model can't be fit to the correction table.
+        """
+        calib = save_calib['calib']['value']
+        model = save_calib['model']['value']
+        if calib is None or model is None:
+            return None
+        if save_calib['axes']['value']:
+            raise InputError("Calibration models can only be fit to 1-D "
+                             "correction tables.")
+        try:
+            # Fit a copy so the same unfitted model can configure other motors
+            return copy.copy(model).fit(calib.iloc[:, 0], calib.iloc[:, 1:])
+        except ValueError as e:
+            raise InputError("Could not fit the calibration model: {0}"
+                             "".format(e))
 
     def _check_calib(self, save_calib):
         """
@@ -282,6 +590,7 @@ class CalibMotor(SndDevice):
         # Let's get all the values we will update the calibration with
         calib = save_calib['calib']['value']
         motors = save_calib['motors']['value']
+        axes = save_calib['axes']['value'] or []
         scan = save_calib['scan']['value']
         scale = save_calib['scale']['value']
         start = save_calib['start']['value']
@@ -291,7 +600,7 @@ class CalibMotor(SndDevice):
             pass
 
         # We have a correction table but it isnt a Dataframe
-        elif not isinstance(calib, pd.DataFrame):
+        elif not _is_dataframe(calib):
             raise TypeError("Only Dataframes are supported for calibrations "
                             "tables at this time. Got a calibration of type "
                             "{0}.".format(type(calib)))
@@ -303,10 +612,11 @@ class CalibMotor(SndDevice):
 
         # We have a correction table and calibration motors, but they arent the
         # same length, so we cannot actually use it
-        elif len(calib.columns) != len(motors):
+        elif len(calib.columns) != len(motors) + len(axes):
             raise InputError("Mismatched calibration size and number of "
-                             "motors. Got {0} columns for {1} motors.".format(
-                                 len(calib.columns), len(motors)))
+                             "motors. Got {0} columns for {1} motors and {2} "
+                             "axes.".format(len(calib.columns), len(motors),
+                                            len(axes)))
 
         # We have the correct correction table and motors but one of the of the
         # extra parameters were not passed, which is critical for corrected
@@ -331,37 +641,87 @@ class CalibMotor(SndDevice):
         status : AndStatus
             Status objects of all the extra motions performed.
         """
-        # Grab the current calibration
-        calib = self._calib['calib']['value']
-        motors = self._calib['motors']['value']
-        status_list = []
-
         # Only perform the compensation if there is a valid calibration and we
         # want to use the calibration
         if not self.has_calib or not self.use_calib:
             return
 
-        # Grab the two rows where the main motor position (column 0) is
-        # closest to the inputted position
-        top = calib.iloc[(calib.iloc[:, 0] - position).abs().argsort().iloc[:2]]
-        first, second = top.iloc[0], top.iloc[1]
-
-        # Get the slope between the lines between each of the motor values using
-        # the first column as the x positions
-        slopes = (second - first) / (second.iloc[0] - first.iloc[1])
-
-        # Use the slope and the closest point to interpolate the motor positions
-        # at the inputted position
-        interpolated_row = slopes * (position-first[0]) + first
-
-        # Move each calibration motor to the interpolated position
-        for i, motor in enumerate(motors[1:]):
-            status = motor.move(interpolated_row[i+1], *args, **kwargs)
+        # Move each calibration motor to the corrected position
+        status_list = []
+        motors = self._calib['motors']['value']
+        for motor, pos in zip(motors[1:], self.calib_positions(position)[0]):
+            status = motor.move(pos, *args, **kwargs)
             status_list.append(status)
 
         # Reduce all the status objects into one AndStatus object and return it
         return reduce(lambda x, y: x & y, status_list)
 
+    def calib_positions(self, positions):
+        """
+        Returns the positions the calibration motors are corrected to at each
+        of the inputted main motor positions, using the current positions of
+        any grid axes. Fitted models evaluate every position at once, which
+        makes it cheap to plan the corrections of a whole scan.
+
+        Parameters
+        ----------
+        positions : float or array-like
+            Positions of the main motor.
+
+        Returns
+        -------
+        calib_positions : np.ndarray
+            Array of shape (len(positions), number of calibration motors).
+
+        Raises
+        ------
+        InputError
+            If there is no valid calibration.
+        """
+        if not self.has_calib:
+            raise InputError("Motor '{0}' has no valid calibration."
+                             "".format(self.name))
+        positions = np.atleast_1d(positions).astype(float)
+        if self._calib_model is not None:
+            return self._calib_model(positions)
+
+        # N-D tables are interpolated using the current positions of the axes
+        axes = self._calib['axes']['value']
+        if axes:
+            axes_pos = [ax.position for ax in axes]
+            return np.array([self._calib_grid([pos] + axes_pos)
+                             for pos in positions])
+        return self._interpolate_calib(positions)
+
+    def _interpolate_calib(self, positions):
+        """
+        Returns the calibration motor positions linearly interpolated from the
+        1-D correction table at each of the inputted positions. Positions
+        outside of the table are extrapolated from the two rows at that end,
+        or held at the end values if that end has a single position.
+        """
+        calib = self._calib['calib']['value']
+        motors = self._calib['motors']['value']
+
+        # Sort the rows by the main motor position (column 0)
+        table = calib.iloc[:, :len(motors)].to_numpy(dtype=float)
+        table = table[np.argsort(table[:, 0])]
+        x, values = table[:, 0], table[:, 1:]
+
+        # Slopes of the first and last segments for the extrapolation
+        lo = _end_slope(x[:2], values[:2])
+        hi = _end_slope(x[-2:][::-1], values[-2:][::-1])
+
+        interpolated = np.empty((len(positions), values.shape[1]))
+        for i in range(values.shape[1]):
+            interpolated[:, i] = np.interp(positions, x, values[:, i])
+        below, above = positions < x[0], positions > x[-1]
+        interpolated[below] = (values[0] + lo *
+                               (positions[below, np.newaxis] - x[0]))
+        interpolated[above] = (values[-1] + hi *
+                               (positions[above, np.newaxis] - x[-1]))
+        return interpolated
+
     @property
     def has_calib(self):
         """
@@ -429,7 +789,7 @@ class CalibMotor(SndDevice):
     def describe_configuration(self):
         if not self._calib:
             return super().describe_configuration()
-        if isinstance(self._calib['calib']['value'], pd.DataFrame):
+        if _is_dataframe(self._calib['calib']['value']):
             shape = self._calib['calib']['value'].shape
         else:
             shape = [len(self._calib)]
@@ -3,16 +3,22 @@ Script to hold the split and delay class.
 
 All units of time are in picoseconds, units of length are in mm.
 """
+import copy
 import logging
+import time
+from collections import OrderedDict
 
+import numpy as np
 from ophyd import Component as Cmp
 
+from .aerotech import AeroBase
+from .attocube import EccBase
 from .diode import HamamatsuXMotionDiode, HamamatsuXYMotionCamDiode
 from .macromotor import DelayMacro, Energy1CCMacro, Energy1Macro, Energy2Macro
 from .pneumatic import SndPneumatics
 from .snddevice import SndDevice
 from .tower import ChannelCutTower, DelayTower
-from .utils import absolute_submodule_path
+from .utils import absolute_submodule_path, as_list
 
 logger = logging.getLogger(__name__)
 
@@ -67,7 +73,9 @@ class SplitAndDelay(SndDevice):
     """
     tab_component_names = True
     tab_whitelist = ['st', 'status', 'diag_status', 'theta1', 'theta2',
-                     'main_screen', 'status']
+                     'main_screen', 'status', 'connect_all', 'ready', 'stop',
+                     'beam_path', 'beam_paths', 'set_beam_path',
+                     'update_beam_paths', 'snapshot']
     # Delay Towers
     t1 = Cmp(DelayTower, ":T1", pos_inserted=21.1, pos_removed=0,
              desc="Tower 1")
@@ -93,6 +101,34 @@ class SplitAndDelay(SndDevice):
     dcc = Cmp(HamamatsuXYMotionCamDiode, ":DIA:DCC", block_pos=-5, desc="DCC")
     dco = Cmp(HamamatsuXMotionDiode, ":DIA:DCO", block_pos=-5, desc="DCO")
 
+    # Named beam paths, with the state of each tower and diagnostic. Devices
+    # that are left out are not moved when the beam path is applied. Each
+    # instance gets its own copy of the paths its towers have positions for,
+    # so paths can be added to one system without changing the others
+    beam_paths = {
+        'bypass': {
+            't1': 'removed', 't2': 'removed', 't3': 'removed', 't4': 'removed',
+        },
+        'delay only': {
+            't1': 'inserted', 't2': 'removed', 't3': 'removed',
+            't4': 'inserted', 'di': 'unblocked', 'dd': 'unblocked',
+            'do': 'unblocked', 'dci': 'blocked', 'dcc': 'blocked',
+            'dco': 'blocked',
+        },
+        'cc only': {
+            't1': 'inserted', 't2': 'inserted', 't3': 'inserted',
+            't4': 'inserted', 'di': 'blocked', 'dd': 'blocked',
+            'do': 'blocked', 'dci': 'unblocked', 'dcc': 'unblocked',
+            'dco': 'unblocked',
+        },
+        'full snd': {
+            't1': 'inserted', 't2': 'inserted', 't3': 'inserted',
+            't4': 'inserted', 'di': 'unblocked', 'dd': 'unblocked',
+            'do': 'unblocked', 'dci': 'unblocked', 'dcc': 'unblocked',
+            'dco': 'unblocked',
+        },
+    }
+
     # Macro motors
     E1 = Cmp(Energy1Macro, "", desc="Delay Energy")
     E1_cc = Cmp(Energy1CCMacro, "", desc="CC Delay Energy")
@@ -103,6 +139,7 @@ class SplitAndDelay(SndDevice):
         super().__init__(prefix, name=name, *args, **kwargs)
         self.daq = daq
         self.RE = RE
+        self.beam_paths = {}
         self._delay_towers = [self.t1, self.t4]
         self._channelcut_towers = [self.t2, self.t3]
         self._towers = self._delay_towers + self._channelcut_towers
@@ -110,11 +147,307 @@ class SplitAndDelay(SndDevice):
         self._channelcut_diagnostics = [self.dci, self.dcc, self.dco]
         self._diagnostics = self._delay_diagnostics+self._channelcut_diagnostics
 
-        # Set the position calculators of dd and dcc
-        self.dd.pos_func = lambda: \
-            self.E1._get_delay_diagnostic_position()
-        self.dcc.pos_func = lambda: \
-            self.E2._get_channelcut_diagnostic_position()
+        # Set the position calculators of dd and dcc. Both accept the tower
+        # snapshot from _diag_snapshot and read the towers for anything missing
+        self.dd.pos_func = lambda theta1=None, length=None, **kwargs: \
+            self.E1._get_delay_diagnostic_position(theta1=theta1,
+                                                   length=length)
+        self.dcc.pos_func = lambda theta2=None, **kwargs: \
+            self.E2._get_channelcut_diagnostic_position(theta2=theta2)
+        self.update_beam_paths()
+
+    def update_beam_paths(self):
+        """
+        Adds the default beam paths that are missing from ``beam_paths`` and
+        that every tower has a position for. Paths that put a tower in a state
+        without a position, such as inserting the channel cut towers before
+        their ``pos_inserted`` is set, are left out until this is called again
+        after the positions are set. Paths that are already in ``beam_paths``
+        are not changed.
+
+        Returns
+        -------
+        added : list
+            Names of the beam paths that were added.
+        """
+        added = []
+        for name, path in type(self).beam_paths.items():
+            if name in self.beam_paths:
+                continue
+            if all(getattr(getattr(self, dev_name), 'pos_' + state) is not None
+                   for dev_name, state in path.items()
+                   if state in ('inserted', 'removed')):
+                self.beam_paths[name] = copy.deepcopy(path)
+                added.append(name)
+        return added
+
+    def _diag_snapshot(self):
+        """
+        Reads the tower angles and delay length that the diagnostic positions
+        depend on, once each.
+
+        Returns
+        -------
+        snapshot : dict
+            Dictionary with the current theta1, theta2 and length of the
+            system.
+        """
+        return {'theta1': self.theta1,
+                'theta2': self.theta2,
+                'length': self.t1.length}
+
+    def _diag_states(self):
+        """
+        Evaluates the blocking state and position of every diagnostic from a
+        single snapshot of the towers, reading each motor once and computing
+        each diagnostic position function once.
+
+        Returns
+        -------
+        states : list
+            List of (diagnostic, blocked, position) tuples.
+        """
+        snapshot = self._diag_snapshot()
+        states = []
+        for diag in self._diagnostics:
+            position = diag.x.position
+            states.append((diag, diag._blocked_state(position, **snapshot),
+                           position))
+        return states
+
+    def _beam_path_moves(self, name, snapshot=None):
+        """
+        Returns the motor moves needed to put the system in a beam path.
+
+        Parameters
+        ----------
+        name : str
+            Name of the beam path in ``beam_paths``.
+
+        snapshot : dict, optional
+            Tower snapshot from ``_diag_snapshot``. The towers are read if it
+            is not passed.
+
+        Returns
+        -------
+        moves : list
+            List of (motor, position) tuples.
+
+        Raises
+        ------
+        ValueError
+            If the beam path does not exist or a tower has no position set for
+            the requested state.
+        """
+        try:
+            path = self.beam_paths[name]
+        except KeyError:
+            raise ValueError("Unknown beam path '{0}'. Valid beam paths are: "
+                             "{1}".format(name, ", ".join(self.beam_paths)))
+        # The diagnostic positions follow the towers angles, which don't move
+        if snapshot is None:
+            snapshot = self._diag_snapshot()
+        moves = []
+        for dev_name, state in path.items():
+            device = getattr(self, dev_name)
+            if state in ('inserted', 'removed'):
+                position = getattr(device, 'pos_' + state)
+                if position is None:
+                    raise ValueError("Cannot set the beam path to '{0}', "
+                                     "{1}.pos_{2} is not set.".format(
+                                         name, dev_name, state))
+            else:
+                position = device._block_position(state == 'blocked',
+                                                  **snapshot)
+            moves.append((device.x, position))
+        return moves
+
+    def set_beam_path(self, name, wait=True, timeout=None):
+        """
+        Puts the system in one of the named beam paths by moving the x stages
+        of the towers and the diagnostics all at once.
+
+        Every motor is checked before anything moves, so a motor that cannot
+        reach its position stops the whole switch.
+
+        Parameters
+        ----------
+        name : str
+            Name of the beam path. One of ``beam_paths``, which by default are
+            'bypass', 'delay only', 'cc only' and 'full snd'. The last two are
+            only available once the channel cut towers have ``pos_inserted``
+            set, see ``update_beam_paths``.
+
+        wait : bool, optional
+            Wait for all the motors to finish moving.
+
+        timeout : float, optional
+            Time in seconds to wait for all the motors.
+
+        Returns
+        -------
+        status : list
+            Status objects of the moves.
+
+        Raises
+        ------
+        ValueError
+            If the beam path does not exist or a tower has no position set for
+            the requested state.
+        """
+        moves = self._beam_path_moves(name)
+        # Check every motor first so nothing moves if any of them can't
+        errors = []
+        for motor, position in moves:
+            try:
+                motor.check_status(position)
+            except Exception as e:
+                logger.error("Motor {0} got an exception: {1}".format(
+                    motor.desc, e))
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+        logger.info("Setting the beam path to '{0}'.".format(name))
+        status = [motor.move(position, wait=False, check_status=False)
+                  for motor, position in moves]
+        if wait:
+            failed = self._wait_all([(motor, [st]) for (motor, _), st in
+                                     zip(moves, status)], timeout=timeout)
+            if failed:
+                logger.error("Motors did not reach the '{0}' beam path: {1}"
+                             "".format(name, ", ".join(failed)))
+            else:
+                logger.info("Beam path set to '{0}'.".format(name))
+        return status
+
+    @property
+    def beam_path(self):
+        """
+        Returns the name of the beam path the system is currently in.
+
+        Returns
+        -------
+        name : str
+            Name of the matching beam path, or 'Unknown' if the system is not
+            in any of them.
+        """
+        # Compare every path against one read of the towers and motors
+        positions = {}
+        with self.consistent_reads():
+            snapshot = self._diag_snapshot()
+            for name in self.beam_paths:
+                try:
+                    moves = self._beam_path_moves(name, snapshot=snapshot)
+                except ValueError:
+                    continue
+                for motor, _ in moves:
+                    if motor not in positions:
+                        positions[motor] = motor.position
+                if all(np.isclose(positions[motor], position, atol=0.1)
+                       for motor, position in moves):
+                    return name
+        return "Unknown"
+
+    def stop(self, success=False, timeout=1, print_status=True):
+        """
+        Stops every Aerotech and Attocube motor of the towers and diagnostics
+        at once.
+
+        The stop commands are all sent before waiting on any of them, and then
+        the motors are given a single timeout to confirm.
+
+        Parameters
+        ----------
+        success : bool, optional
+            Unused, accepted so the system can be stopped like any device.
+
+        timeout : float, optional
+            Time in seconds to wait for the motors to confirm the stop.
+
+        print_status : bool, optional
+            Print the motors that did not confirm the stop.
+
+        Returns
+        -------
+        confirmed : OrderedDict
+            Mapping of each motor name to whether it confirmed the stop.
+        """
+        motors = []
+        for device in self._towers + self._diagnostics:
+            motors += device._find_devices((AeroBase, EccBase))
+        return self._stop_motors(motors, timeout=timeout,
+                                 print_status=print_status)
+
+    def ready(self, timeout=None, print_status=True):
+        """
+        Readies every motor of the towers and diagnostics at once. The aerotech
+        motors are cleared, enabled and set to 'Go', and the attocube motors
+        are enabled.
+
+        All the puts are sent before waiting on any of them, and then they are
+        all waited on together, so readying the system takes about as long as
+        readying a single motor.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Time in seconds to wait for all the motors. Waits until every put
+            has finished if None.
+
+        print_status : bool, optional
+            Print the motors that could not be readied.
+
+        Returns
+        -------
+        failed : list
+            Names of the motors that could not be readied.
+        """
+        status = []
+        for device in self._towers + self._diagnostics:
+            for motor in device._find_devices((AeroBase, EccBase)):
+                if isinstance(motor, AeroBase):
+                    ready = motor.ready_motor
+                else:
+                    ready = motor.enable
+                status.append((motor, as_list(ready(
+                    ret_status=True, print_set=False, wait=False))))
+        failed = self._wait_all(status, timeout=timeout)
+
+        msg = "Readied {0} of {1} motors.".format(len(status) - len(failed),
+                                                  len(status))
+        if failed:
+            msg += " Could not ready: {0}".format(", ".join(failed))
+        if print_status:
+            logger.info(msg)
+        else:
+            logger.debug(msg)
+        return failed
+
+    def snapshot(self):
+        """
+        Returns the energies, delay, beam path and diagnostic states of the
+        system, all computed from one read of each PV.
+
+        Returns
+        -------
+        snapshot : OrderedDict
+            Timestamp, E1, E2, delay and beam path of the system, and the
+            blocking state and position of each diagnostic.
+        """
+        with self.consistent_reads():
+            snapshot = OrderedDict([
+                ('timestamp', time.time()),
+                ('E1', self.E1.position),
+                ('E2', self.E2.position),
+                ('delay', self.delay.position),
+                ('beam_path', self.beam_path),
+                ('diagnostics', OrderedDict()),
+            ])
+            for diag, blocked, position in self._diag_states():
+                snapshot['diagnostics'][diag.attr_name] = {
+                    'blocked': blocked, 'position': position}
+        return snapshot
 
     def diag_status(self):
         """
@@ -123,9 +456,11 @@ class SplitAndDelay(SndDevice):
         """
         status = "\n{0}{1:<14}|{2:^16}|{3:^16}\n{4}{5}".format(
             " "*2, "Diagnostic", "Blocking", "Position", " "*2, "-"*50)
-        for diag in self._diagnostics:
+        with self.consistent_reads():
+            states = self._diag_states()
+        for diag, blocked, position in states:
             status += "\n{0}{1:<14}|{2:^16}|{3:^16.3f}".format(
-                " "*2, diag.desc, str(diag.blocked), diag.x.position)
+                " "*2, diag.desc, str(blocked), position)
         logger.info(status)
 
     @property
@@ -178,14 +513,17 @@ class SplitAndDelay(SndDevice):
         """
         status = "Split and Delay System Status\n"
         status += "-----------------------------"
-        status = self.E1.status(status, 0, print_status=False)
-        status = self.E2.status(status, 0, print_status=False)
-        status = self.delay.status(status, 0, print_status=False, newline=True)
-        status = self.t1.status(status, 0, print_status=False, newline=True)
-        status = self.t2.status(status, 0, print_status=False, newline=True)
-        status = self.t3.status(status, 0, print_status=False, newline=True)
-        status = self.t4.status(status, 0, print_status=False, newline=True)
-        status = self.ab.status(status, 0, print_status=False, newline=False)
+        # Every PV is read once for the whole status
+        with self.consistent_reads():
+            status = self.E1.status(status, 0, print_status=False)
+            status = self.E2.status(status, 0, print_status=False)
+            status = self.delay.status(status, 0, print_status=False,
+                                       newline=True)
+            for tower in (self.t1, self.t2, self.t3, self.t4):
+                status = tower.status(status, 0, print_status=False,
+                                      newline=True)
+            status = self.ab.status(status, 0, print_status=False,
+                                    newline=False)
 
         if print_status:
             logger.info(status)
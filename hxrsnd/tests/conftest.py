@@ -1,6 +1,7 @@
 import inspect
 import logging
 import math
+import threading
 
 import numpy as np
 import pandas as pd
@@ -11,10 +12,12 @@ from ophyd.areadetector.base import EpicsSignalWithRBV
 from ophyd.device import Component as Cmp
 from ophyd.device import Device
 from ophyd.signal import Signal
+from ophyd.status import DeviceStatus
 from ophyd.sim import (FakeEpicsSignal, SynAxis, SynSignal, fake_device_cache,
                        make_fake_device)
 from pcdsdevices.areadetector.detectors import PCDSAreaDetector
 
+from ..plans.calibration import clear_gradient_cache
 from ..sndmotor import CalibMotor
 
 logger = logging.getLogger(__name__)
@@ -169,6 +172,48 @@ class CalibTest(CalibMotor):
         return status
 
 
+class SimDaq(Device):
+    """
+    Simulated DAQ that counts its calls and takes ``delay`` seconds to acquire
+    the events of each step. Like the real DAQ, unstaging it ends the run if
+    one was begun.
+    """
+    def __init__(self, name="daq", delay=0, *args, **kwargs):
+        super().__init__("SYN:DAQ", name=name, *args, **kwargs)
+        self.delay = delay
+        self.config = {}
+        self.calls = {'configure': 0, 'begin': 0, 'end_run': 0}
+        self.controls = []
+        self.running = False
+
+    def configure(self, events=None, record=None, controls=None):
+        self.calls['configure'] += 1
+        old = dict(self.config)
+        self.config.update(events=events, record=record, controls=controls)
+        return old, dict(self.config)
+
+    def trigger(self):
+        self.calls['begin'] += 1
+        self.running = True
+        self.controls.append({name: dev.position for name, dev in
+                              self.config['controls'].items()})
+        status = DeviceStatus(self)
+        if self.delay:
+            threading.Timer(self.delay, status._finished).start()
+        else:
+            status._finished()
+        return status
+
+    def unstage(self):
+        if self.running:
+            self.end_run()
+        return super().unstage()
+
+    def end_run(self):
+        self.calls['end_run'] += 1
+        self.running = False
+
+
 # Simulated Crystal motor that goes where you tell it
 crystal = SynAxis(name='angle')
 m1 = SynAxis(name="m1")
@@ -191,6 +236,14 @@ def set_level(pytestconfig):
                         filename=pytestconfig.getoption('--logfile'))
 
 
+# Keep gradients measured in one test from seeding the walks of the next
+@pytest.fixture(scope='function', autouse=True)
+def clear_gradients():
+    clear_gradient_cache()
+    yield
+    clear_gradient_cache()
+
+
 @pytest.fixture(scope='function')
 def get_calib_motor(request):
     m1 = SynAxis(name="m1")
@@ -5,9 +5,11 @@ from collections import OrderedDict
 
 import pytest
 from ophyd.device import Device
+from ophyd.status import DeviceStatus
 
 from hxrsnd import aerotech
-from hxrsnd.aerotech import AeroBase, MotorDisabled
+from hxrsnd.aerotech import AeroBase, InterLinearAero, MotorDisabled
+from hxrsnd.exceptions import BadN2Pressure
 
 from .conftest import fake_device, get_classes_in_module
 
@@ -30,6 +32,50 @@ def test_AeroBase_raises_MotorDisabled_if_moved_while_disabled():
     with pytest.raises(MotorDisabled):
         motor.move(10)
 
+
+def test_InterLinearAero_stops_when_pressure_goes_bad_during_a_move():
+    motor = fake_device(InterLinearAero, "TEST:SND:T1:X")
+    stops = []
+    motor.motor_stop.subscribe(lambda value, **kwargs: stops.append(value),
+                               run=False)
+    motor._pressure.pressure.sim_put(0)
+    # Not moving, so bad pressure only blocks the next move
+    motor._pressure.pressure.sim_put(1)
+    assert not stops
+    motor._pressure.pressure.sim_put(0)
+    motor.motor_done_move.sim_put(0)
+    assert motor._moving
+    motor._pressure.pressure.sim_put(1)
+    assert stops == [1]
+    with pytest.raises(BadN2Pressure):
+        motor.check_status()
+
+
+def test_AeroBase_ready_motor_runs_each_step_after_the_last():
+    motor = fake_device(AeroBase, "TEST:SND:T1")
+    steps = []
+    clear_status = DeviceStatus(motor)
+
+    def clear(**kwargs):
+        steps.append('clear')
+        return clear_status
+
+    def enable(**kwargs):
+        steps.append('enable')
+        status = DeviceStatus(motor)
+        status._finished()
+        return status
+    motor.clear = clear
+    motor.enable = enable
+    status = motor.ready_motor(ret_status=True, print_set=False, wait=False)
+    # Nothing else is sent until the errors are cleared
+    assert steps == ['clear']
+    assert not status.done
+    clear_status._finished()
+    status.wait(1)
+    assert steps == ['clear', 'enable']
+    assert motor.state_component.get() == "Go"
+
 # @pytest.mark.parametrize("position", [1])
 # def test_AeroBase_callable_moves_the_motor(position):
 #     motor = fake_device(AeroBase)
@@ -4,8 +4,10 @@ import logging
 import time
 from collections import OrderedDict
 
+import numpy as np
 import pytest
 from ophyd.device import Device
+from ophyd.utils import LimitError
 
 from hxrsnd import attocube
 from hxrsnd.attocube import EccBase, MotorDisabled, MotorError
@@ -43,6 +45,112 @@ def test_EccBase_raises_MotorError_if_moved_while_faulted():
     with pytest.raises(MotorError):
         motor.move(10)
 
+
+def ready_motor(dwell=0.05):
+    motor = fake_device(EccBase)
+    motor.in_range_dwell = dwell
+    motor.motor_error.sim_put(0)
+    motor.motor_enable.sim_put(1)
+    motor.upper_ctrl_limit.sim_put(100)
+    motor.lower_ctrl_limit.sim_put(-100)
+    motor.motor_done_move.sim_put(1)
+    return motor
+
+
+def test_EccBase_move_finishes_after_motion_and_dwell():
+    motor = ready_motor()
+    status = motor.move(10)
+    # The piezo starts moving and leaves the range of the old target
+    motor.motor_is_moving.sim_put(1)
+    motor.motor_done_move.sim_put(0)
+    time.sleep(0.1)
+    assert not status.done
+    # Arriving starts the dwell, and the move is only done after it
+    motor.motor_is_moving.sim_put(0)
+    motor.motor_done_move.sim_put(1)
+    assert not status.done
+    status.wait(timeout=1)
+    assert status.success
+
+
+def test_EccBase_move_dwell_restarts_if_motor_leaves_range():
+    motor = ready_motor(dwell=0.2)
+    status = motor.move(10)
+    time.sleep(0.1)
+    # Flags catch up with the new target inside the dwell
+    motor.motor_is_moving.sim_put(1)
+    motor.motor_done_move.sim_put(0)
+    time.sleep(0.2)
+    assert not status.done
+    motor.motor_is_moving.sim_put(0)
+    motor.motor_done_move.sim_put(1)
+    status.wait(timeout=1)
+    assert status.success
+
+
+def test_EccBase_move_waits_for_motion_when_flags_are_stale():
+    motor = ready_motor()
+    motor.user_readback.sim_put(0)
+    status = motor.move(10)
+    # Still in range of the old target, so nothing may settle the move yet
+    time.sleep(0.2)
+    assert not status.done
+    motor.motor_is_moving.sim_put(1)
+    motor.motor_done_move.sim_put(0)
+    motor.motor_is_moving.sim_put(0)
+    motor.motor_done_move.sim_put(1)
+    status.wait(timeout=1)
+    assert status.success
+
+
+def test_EccBase_move_to_the_current_position_finishes():
+    motor = ready_motor()
+    motor.user_readback.sim_put(10)
+    status = motor.move(10)
+    status.wait(timeout=1)
+    assert status.success
+
+
+def test_EccBase_stop_fails_the_move():
+    motor = ready_motor()
+    status = motor.move(10)
+    motor.motor_is_moving.sim_put(1)
+    motor.stop(print_set=False)
+    with pytest.raises(Exception):
+        status.wait(timeout=1)
+    assert status.done and not status.success
+
+
+def test_EccBase_limits_are_cached_until_they_change(monkeypatch):
+    motor = ready_motor()
+    assert motor.limits == (-100, 100)
+    reads = []
+    get = motor.upper_ctrl_limit.get
+    monkeypatch.setattr(motor.upper_ctrl_limit, 'get',
+                        lambda *args, **kwargs: reads.append(1) or get())
+    motor.check_value(60)
+    assert not reads
+    # The monitor clears the cache so the new limit is read once
+    motor.upper_ctrl_limit.sim_put(50)
+    with pytest.raises(LimitError):
+        motor.check_value(60)
+    assert motor.limits == (-100, 50)
+    assert len(reads) == 1
+
+
+def test_EccBase_check_values_checks_a_whole_trajectory():
+    motor = ready_motor()
+    positions = motor.check_values(range(-100, 101, 10))
+    assert len(positions) == 21
+    with pytest.raises(LimitError) as err:
+        motor.check_values([0, 50, 150, 200])
+    assert "[150.0, 200.0]" in str(err.value)
+    with pytest.raises(ValueError):
+        motor.check_values([0, np.nan])
+    with pytest.raises(LimitError):
+        motor.check_status(150)
+
+
 # @pytest.mark.parametrize("position", [1])
 # def test_EccBase_callable_moves_the_motor(position):
 #     motor = EccBase("TEST")
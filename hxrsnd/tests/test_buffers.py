@@ -0,0 +1,96 @@
+import logging
+
+import numpy as np
+import pytest
+from ophyd.signal import Signal
+
+from hxrsnd.buffers import RingBuffer, SignalBuffer
+
+logger = logging.getLogger(__name__)
+
+
+def test_RingBuffer_keeps_most_recent_samples_in_order():
+    buf = RingBuffer(3)
+    assert len(buf) == 0
+    for i in range(5):
+        buf.append(i, timestamp=10+i)
+    assert buf.full
+    assert list(buf.data) == [2, 3, 4]
+    assert list(buf.timestamps) == [12, 13, 14]
+    data, timestamps = buf.last(2)
+    assert list(data) == [3, 4]
+    assert list(timestamps) == [13, 14]
+
+
+def test_RingBuffer_supports_array_samples():
+    buf = RingBuffer(4, shape=(16, 2))
+    buf.append(np.ones((16, 2)))
+    assert buf.data.shape == (1, 16, 2)
+    buf.clear()
+    assert len(buf) == 0
+
+
+def test_RingBuffer_raises_ValueError_on_bad_size():
+    with pytest.raises(ValueError):
+        RingBuffer(0)
+
+
+def test_SignalBuffer_running_stats_match_numpy():
+    sig = Signal(name="sig", value=0)
+    buf = SignalBuffer(sig, size=10)
+    values = np.random.RandomState(0).normal(5, 2, 37)
+    for val in values:
+        sig.put(val)
+    assert len(buf) == 10
+    assert np.isclose(buf.mean(), np.mean(values[-10:]))
+    assert np.isclose(buf.var(), np.var(values[-10:]))
+    assert np.isclose(buf.std(num=4), np.std(values[-4:]))
+
+
+def test_SignalBuffer_selects_by_time_and_filter():
+    sig = Signal(name="sig", value=0)
+    buf = SignalBuffer(sig, size=10, start=False)
+    for i in range(6):
+        buf.append(i, timestamp=100+i)
+    assert buf.count(since=103) == 3
+    assert buf.mean(since=103) == 4
+    assert buf.mean(filt=lambda x: x % 2 == 0) == 2
+    assert np.isnan(buf.mean(since=200))
+    buf.clear()
+    assert np.isnan(buf.mean())
+
+
+def test_SignalBuffer_stop_unsubscribes():
+    sig = Signal(name="sig", value=0)
+    buf = SignalBuffer(sig, size=10)
+    sig.put(1)
+    buf.stop()
+    sig.put(2)
+    assert list(buf.data) == [1]
+
+
+def test_RingBuffer_counts_total_and_calls_back_on_next_sample():
+    buf = RingBuffer(3)
+    calls = []
+    buf.call_on_next(lambda: calls.append(buf.total))
+    for i in range(5):
+        buf.append(i)
+    buf.clear()
+    assert calls == [1]
+    assert buf.total == 5
+    assert len(buf) == 0
+
+
+def test_SignalBuffer_calls_array_filters_once():
+    buf = SignalBuffer(Signal(name="sig", value=0), size=10, start=False)
+    for i in range(8):
+        buf.append(i)
+    calls = []
+
+    def array_filter(x):
+        calls.append(x)
+        return x > 2
+    assert buf.mean(num=4, filt=array_filter) == 5.5
+    assert len(calls) == 1
+    # Filters that only take single values are applied shot by shot
+    assert buf.count(filt=lambda x: 2 < x and x < 5) == 2
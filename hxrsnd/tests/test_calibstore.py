@@ -0,0 +1,65 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from hxrsnd.calibstore import CalibrationStore
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture(scope='function')
+def store(tmpdir):
+    return CalibrationStore(str(tmpdir))
+
+
+def test_CalibrationStore_saves_and_loads_versions(store):
+    calib = pd.DataFrame({'a': [0., 1., 2.], 'b_post': [3., 4., 5.]})
+    scan = pd.DataFrame({'a': [0., 1., 2.], 'cam': [1., 2., 3.]})
+    assert store.versions('mot') == []
+    assert store.save('mot', calib, ['mot', 'aux'], scan=scan, scale=[2],
+                      start=[0.5]) == 1
+    assert store.save('mot', calib * 2, ['mot', 'aux']) == 2
+    assert store.versions('mot') == [1, 2]
+
+    first = store.load('mot', version=1)
+    assert first['calib'].equals(calib)
+    assert first['scan'].equals(scan)
+    assert first['motors'] == ['mot', 'aux']
+    assert first['scale'] == [2]
+    assert first['start'] == [0.5]
+
+    latest = store.load('mot')
+    assert latest['version'] == 2
+    assert np.allclose(latest['calib'], calib * 2)
+    assert latest['scan'] is None
+
+
+def test_CalibrationStore_raises_for_missing_versions(store):
+    with pytest.raises(FileNotFoundError):
+        store.load('mot')
+    store.save('mot', pd.DataFrame({'a': [0.]}), ['mot'])
+    with pytest.raises(FileNotFoundError):
+        store.load('mot', version=5)
+
+
+def test_CalibrationStore_keeps_numeric_dtypes(store):
+    calib = pd.DataFrame({'a': [0., 1.], 'n': np.array([1, 2], dtype='i4'),
+                          'ok': [True, False]},
+                         index=np.array([3, 4], dtype='i8'))
+    store.save('mot', calib, ['mot'])
+    loaded = store.load('mot')['calib']
+    assert list(loaded.dtypes) == list(calib.dtypes)
+    assert loaded.index.dtype == calib.index.dtype
+    assert loaded.equals(calib)
+
+
+def test_CalibrationStore_rejects_non_numeric_tables(store):
+    calib = pd.DataFrame({'a': [0., 1.], 'label': ['x', 'y']})
+    with pytest.raises(TypeError, match="label"):
+        store.save('mot', calib, ['mot'])
+    with pytest.raises(TypeError, match="index"):
+        store.save('mot', calib[['a']].set_index(pd.Index(['x', 'y'])),
+                   ['mot'])
+    assert store.versions('mot') == []
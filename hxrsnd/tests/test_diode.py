@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import logging
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+from ophyd.device import Device
+
+from hxrsnd import diode
+from hxrsnd.diode import Wave8
+
+from .conftest import fake_device, get_classes_in_module
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.mark.parametrize("dev", get_classes_in_module(
+    diode, Device, blacklist=[diode.DiodeIO]))
+def test_diode_devices_instantiate_and_run_ophyd_functions(dev):
+    device = fake_device(dev)
+    assert isinstance(device.read(), OrderedDict)
+    assert isinstance(device.read_configuration(), OrderedDict)
+
+
+@pytest.fixture(scope='function')
+def wave8():
+    wave8 = fake_device(Wave8)
+    for i, (peak_a, peak_t) in enumerate(wave8._peak_signals):
+        peak_a.sim_put(i)
+        peak_t.sim_put(-i)
+    return wave8
+
+
+def test_Wave8_peaks_reads_all_channels(wave8):
+    values, timestamps = wave8.peaks()
+    assert values.shape == (16, 2)
+    assert timestamps.shape == (16, 2)
+    assert (values[:, 0] == np.arange(16)).all()
+    assert (values[:, 1] == -np.arange(16)).all()
+
+
+def test_Wave8_buffer_records_updates(wave8):
+    wave8.start_buffer()
+    for i in range(3):
+        wave8.diode_15.peakT.sim_put(i)
+    assert len(wave8.buffer) == 3
+    assert list(wave8.buffer.data[:, 15, 1]) == [0, 1, 2]
+    wave8.stop_buffer()
+    wave8.diode_15.peakT.sim_put(10)
+    assert len(wave8.buffer) == 3
+
+
+def test_DiodeIO_buffers_average_peak_shots(wave8):
+    buffers = wave8.diode_3.start_buffers(size=5)
+    for i in range(8):
+        wave8.diode_3.peakT.sim_put(i)
+    buf = buffers[wave8.diode_3.peakT.name]
+    assert buf.mean() == np.mean(range(3, 8))
+    assert len(buffers[wave8.diode_3.peakA.name]) == 0
+    wave8.diode_3.stop_buffers()
+    wave8.diode_3.peakT.sim_put(100)
+    assert buf.mean() == np.mean(range(3, 8))
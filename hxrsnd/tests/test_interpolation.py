@@ -0,0 +1,68 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from hxrsnd.interpolation import GridInterpolator, PolynomialModel, SplineModel
+
+logger = logging.getLogger(__name__)
+
+
+def bilinear(x, y):
+    return 1 + 2*x - 3*y + 4*x*y
+
+
+@pytest.mark.parametrize("point", [(0.3, 0.7), (0.25, 0.1), (1.5, 3),
+                                   (-1, -1)])
+def test_GridInterpolator_is_exact_for_bilinear_functions(point):
+    # One evenly spaced axis and one uneven axis
+    x = np.linspace(0, 1, 5)
+    y = np.array([0, 0.1, 0.5, 2])
+    grid = GridInterpolator([x, y], bilinear(*np.meshgrid(
+        x, y, indexing='ij'))[..., None])
+    assert np.isclose(grid(point)[0], bilinear(*point))
+
+
+def test_GridInterpolator_from_dataframe():
+    x, y = np.meshgrid([0., 1., 2.], [5., 10.], indexing='ij')
+    df = pd.DataFrame({'x': x.ravel(), 'y': y.ravel(),
+                       'a': bilinear(x, y).ravel(), 'b': x.ravel()})
+    # Row order doesn't matter
+    grid = GridInterpolator.from_dataframe(df.iloc[::-1], ['x', 'y'],
+                                           ['a', 'b'])
+    assert np.allclose(grid((1.5, 7)), [bilinear(1.5, 7), 1.5])
+    with pytest.raises(ValueError):
+        GridInterpolator.from_dataframe(df.iloc[1:], ['x', 'y'], ['a'])
+
+
+@pytest.mark.parametrize("model", [PolynomialModel(order=2),
+                                   SplineModel(smoothing=0, degree=2)])
+def test_models_fit_and_evaluate_positions_at_once(model):
+    x = np.linspace(-1, 1, 9)
+    values = np.column_stack([x**2, 3 - x])
+    model.fit(x, values)
+    positions = [-0.5, 0, 0.25]
+    expected = np.column_stack([np.square(positions),
+                                3 - np.array(positions)])
+    assert np.allclose(model(positions), expected)
+
+
+def test_PolynomialModel_smooths_noisy_tables():
+    x = np.linspace(0, 1, 50)
+    noisy = 2*x + np.random.RandomState(0).normal(0, 0.01, len(x))
+    model = PolynomialModel(order=1).fit(x, noisy[:, None])
+    assert np.allclose(model(x)[:, 0], 2*x, atol=0.01)
+    with pytest.raises(ValueError):
+        PolynomialModel(order=3).fit([0, 1], [[0], [1]])
+
+
+def test_SplineModel_smooths_noisy_tables_by_default():
+    x = np.linspace(0, 1, 100)
+    truth = np.sin(2*np.pi*x)
+    noisy = truth + np.random.RandomState(0).normal(0, 0.05, len(x))
+    model = SplineModel().fit(x, noisy[:, None])
+    fit = model(x)[:, 0]
+    # The spline is closer to the curve than the points it was fit to
+    assert np.sqrt(np.mean((fit - truth)**2)) < 0.5 * np.std(noisy - truth)
+    assert not np.allclose(fit, noisy)
@@ -1,11 +1,13 @@
 import logging
 
 import numpy as np
+import pandas as pd
 import pytest
 from bluesky.preprocessors import run_wrapper
 from ophyd.sim import SynAxis
 
 from ..plans import calibration as calib
+from ..plans.preprocessors import return_to_start
 from .conftest import SynCamera, test_df_scan
 
 logger = logging.getLogger(__name__)
@@ -86,6 +88,25 @@ def test_detector_scaling_walk_start_positions_are_valid(fresh_RE):
     fresh_RE(run_wrapper(test_plan()))
 
 
+def test_build_calibration_df_uses_the_inputted_fields():
+    camera = SynCamera(m1, m2, delay, name="camera")
+    steps = np.linspace(-1, 1, 5)
+    # Columns the name matching would get wrong
+    df_scan = pd.DataFrame({"delay": steps, "m1_pre": 0., "m2_pre": 0.,
+                            "camera_centroid_x": 2 * steps,
+                            "camera_centroid_y": -steps,
+                            "camera_stats": 1., "other_pre": 0.},
+                           index=steps)
+    df_calib = calib.build_calibration_df(
+        df_scan, [0.5, 2], [1, -1], camera,
+        detector_fields=["camera_centroid_x", "camera_centroid_y"],
+        calib_fields=["m1", "m2"], motor_fields=["delay"])
+    assert list(df_calib.columns) == ["delay", "m1_post", "m2_post"]
+    assert np.allclose(df_calib["m1_post"], 1 - (2 * steps + 2) * 0.5)
+    with pytest.raises(ValueError):
+        calib.build_calibration_df(df_scan, [0.5, 2], [1, -1], camera)
+
+
 @pytest.mark.parametrize("weights", [(1, 1), (.5, -.5), (-10, 5.5)])
 def test_detector_scaling_walk_scale_values_are_valid(fresh_RE, weights):
     camera = SynCamera(m1, m2, delay, name="camera")
@@ -115,6 +136,117 @@ def test_detector_scaling_walk_scale_values_are_valid(fresh_RE, weights):
     fresh_RE(run_wrapper(test_plan()))
 
 
+@pytest.mark.parametrize("weights", [(1, 1), (.5, -.5), (-10, 5.5)])
+def test_detector_scaling_walk_concurrent_scale_values_are_valid(
+        fresh_RE, weights):
+    camera = SynCamera(m1, m2, delay, name="camera")
+    centroids = [camera.centroid_x, camera.centroid_y]
+    calib_motors = [m1, m2]
+    for cent, weight in zip(centroids, weights):
+        cent.weights = [weight, cent.weights[1]]
+
+    def test_plan():
+        df_scan = yield from calib.calibration_centroid_scan(
+            camera, delay, [m1, m2], -1, 1, 5, detector_fields=[
+                'camera_centroid_x',
+                'camera_centroid_y'])
+
+        # Get the expected scales if we do the walk
+        expected_scales = [1/cent.weights[0] for cent in centroids]
+        # Perform the walk
+        scales, _ = yield from calib.detector_scaling_walk(
+            df_scan, camera, calib_motors, tolerance=0, system=delay,
+            concurrent=True)
+
+        # Make sure we dont have any bad values
+        assert np.nan not in scales and np.inf not in scales
+        # Make sure we are get the expected positions of the motors
+        assert np.isclose(scales, expected_scales, rtol=rtol).all()
+
+    # Run the plan
+    fresh_RE(run_wrapper(test_plan()))
+
+
+def test_detector_scaling_walk_concurrent_shares_measurements(fresh_RE):
+    camera = SynCamera(m1, m2, delay, name="camera")
+    triggers = {}
+
+    def test_plan():
+        df_scan = yield from calib.calibration_centroid_scan(
+            camera, delay, [m1, m2], -1, 1, 5, detector_fields=[
+                'camera_centroid_x',
+                'camera_centroid_y'])
+        del msgs[:]
+        for concurrent in (False, True):
+            yield from calib.detector_scaling_walk(
+                df_scan, camera, [m1, m2], tolerance=0.01, system=delay,
+                gradients=[1, 1], concurrent=concurrent)
+            triggers[concurrent] = len(msgs)
+            del msgs[:]
+
+    msgs = []
+    fresh_RE.msg_hook = (lambda msg: msgs.append(msg)
+                         if msg.command == 'trigger' else None)
+    fresh_RE(run_wrapper(test_plan()))
+    # Walking both motors at once at least halves the measurements
+    assert 2 * triggers[True] <= triggers[False]
+
+
+def test_detector_scaling_walk_concurrent_waits_between_reads(fresh_RE):
+    camera = SynCamera(m1, m2, delay, name="camera")
+
+    def test_plan():
+        df_scan = yield from calib.calibration_centroid_scan(
+            camera, delay, [m1, m2], -1, 1, 5, detector_fields=[
+                'camera_centroid_x',
+                'camera_centroid_y'])
+        del msgs[:]
+        yield from calib.detector_scaling_walk(
+            df_scan, camera, [m1, m2], tolerance=0.01, system=delay,
+            gradients=[1, 1], concurrent=True, average=2, delay=0.05)
+
+    msgs = []
+    fresh_RE.msg_hook = (lambda msg: msgs.append(msg)
+                         if msg.command == 'sleep' else None)
+    fresh_RE(run_wrapper(test_plan()))
+    assert msgs
+
+
+def test_estimate_gradients_from_moving_calib_motors():
+    df_scan = test_df_scan.copy()
+    df_scan["m1_pre"] = np.linspace(0, 1, len(df_scan))
+    df_scan["camera_centroid_x"] = 3 * df_scan["m1_pre"] + 1
+    df_scan["m2_pre"] = 0.5
+    gradients = calib.estimate_gradients(
+        df_scan, ["camera_centroid_x", "camera_centroid_y"], ["m1", "m2"])
+    assert np.isclose(gradients[0], 3)
+    # A motor that didn't move gives no information
+    assert gradients[1] is None
+
+
+def test_detector_scaling_walk_reuses_measured_gradients(fresh_RE):
+    camera = SynCamera(m1, m2, delay, name="camera")
+    walks = []
+
+    def test_plan():
+        df_scan = yield from calib.calibration_centroid_scan(
+            camera, delay, [m1, m2], -1, 1, 5, detector_fields=[
+                'camera_centroid_x',
+                'camera_centroid_y'])
+        for _ in range(2):
+            yield from return_to_start(m1, m2)(calib.detector_scaling_walk)(
+                df_scan, camera, [m1, m2], tolerance=0.01, system=delay)
+            walks.append(len(msgs))
+            del msgs[:]
+
+    msgs = []
+    fresh_RE.msg_hook = (lambda msg: msgs.append(msg)
+                         if msg.command == 'trigger' else None)
+    fresh_RE(run_wrapper(test_plan()))
+    # The second walk starts from the gradients measured by the first
+    assert walks[1] < walks[0]
+
+
 def test_build_calibration_df_creates_correct_df_columns(fresh_RE):
     test_scale = [1.0, 1.0]
     test_start = [0.25, -0.25]
@@ -133,6 +265,18 @@ def test_build_calibration_df_creates_correct_df_columns(fresh_RE):
     assert (df_calib.columns == expected_columns).all()
 
 
+def test_build_calibration_df_broadcasts_over_dense_scans():
+    camera = SynCamera(m1, m2, delay, name="camera")
+    steps = np.linspace(-1, 1, 5000)
+    df_scan = pd.DataFrame({"delay": steps, "m1_pre": 0., "m2_pre": 0.,
+                            "camera_centroid_x": 2 * steps,
+                            "camera_centroid_y": -steps}, index=steps)
+    df_calib = calib.build_calibration_df(df_scan, [0.5, 2], [1, -1], camera)
+    assert (df_calib.dtypes == np.float64).all()
+    assert np.allclose(df_calib["m1_post"], 1 - (2 * steps + 2) * 0.5)
+    assert np.allclose(df_calib["m2_post"], -1 - (-steps - 1) * 2)
+
+
 @pytest.mark.parametrize("weights", [(1, 1), (.5, -.5), (-10, 5.5)])
 def test_scale_scan_df_creates_correct_calibration_tables(fresh_RE, weights):
     camera = SynCamera(m1, m2, delay, name="camera")
@@ -248,3 +392,9 @@ def test_calibrate_motor(fresh_RE, get_calib_motor):
 
     # Run the plan
     fresh_RE(run_wrapper(test_plan()))
+
+
+def test_scaling_is_zero_when_detector_does_not_change(caplog):
+    assert calib._scaling(m1, 'camera_centroid_x', 1, 2) == 0.5
+    assert calib._scaling(m1, 'camera_centroid_x', 1, 0) == 0
+    assert "did not change" in caplog.text
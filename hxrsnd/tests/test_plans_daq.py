@@ -0,0 +1,136 @@
+import logging
+import time
+
+import pytest
+from bluesky import Msg
+from bluesky.preprocessors import plan_mutator
+from bluesky.utils import RunEngineInterrupted, single_gen
+from ophyd.sim import SynAxis
+
+from ..notepad import NotepadScanStatus
+from ..plans.daq import TIMING_COLUMNS, daq_ascan, update_notepad
+from .conftest import SimDaq, fake_device
+
+logger = logging.getLogger(__name__)
+
+
+def run_plan(RE, plan):
+    # Keep the return value of the plan
+    result = []
+
+    def wrapper():
+        result.append((yield from plan))
+    RE(wrapper())
+    return result[0]
+
+
+def test_daq_ascan_configures_once_and_begins_every_step(fresh_RE):
+    motor = SynAxis(name="motor")
+    daq = SimDaq()
+    run_plan(fresh_RE, daq_ascan(daq, motor, 0, 2, 3, events_per_point=120))
+    assert daq.calls == {'configure': 1, 'begin': 3, 'end_run': 1}
+    assert daq.config['events'] == 120
+    # The controls are read at each step after the move
+    assert [ctrl['motor'] for ctrl in daq.controls] == [0, 1, 2]
+    assert motor.position == 0
+
+
+def test_daq_ascan_records_step_timing(fresh_RE):
+    motor = SynAxis(name="motor")
+    daq = SimDaq(delay=0.05)
+
+    # Add a known overhead before the move of every step
+    def slow_checkpoint(msg):
+        if msg.command == 'checkpoint':
+            time.sleep(0.1)
+    fresh_RE.msg_hook = slow_checkpoint
+    timing = run_plan(fresh_RE, daq_ascan(daq, motor, 0, 1, 4))
+    assert list(timing.columns) == TIMING_COLUMNS
+    assert list(timing.index) == pytest.approx([0, 1/3, 2/3, 1])
+    assert (timing['acquire'] >= 0.05).all()
+    assert (timing['move'] < 0.1).all()
+    assert (timing['overhead'] >= 0.1).all()
+    assert (timing['overhead'] < 0.15).all()
+    assert timing['total'].values == pytest.approx(
+        timing[['move', 'acquire', 'overhead']].sum(axis=1).values)
+
+
+def test_daq_ascan_batches_the_notepad(fresh_RE):
+    motor = SynAxis(name="motor")
+    daq = SimDaq()
+    notepad = fake_device(NotepadScanStatus, "TST:SCAN")
+    istep = []
+    notepad.istep.subscribe(lambda value, **kwargs: istep.append(value),
+                            run=False)
+    waits = []
+
+    def count_waits(msg):
+        if msg.command == 'wait':
+            waits.append(msg.kwargs['group'])
+    fresh_RE.msg_hook = count_waits
+    run_plan(fresh_RE, daq_ascan(daq, motor, -1, 1, 3, events_per_point=10,
+                                 notepad=notepad, return_to_start=False))
+    # The steps were published and every field was reset after the scan
+    assert istep[:3] == [0, 1, 2]
+    for field, value in notepad.defaults.items():
+        assert getattr(notepad, field).get() == value
+    # A single wait to fill the notepad and a single wait to reset it
+    notepad_waits = [grp for grp in waits if grp.startswith('notepad')]
+    assert len(notepad_waits) == 2
+
+
+def test_daq_ascan_ends_the_run_on_failure(fresh_RE):
+    motor = SynAxis(name="motor")
+    daq = SimDaq()
+
+    set_motor = motor.set
+
+    # Fail the move of the second step, after the first began the run
+    def fail(position, *args, **kwargs):
+        if position > 0:
+            raise RuntimeError("Motor fault")
+        return set_motor(position, *args, **kwargs)
+    motor.set = fail
+    with pytest.raises(RuntimeError):
+        fresh_RE(daq_ascan(daq, motor, 0, 1, 2, return_to_start=False))
+    assert daq.calls['begin'] == 1
+    assert daq.calls['end_run'] == 1
+
+
+def test_update_notepad_sets_all_fields(fresh_RE):
+    notepad = fake_device(NotepadScanStatus, "TST:SCAN")
+    fresh_RE(update_notepad(notepad, isscan=1, nsteps=5, var0='delay'))
+    assert notepad.isscan.get() == 1
+    assert notepad.nsteps.get() == 5
+    assert notepad.var0.get() == 'delay'
+
+
+def test_daq_ascan_keeps_the_step_numbers_after_a_pause(fresh_RE):
+    motor = SynAxis(name="motor")
+    daq = SimDaq()
+    notepad = fake_device(NotepadScanStatus, "TST:SCAN")
+    istep = []
+    notepad.istep.subscribe(lambda value, **kwargs: istep.append(value),
+                            run=False)
+    result = []
+
+    # Pause in the middle of the second step
+    def pause_once(msg):
+        if msg.command == 'trigger' and msg.obj is daq and not result:
+            if daq.calls['begin'] == 1:
+                result.append(None)
+                return (single_gen(Msg('pause', None, defer=False)), None)
+        return None, None
+
+    def plan():
+        result.append((yield from daq_ascan(daq, motor, 0, 2, 3,
+                                            notepad=notepad,
+                                            return_to_start=False)))
+    with pytest.raises(RunEngineInterrupted):
+        fresh_RE(plan_mutator(plan(), pause_once))
+    assert fresh_RE.state == 'paused'
+    fresh_RE.resume()
+    timing = result[-1]
+    assert not timing[['move', 'acquire', 'total']].isnull().any().any()
+    # The step that was run again after the pause kept its number
+    assert istep[:-1] == [0, 1, 1, 2]
@@ -1,11 +1,17 @@
 import logging
 import math
+import threading
+import time
 
 import numpy as np
+import pytest
 from bluesky.preprocessors import run_wrapper
+from ophyd.signal import Signal
 from ophyd.sim import SynAxis
 
-from ..plans.plan_stubs import euclidean_distance
+from ..buffers import SignalBuffer
+from ..plans.plan_stubs import (averaged_read, buffered_average,
+                                euclidean_distance)
 from .conftest import SynCamera
 
 logger = logging.getLogger(__name__)
@@ -15,6 +21,19 @@ m2 = SynAxis(name="m2")
 delay = SynAxis(name="delay")
 
 
+def put_shots(signal, values, period=0.01):
+    """
+    Puts the values to the signal from another thread, like monitor updates.
+    """
+    def run():
+        for value in values:
+            time.sleep(period)
+            signal.put(value)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
 def test_euclidean_distance(fresh_RE):
     camera = SynCamera(m1, m2, delay, name="camera")
     # Define the distance plan that makes the assertion
@@ -28,3 +47,61 @@ def test_euclidean_distance(fresh_RE):
     plan = run_wrapper(test_plan())
     # And now run it
     fresh_RE(plan)
+
+
+def test_buffered_average_uses_buffered_shots(fresh_RE):
+    sig = Signal(name="sig", value=0)
+    buf = SignalBuffer(sig, size=100)
+    for i in range(20):
+        sig.put(i)
+
+    def test_plan():
+        average = yield from buffered_average(
+            buf, num=5, fresh=False, filters={"sig": lambda x: x > 14})
+        assert average == {"sig": 17}
+
+    fresh_RE(run_wrapper(test_plan()))
+
+
+def test_buffered_average_times_out_waiting_for_shots(fresh_RE):
+    buf = SignalBuffer(Signal(name="sig", value=0), size=10)
+
+    def test_plan():
+        with pytest.raises(TimeoutError):
+            yield from buffered_average(buf, num=5, timeout=0.1)
+
+    fresh_RE(run_wrapper(test_plan()))
+
+
+def test_buffered_average_waits_for_new_shots(fresh_RE):
+    sig = Signal(name="sig", value=0)
+    buf = SignalBuffer(sig, size=100)
+    # Shots from before the plan are not used
+    for i in range(10):
+        sig.put(-1)
+
+    def test_plan():
+        put_shots(sig, [3] * 5)
+        average = yield from buffered_average(buf, num=5, timeout=5)
+        assert average == {"sig": 3}
+
+    fresh_RE(run_wrapper(test_plan()))
+
+
+def test_averaged_read_uses_buffers(fresh_RE):
+    camera = SynCamera(m1, m2, delay, name="camera")
+    sig = Signal(name=camera.centroid_x.name, value=0)
+    buf = SignalBuffer(sig, size=10)
+
+    def test_plan():
+        put_shots(sig, [2] * 3)
+        reads = yield from averaged_read([camera], num=3, buffers=[buf],
+                                         timeout=5)
+        assert reads[camera.centroid_x.name] == 2
+        assert camera.centroid_y.name in reads
+        put_shots(sig, [4] * 3)
+        distance = yield from euclidean_distance(
+            camera, ['centroid_x'], [1], average=3, buffers={'x': buf})
+        assert np.isclose(distance, 3)
+
+    fresh_RE(run_wrapper(test_plan()))
@@ -1,11 +1,14 @@
 import logging
 
 import pytest
-from bluesky.plan_stubs import rel_set
+from bluesky.plan_stubs import abs_set, rel_set
 from bluesky.preprocessors import run_wrapper
 from ophyd.sim import SynAxis
 
-from ..plans.preprocessors import return_to_start
+from ..plans.preprocessors import (_wait_for_pending,
+                                   pending_returns_preprocessor,
+                                   return_to_start, wait_for_returns,
+                                   wait_for_returns_wrapper)
 
 logger = logging.getLogger(__name__)
 
@@ -39,3 +42,93 @@ def test_return_to_start_returns_motors_correctly(fresh_RE, return_devices):
 
     # Assert they are the same
     assert current_positions == expected_positions
+
+
+def test_return_to_start_without_waiting_overlaps_the_next_plan(fresh_RE):
+    fresh_RE.preprocessors.append(pending_returns_preprocessor())
+    slow = SynAxis(name="slow", delay=0.2)
+    initial_position = slow.position
+
+    @return_to_start(slow, wait=False)
+    def move_plan():
+        yield from rel_set(slow, 1, wait=True)
+
+    # The plan finishes while the motor is still on its way home
+    fresh_RE(run_wrapper(move_plan()))
+    assert slow.position != initial_position
+
+    # The next plan on the same motor starts from the original position
+    starts = []
+
+    @return_to_start(slow)
+    def next_plan():
+        starts.append(slow.position)
+        yield from rel_set(slow, 1, wait=True)
+
+    fresh_RE(run_wrapper(next_plan()))
+    assert starts == [initial_position]
+    assert slow.position == initial_position
+
+
+def test_wait_for_returns_waits_on_pending_moves(fresh_RE):
+    fresh_RE.preprocessors.append(pending_returns_preprocessor())
+    slow = SynAxis(name="slow", delay=0.2)
+    initial_position = slow.position
+
+    @return_to_start(slow, wait=False)
+    def move_plan():
+        yield from rel_set(slow, 1, wait=True)
+
+    fresh_RE(run_wrapper(move_plan()))
+    fresh_RE(run_wrapper(wait_for_returns()))
+    assert slow.position == initial_position
+
+
+def test_wait_for_returns_wrapper_waits_before_setting_a_returning_device(
+        fresh_RE):
+    slow = SynAxis(name="slow", delay=0.2)
+
+    @return_to_start(slow, wait=False)
+    def move_plan():
+        yield from rel_set(slow, 1, wait=True)
+
+    def plan():
+        yield from move_plan()
+        yield from abs_set(slow, 5, wait=True)
+
+    commands = []
+    fresh_RE.msg_hook = lambda msg: commands.append(msg.command)
+    fresh_RE(run_wrapper(wait_for_returns_wrapper(plan())))
+    # The return finished before the new move was sent
+    i = commands.index('wait_for')
+    assert commands[i-1:i+2] == ['null', 'wait_for', 'set']
+    assert slow.position == 5
+
+
+def test_pending_returns_are_kept_per_RunEngine(fresh_RE):
+    slow = SynAxis(name="slow", delay=0.2)
+
+    @return_to_start(slow, wait=False)
+    def move_plan():
+        yield from rel_set(slow, 1, wait=True)
+
+    fresh_RE.preprocessors.append(pending_returns_preprocessor())
+    fresh_RE(run_wrapper(move_plan()))
+    # Plans run without the preprocessor don't see the pending return
+    commands = []
+    plan = wait_for_returns_wrapper(abs_set(slow, 5, wait=True))
+    for msg in plan:
+        commands.append(msg.command)
+    assert commands == ['set', 'wait']
+    fresh_RE(wait_for_returns())
+    assert slow.position == 0
+
+
+def test_wait_for_returns_keeps_returns_that_were_not_waited_on():
+    slow = SynAxis(name="slow", delay=0.2)
+    pending = {slow: slow.set(1)}
+    plan = _wait_for_pending(pending, [slow])
+    assert next(plan).command == 'wait_for'
+    with pytest.raises(RuntimeError):
+        plan.throw(RuntimeError("Interrupted"))
+    assert slow in pending
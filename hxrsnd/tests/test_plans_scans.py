@@ -6,7 +6,8 @@ from bluesky.preprocessors import run_wrapper
 from numpy import linspace
 from ophyd.sim import SynAxis
 
-from ..plans.scans import centroid_scan
+from ..plans.scans import centroid_scan, linear_scan
+from ..scanarchive import ScanArchive
 from ..utils import as_list
 from .conftest import SynCamera
 
@@ -93,3 +94,85 @@ def test_centroid_scan_returns_correct_columns(fresh_RE, mot_fields, det_fields,
         assert (delay_scan.columns == expected_columns).all()
     # Run the plan
     fresh_RE(run_wrapper(test_plan()))
+
+
+def test_centroid_scan_archives_every_step(fresh_RE, tmpdir):
+    camera = SynCamera(m1, m2, delay, name="camera")
+    archive = ScanArchive(str(tmpdir))
+
+    def test_plan():
+        df = yield from centroid_scan(camera, delay, -1, 1, 3,
+                                      detector_fields=['camera_centroid_x'],
+                                      archive=archive, md={'sample': 'test'})
+        scan = archive.last(motor='delay')
+        assert scan.meta['plan'] == 'centroid_scan'
+        assert scan.meta['md']['sample'] == 'test'
+        assert scan.to_dataframe().astype(float).equals(df.astype(float))
+
+    fresh_RE(run_wrapper(test_plan()))
+
+
+@pytest.mark.parametrize("pipeline", [False, True])
+def test_linear_scan_steps_through_every_position(fresh_RE, pipeline):
+    motor = SynAxis(name="motor")
+    aux = SynAxis(name="aux")
+    positions = []
+    fresh_RE.subscribe(lambda name, doc: positions.append(
+        doc['data']['motor']), 'event')
+    follow = {aux: [10, 20, 30]}
+    fresh_RE(linear_scan(motor, 0, 2, 3, return_to_start=False,
+                         pipeline=pipeline, follow=follow))
+    assert positions == [0, 1, 2]
+    assert aux.position == 30
+
+
+def test_linear_scan_pipeline_prepares_next_step_during_measurement(fresh_RE):
+    motor = SynAxis(name="motor")
+    aux = SynAxis(name="aux")
+    msgs = []
+    fresh_RE.msg_hook = msgs.append
+    fresh_RE(linear_scan(motor, 0, 1, 2, return_to_start=False, pipeline=True,
+                         follow={aux: [5, 6]}))
+    commands = [(msg.command, msg.obj) for msg in msgs
+                if msg.command in ('set', 'trigger', 'save')]
+    # The next aux move starts between the trigger and save of the step
+    assert commands == [('set', aux), ('set', motor), ('trigger', motor),
+                        ('set', aux), ('save', None), ('set', motor),
+                        ('trigger', motor), ('save', None)]
+
+
+def test_linear_scan_pipeline_stops_before_moving_to_a_bad_step(fresh_RE):
+    motor = SynAxis(name="motor")
+
+    def check_value(value):
+        if value > 1:
+            raise ValueError("Beyond the limits")
+    motor.check_value = check_value
+    positions = []
+    fresh_RE.subscribe(lambda name, doc: positions.append(
+        doc['data']['motor']), 'event')
+    with pytest.raises(ValueError):
+        fresh_RE(linear_scan(motor, 0, 2, 3, return_to_start=False,
+                             pipeline=True))
+    # The first two steps were measured and the motor never left them
+    assert positions == [0, 1]
+    assert motor.position == 1
+
+
+def test_linear_scan_checks_follow_positions(fresh_RE):
+    with pytest.raises(ValueError):
+        fresh_RE(linear_scan(m1, 0, 1, 3, follow={m2: [0, 1]}))
+
+
+def test_linear_scan_checks_the_whole_trajectory_before_moving(fresh_RE):
+    motor = SynAxis(name="motor")
+    checked = []
+
+    def check_values(positions):
+        checked.append(list(positions))
+        raise ValueError("Beyond the limits")
+    motor.check_values = check_values
+    with pytest.raises(ValueError):
+        fresh_RE(linear_scan(motor, 0, 2, 3, return_to_start=False))
+    assert checked == [[0, 1, 2]]
+    assert motor.position == 0
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+import pytest
+
+from hxrsnd.sndsystem import SplitAndDelay
+
+from .conftest import fake_device
+
+caproto = pytest.importorskip('caproto')
+from caproto.sync.client import read  # noqa: E402
+
+from hxrsnd.publisher import SndPublisher  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture(scope='function')
+def publisher(monkeypatch):
+    # Only search for the PVs on the local host
+    monkeypatch.setenv('EPICS_CA_AUTO_ADDR_LIST', 'NO')
+    monkeypatch.setenv('EPICS_CA_ADDR_LIST', '127.0.0.1')
+    snd = fake_device(SplitAndDelay, "TEST:SND")
+    snd.t1.tth.user_readback.sim_put(20)
+    snd.t2.th.user_readback.sim_put(10)
+    snd.t1.L.user_readback.sim_put(100)
+    for dev in snd._diagnostics + snd._towers:
+        dev.x.user_readback.sim_put(0)
+    snd.di.x.user_readback.sim_put(snd.di.block_pos)
+    prefix = "TST:SND:{0}:".format(uuid.uuid4().hex[:8])
+    publisher = SndPublisher(snd, prefix, period=0.05,
+                             interfaces=['127.0.0.1'])
+    yield publisher
+    publisher.stop()
+
+
+def test_SndPublisher_snapshot_has_every_quantity(publisher):
+    snd = publisher.snd
+    snapshot = publisher.snapshot()
+    assert snapshot['E1'] == snd.E1.position
+    assert snapshot['E2'] == snd.E2.position
+    assert snapshot['delay'] == snd.delay.position
+    assert snapshot['beam_path'] == snd.beam_path
+    assert list(snapshot['diagnostics']) == ['di', 'dd', 'do', 'dci', 'dcc',
+                                             'dco']
+    assert snapshot['diagnostics']['di']['blocked'] is True
+
+
+def test_SndPublisher_serves_the_quantities_on_localhost(publisher):
+    snd = publisher.snd
+    publisher.start()
+    prefix = publisher.prefix
+    assert read(prefix + 'E1', timeout=2).data[0] == snd.E1.position
+    assert read(prefix + 'DI:BLOCKED', timeout=2,
+                data_type='native').data[0] == 1
+    status = json.loads(bytes(read(prefix + 'STATUS', timeout=2).data)
+                        .rstrip(b'\x00'))
+    assert status['beam_path'] == snd.beam_path
+
+    # Changes in the system show up after the next update
+    snd.t1.tth.user_readback.sim_put(22)
+    time.sleep(0.3)
+    assert read(prefix + 'E1', timeout=2).data[0] == snd.E1.position
+
+    publisher.stop()
+    assert not publisher.running
+
+
+def test_SndPublisher_only_writes_status_when_it_changes(publisher):
+    snapshot = publisher.snapshot()
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(publisher._publish(snapshot))
+        first = publisher.group.STATUS.value
+        snapshot['timestamp'] += 10
+        loop.run_until_complete(publisher._publish(snapshot))
+        assert publisher.group.STATUS.value == first
+        snapshot['beam_path'] = 'Other'
+        loop.run_until_complete(publisher._publish(snapshot))
+        assert publisher.group.STATUS.value != first
+    finally:
+        loop.close()
+
+
+def test_SndPublisher_start_raises_if_the_status_is_never_published(
+        publisher, monkeypatch):
+    def snapshot():
+        raise ValueError("No system")
+    monkeypatch.setattr(publisher, 'snapshot', snapshot)
+    with pytest.raises(RuntimeError, match="No system"):
+        publisher.start(timeout=0.5)
+    assert not publisher.running
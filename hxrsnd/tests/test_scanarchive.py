@@ -0,0 +1,45 @@
+import logging
+
+import numpy as np
+import pytest
+
+from hxrsnd.scanarchive import ScanArchive
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture(scope='function')
+def archive(tmpdir):
+    return ScanArchive(str(tmpdir))
+
+
+def test_ScanArchive_records_and_selects_scans(archive):
+    assert archive.scans() == []
+    first = archive.record('centroid_scan', 'delay', ['a', 'b'],
+                           md={'steps': 3})
+    for i in range(3):
+        first.append(i, {'a': i, 'b': 2*i}, timestamp=100+i)
+    second = archive.record('calibration_scan', 'e1', ['c'])
+    second.append(0, {'c': 'not a number'}, timestamp=200)
+
+    assert [s['scan_id'] for s in archive.scans()] == [1, 2]
+    assert [s['scan_id'] for s in archive.scans(motor='e1')] == [2]
+    assert archive.scans(plan='centroid_scan')[0]['md'] == {'steps': 3}
+    assert np.isnan(archive.last(motor='e1').field('c')[0])
+
+    scan = archive.load(1)
+    assert len(scan) == 3
+    assert list(scan.field('b')) == [0, 2, 4]
+    assert list(scan.between(101, 102)[:, 1]) == [1]
+    # Selections are views of the memory-mapped file
+    assert np.shares_memory(scan.field('a'), scan.data)
+    df = scan.to_dataframe()
+    assert list(df.columns) == ['a', 'b']
+    assert list(df.index) == [0, 1, 2]
+
+
+def test_ScanArchive_raises_for_missing_scans(archive):
+    with pytest.raises(KeyError):
+        archive.load(1)
+    with pytest.raises(KeyError):
+        archive.last()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import logging
+import os
+import threading
+import time
+
+import pytest
+from bluesky import RunEngine
+from ophyd.sim import SynAxis
+from ophyd.status import DeviceStatus
+
+from hxrsnd.server import SndClient, SndServer, _default_authkey
+from hxrsnd.sndsystem import SplitAndDelay
+
+from .conftest import fake_device
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture(scope='function')
+def server():
+    snd = fake_device(SplitAndDelay, "TEST:SND")
+    snd.t1.tth.user_readback.sim_put(20)
+    snd.t2.th.user_readback.sim_put(10)
+    snd.t1.L.user_readback.sim_put(100)
+    for dev in snd._diagnostics + snd._towers:
+        dev.x.user_readback.sim_put(0)
+    server = SndServer(snd, address=('localhost', 0), authkey=b'test')
+    server.start()
+    yield server
+    server.stop()
+
+
+def client_of(server):
+    return SndClient(server.address, authkey=b'test')
+
+
+def test_SndClient_reads_from_the_server(server):
+    client = client_of(server)
+    assert client.ping() == 'pong'
+    assert client.get('E1.position') == server.snd.E1.position
+    snapshot = client.snapshot()
+    assert snapshot['beam_path'] == server.snd.beam_path
+    assert list(snapshot['diagnostics']) == ['di', 'dd', 'do', 'dci', 'dcc',
+                                             'dco']
+    # Errors are raised in the client
+    with pytest.raises(AttributeError):
+        client.get('t1._energy_motors')
+    with pytest.raises(AttributeError):
+        client.get('not_a_device')
+    client.close()
+
+
+def test_SndServer_shares_simultaneous_reads(server, monkeypatch):
+    calls = []
+    snapshot = server.snd.snapshot
+
+    def slow_snapshot():
+        calls.append(1)
+        time.sleep(0.2)
+        return snapshot()
+    monkeypatch.setattr(server.snd, 'snapshot', slow_snapshot)
+
+    clients = [client_of(server) for _ in range(3)]
+    results = []
+    threads = [threading.Thread(target=lambda c=c: results.append(
+        c.snapshot())) for c in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 3
+    assert len(calls) == 1
+    # Later reads are made again
+    clients[0].snapshot()
+    assert len(calls) == 2
+
+
+def test_SndServer_runs_plans_in_the_serving_thread(server):
+    server.snd.RE = RunEngine({})
+    motor = SynAxis(name='motor')
+    server.snd.motor = motor
+    results = []
+
+    def run():
+        client = client_of(server)
+        try:
+            client.run_plan('bluesky.plan_stubs.mv', client.ref('motor'), 5)
+            with pytest.raises(ValueError):
+                client.run_plan('os.system', 'true')
+            results.append(client.get('motor.position'))
+        finally:
+            server.stop()
+
+    threading.Thread(target=run).start()
+    server.serve_forever()
+    assert results == [5]
+
+
+def test_SndServer_refuses_moves_while_a_plan_runs(server):
+    server.snd.RE = RunEngine({})
+    motor = server.snd.motor = SynAxis(name='motor')
+    motor.move = lambda position, wait=False: motor.set(position)
+    errors = []
+    results = []
+
+    def run():
+        client = client_of(server)
+        try:
+            plan = threading.Thread(target=client_of(server).run_plan,
+                                    args=('bluesky.plan_stubs.sleep', 0.5))
+            plan.start()
+            time.sleep(0.2)
+            for request in (lambda: client.move('motor', 1),
+                            lambda: client.call('motor.set', 1)):
+                try:
+                    request()
+                except RuntimeError as e:
+                    errors.append(e)
+            plan.join()
+            # Moves are accepted again after the plan
+            results.append(client.move('motor', 2))
+        finally:
+            server.stop()
+
+    threading.Thread(target=run).start()
+    server.serve_forever()
+    assert len(errors) == 2
+    assert all('plan is running' in str(e) for e in errors)
+    assert results == [2]
+
+
+def test_SndServer_refuses_plans_while_a_move_runs(server):
+    server.snd.RE = RunEngine({})
+    motor = server.snd.motor = SynAxis(name='motor')
+
+    def slow_move(position, wait=False):
+        status = DeviceStatus(motor)
+        threading.Timer(0.3, status._finished).start()
+        return status
+    motor.move = slow_move
+    errors = []
+    results = []
+
+    def run():
+        client = client_of(server)
+        try:
+            client.move('motor', 1, wait=False)
+            try:
+                client.run_plan('bluesky.plan_stubs.sleep', 0.01)
+            except RuntimeError as e:
+                errors.append(e)
+            time.sleep(0.5)
+            # Plans are accepted again once the move is done
+            results.append(client.run_plan('bluesky.plan_stubs.sleep', 0.01))
+        finally:
+            server.stop()
+
+    threading.Thread(target=run).start()
+    server.serve_forever()
+    assert len(errors) == 1
+    assert 'still running' in str(errors[0])
+    assert len(results) == 1
+    assert not server._moves
+
+
+def test_SndServer_move_returns_none_if_the_move_was_cancelled(server):
+    server.snd.motor = SynAxis(name='motor')
+    server.snd.motor.move = lambda position, wait=False: None
+    client = client_of(server)
+    assert client.move('motor', 1) is None
+    client.close()
+
+
+def test_default_authkey_creates_a_private_key_file(tmpdir, monkeypatch):
+    monkeypatch.delenv('HXRSND_SERVER_KEY', raising=False)
+    key_file = str(tmpdir.join('key'))
+    key = _default_authkey(key_file)
+    assert len(key) == 64
+    assert os.stat(key_file).st_mode & 0o777 == 0o600
+    assert _default_authkey(key_file) == key
+    # Keys other users can read are refused
+    os.chmod(key_file, 0o644)
+    with pytest.raises(PermissionError):
+        _default_authkey(key_file)
+    monkeypatch.setenv('HXRSND_SERVER_KEY', 'secret')
+    assert _default_authkey(key_file) == b'secret'
@@ -4,9 +4,13 @@ import logging
 from collections import OrderedDict
 
 import pytest
+from ophyd.device import Component as Cmp
 from ophyd.device import Device
+from ophyd.signal import Signal
 
 from hxrsnd import snddevice
+from hxrsnd.snddevice import SndDevice
+from hxrsnd.tower import DelayTower
 
 from .conftest import fake_device, get_classes_in_module
 
@@ -18,3 +22,25 @@ def test_sndevice_devices_instantiate_and_run_ophyd_functions(dev):
     device = fake_device(dev)
     assert(isinstance(device.read(), OrderedDict))
     assert(isinstance(device.read_configuration(), OrderedDict))
+
+
+def test_SndDevice_connect_all_returns_nothing_when_connected():
+    tower = fake_device(DelayTower, "TEST:SND:T1")
+    assert tower.connect_all(timeout=1) == []
+
+
+def test_SndDevice_connect_all_reports_unconnected_signals():
+    class UnconnectedSignal(Signal):
+        pvname = "TEST:UNCONNECTED"
+
+        @property
+        def connected(self):
+            return False
+
+    class TestDevice(SndDevice):
+        good = Cmp(Signal)
+        bad = Cmp(UnconnectedSignal)
+
+    device = TestDevice("TEST", name="test")
+    unconnected = device.connect_all(timeout=0.1)
+    assert unconnected == [(device.bad.name, "TEST:UNCONNECTED")]
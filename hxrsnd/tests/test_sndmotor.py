@@ -10,12 +10,14 @@ import pytest
 from bluesky.preprocessors import run_wrapper
 from ophyd.device import Device
 from ophyd.sim import SynAxis
+from ophyd.utils import LimitError
 
 from hxrsnd import sndmotor
 
 from ..exceptions import InputError
+from ..interpolation import PolynomialModel
 from ..plans.scans import centroid_scan
-from ..sndmotor import CalibMotor
+from ..sndmotor import CalibMotor, SamMotor
 from .conftest import SynCamera, fake_device, get_classes_in_module
 
 logger = logging.getLogger(__name__)
@@ -29,6 +31,27 @@ def test_sndmotor_devices_instantiate_and_run_ophyd_functions(dev):
     assert(isinstance(device.read_configuration(), OrderedDict))
 
 
+def test_SamMotor_check_value_raises_if_the_limits_cant_be_read(
+        monkeypatch):
+    motor = fake_device(SamMotor)
+    reads = []
+
+    def limits(self):
+        reads.append(1)
+        return None
+    monkeypatch.setattr(SamMotor, 'limits', property(limits),
+                        raising=False)
+    with pytest.raises(TypeError):
+        motor.check_value(0, retries=3)
+    assert len(reads) == 3
+    with pytest.raises(TypeError):
+        motor.check_values([0, 1])
+    monkeypatch.setattr(SamMotor, 'limits', property(lambda self: (-1, 1)))
+    motor.check_value(0)
+    with pytest.raises(LimitError):
+        motor.check_value(2)
+
+
 def test_CalibMotor_configure_raises_errors_on_bad_inputs():
     dev = CalibMotor("TST", name="test")
     config = deepcopy(dev.read_configuration())
@@ -188,3 +211,104 @@ def test_CalibMotor_move_compensation(fresh_RE, get_calib_motor):
                     average=1, tolerance=0, confirm_overwrite=False)
     # Run the plan
     fresh_RE(run_wrapper(test_plan()))
+
+
+def test_CalibMotor_saves_and_loads_calibrations(tmpdir):
+    aux = SynAxis(name='aux')
+    dev = CalibMotor("TST", name="test", calib_motors=[aux])
+    with pytest.raises(InputError):
+        dev.save_calibration(store=str(tmpdir))
+
+    calib = pd.DataFrame({'test': [0., 1.], 'aux_post': [2., 3.]})
+    scan = pd.DataFrame({'test': [0., 1.], 'cam': [5., 6.]})
+    dev.configure(calib=calib, scan=scan, motors=[dev, aux], scale=[1],
+                  start=[2])
+    timestamp = dev._calib['calib']['timestamp']
+    assert dev.save_calibration(store=str(tmpdir)) == 1
+
+    new_dev = CalibMotor("TST", name="test", calib_motors=[aux])
+    new_dev.load_calibration(store=str(tmpdir))
+    assert new_dev.has_calib and new_dev.use_calib
+    assert new_dev.calibration['calib'].equals(calib)
+    assert new_dev.calibration['scan'].equals(scan)
+    assert new_dev._calib['motors']['value'] == [new_dev, aux]
+    assert new_dev._calib['calib']['timestamp'] == timestamp
+
+    # Saved motors must be found on the motor loading the calibration
+    with pytest.raises(InputError):
+        CalibMotor("TST", name="test").load_calibration(store=str(tmpdir))
+
+
+def test_CalibMotor_compensates_with_nd_tables(tmpdir):
+    aux = SynAxis(name='aux')
+    energy = SynAxis(name='energy')
+    aux.move = aux.set
+    dev = CalibMotor("TST", name="test")
+    delays, energies = np.meshgrid([0., 1., 2.], [5., 10.], indexing='ij')
+    calib = pd.DataFrame({'test': delays.ravel(), 'energy': energies.ravel(),
+                          'aux_post': (delays * energies).ravel()})
+
+    # Tables have to fill the whole grid
+    with pytest.raises(InputError):
+        dev.configure(calib=calib.iloc[1:], motors=[dev, aux], axes=[energy])
+    # And have a column per axis
+    with pytest.raises(InputError):
+        dev.configure(calib=calib, motors=[dev, aux])
+
+    dev.configure(calib=calib, motors=[dev, aux], axes=[energy])
+    assert dev.has_calib
+    assert dev.calibration['axes'] == ['energy']
+    energy.set(7.5)
+    dev._calib_compensate(1.5)
+    assert np.isclose(aux.position, 1.5 * 7.5)
+
+    # Axes are saved and found again through calib_axes
+    dev.save_calibration(store=str(tmpdir))
+    new_dev = CalibMotor("TST", name="test", calib_motors=[aux])
+    new_dev.calib_axes = [energy]
+    new_dev.load_calibration(store=str(tmpdir))
+    assert new_dev._calib['axes']['value'] == [energy]
+    new_dev._calib_compensate(0.5)
+    assert np.isclose(aux.position, 0.5 * 7.5)
+
+
+def test_CalibMotor_fits_models_to_the_correction_table(tmpdir):
+    aux = SynAxis(name='aux')
+    aux.move = aux.set
+    dev = CalibMotor("TST", name="test", calib_motors=[aux])
+    positions = np.linspace(0, 2, 11)
+    calib = pd.DataFrame({'test': positions, 'aux_post': positions**2})
+
+    # Models need enough points and only fit 1-D tables
+    with pytest.raises(InputError):
+        dev.configure(calib=calib.iloc[:2], motors=[dev, aux],
+                      model=PolynomialModel(order=2))
+    with pytest.raises(InputError):
+        dev.configure(calib=calib, motors=[dev, aux], model='cubic')
+
+    dev.configure(calib=calib, motors=[dev, aux],
+                  model=PolynomialModel(order=2))
+    assert np.allclose(dev.calib_positions([0.5, 1.5])[:, 0], [0.25, 2.25])
+    dev._calib_compensate(1.25)
+    assert np.isclose(aux.position, 1.25**2)
+
+    # The model is refit when the calibration is loaded
+    dev.save_calibration(store=str(tmpdir))
+    new_dev = CalibMotor("TST", name="test", calib_motors=[aux])
+    new_dev.load_calibration(store=str(tmpdir))
+    assert isinstance(new_dev._calib['model']['value'], PolynomialModel)
+    assert np.allclose(new_dev.calib_positions(0.5), [[0.25]])
+
+    # Going back to the table interpolates between the bracketing rows and
+    # extrapolates past the ends
+    new_dev.configure(calib=calib.iloc[::-1], model='linear')
+    assert np.allclose(new_dev.calib_positions([0.1, 1.0, -0.2, 2.2])[:, 0],
+                       [0.02, 1.0, -0.04, 4.76])
+
+    # Ends with a single position hold their values instead of dividing by
+    # zero
+    new_dev.configure(calib=calib.iloc[:1], model='linear')
+    assert np.allclose(new_dev.calib_positions([-1, 0, 1])[:, 0], 0)
+    repeated = pd.concat([calib.iloc[:1], calib])
+    new_dev.configure(calib=repeated, model='linear')
+    assert np.allclose(new_dev.calib_positions([-1, 2.2])[:, 0], [0, 4.76])
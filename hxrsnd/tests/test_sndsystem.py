@@ -1,6 +1,21 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import logging
+import time
+
+import pytest
+from ophyd.status import DeviceStatus
+from ophyd.utils import LimitError
+
+from hxrsnd import snddevice
+from hxrsnd.aerotech import AeroBase
+from hxrsnd.attocube import EccBase
+from hxrsnd.exceptions import MotorDisabled
+from hxrsnd.plans.preprocessors import _snapshot_positions
+from hxrsnd.plans.scans import linear_scan
+from hxrsnd.sndsystem import SplitAndDelay
+
+from .conftest import fake_device
 
 logger = logging.getLogger(__name__)
 
@@ -10,3 +25,315 @@ logger = logging.getLogger(__name__)
 #     device = fake_device(dev)
 #     assert(isinstance(device.read(), OrderedDict))
 #     assert(isinstance(device.read_configuration(), OrderedDict))
+
+
+@pytest.fixture(scope='function')
+def snd():
+    snd = fake_device(SplitAndDelay, "TEST:SND")
+    snd.t1.tth.user_readback.sim_put(20)
+    snd.t2.th.user_readback.sim_put(10)
+    snd.t1.L.user_readback.sim_put(100)
+    for diag in snd._diagnostics:
+        diag.x.user_readback.sim_put(0)
+    return snd
+
+
+def test_SplitAndDelay_diag_states_match_blocked(snd):
+    snd.dd.x.user_readback.sim_put(snd.dd.pos_func())
+    snd.dcc.x.user_readback.sim_put(snd.dcc.pos_func() + snd.dcc.block_pos)
+    snd.di.x.user_readback.sim_put(snd.di.block_pos)
+    for diag, blocked, position in snd._diag_states():
+        assert blocked == diag.blocked
+        assert position == diag.x.position
+    assert snd.dd.blocked is False
+    assert snd.dcc.blocked is True
+    assert snd.di.blocked is True
+
+
+def test_SplitAndDelay_diag_states_compute_positions_once(snd):
+    calls = {}
+
+    def count(key, func):
+        calls[key] = 0
+
+        def inner(*args, **kwargs):
+            calls[key] += 1
+            return func(*args, **kwargs)
+        return inner
+
+    snd.E1._get_delay_diagnostic_position = count(
+        'E1', snd.E1._get_delay_diagnostic_position)
+    snd.E2._get_channelcut_diagnostic_position = count(
+        'E2', snd.E2._get_channelcut_diagnostic_position)
+
+    snd._diag_states()
+    assert all(num == 1 for num in calls.values())
+
+
+def test_SplitAndDelay_consistent_reads_reads_each_signal_once(snd):
+    reads = {}
+
+    def count(signal):
+        get = signal.get
+
+        def inner(*args, **kwargs):
+            reads[signal.name] = reads.get(signal.name, 0) + 1
+            return get(*args, **kwargs)
+        signal.get = inner
+
+    for walk in snd.walk_signals():
+        count(walk.item)
+
+    with snd.consistent_reads():
+        for _ in range(2):
+            snd.read()
+            snd.delay.position
+    assert reads
+    assert max(reads.values()) == 1
+
+    # Reads are only shared inside of the context
+    reads.clear()
+    snd.t1.tth.user_readback.get()
+    snd.t1.tth.user_readback.get()
+    assert reads[snd.t1.tth.user_readback.name] == 2
+    with snd.consistent_reads():
+        snd.t1.tth.user_readback.get()
+        snd.t1.tth.user_readback.sim_put(25)
+        assert snd.t1.tth.user_readback.get() == 20
+    assert snd.t1.tth.user_readback.get() == 25
+
+
+def test_SplitAndDelay_consistent_reads_are_kept_per_device(snd):
+    other = fake_device(SplitAndDelay, "TEST:OTHER")
+    signal = snd.t1.tth.user_readback
+    other_signal = other.t1.tth.user_readback
+    other_signal.sim_put(20)
+    with other.consistent_reads():
+        pass
+    with snd.consistent_reads():
+        assert signal.get() == 20
+        signal.sim_put(25)
+        other_signal.sim_put(25)
+        assert signal.get() == 20
+        # Devices without an open context are read as usual
+        assert other_signal.get() == 25
+    # The original get methods are restored once the contexts close
+    assert 'get' not in vars(signal)
+    assert 'get' not in vars(other_signal)
+    assert not snddevice._memoized
+
+
+def test_return_to_start_snapshots_the_system_in_one_read(snd):
+    contexts = []
+    consistent_reads = snd.consistent_reads
+
+    def record():
+        # Whether the context is nested in one that is already open
+        contexts.append(getattr(snd._reads, 'cache', None) is not None)
+        return consistent_reads()
+    snd.consistent_reads = record
+    devices = [snd.E1, snd.delay, snd.t1.tth]
+    positions = _snapshot_positions(devices)
+    # The delay read its position inside of the context of the snapshot
+    assert contexts == [False, True]
+    assert list(positions) == devices
+    assert positions[snd.t1.tth] == 20
+
+
+def test_SplitAndDelay_macro_readbacks_push_debounced_updates(snd):
+    snd.E1.readback.min_interval = 0.2
+    values = []
+    snd.E1.readback.subscribe(
+        lambda value=None, **kwargs: values.append(value))
+    assert values == [snd.E1.position]
+
+    # Changes inside the interval are combined into one update
+    for tth in (21, 22, 23):
+        snd.t1.tth.user_readback.sim_put(tth)
+    assert len(values) == 1
+    time.sleep(0.4)
+    assert values[1:] == [snd.E1.position]
+
+    # Motors the readback is not computed from don't update it
+    snd.t2.th.user_readback.sim_put(11)
+    time.sleep(0.3)
+    assert len(values) == 2
+
+
+def test_SplitAndDelay_macro_readbacks_unsubscribe_their_inputs(snd):
+    readback = snd.E1.readback
+    inputs = readback.parent._readback_inputs()
+    counts = [len(sig._callbacks[sig.SUB_VALUE]) for sig in inputs]
+    first = readback.subscribe(lambda **kwargs: None)
+    second = readback.subscribe(lambda **kwargs: None)
+    assert [len(sig._callbacks[sig.SUB_VALUE])
+            for sig in inputs] == [count + 1 for count in counts]
+    # The inputs stay monitored until the last subscriber is removed
+    readback.unsubscribe(first)
+    assert readback._inputs_subscribed
+    readback.unsubscribe(second)
+    assert [len(sig._callbacks[sig.SUB_VALUE]) for sig in inputs] == counts
+    # Subscribing again monitors the inputs and sends the current value
+    values = []
+    readback.subscribe(lambda value=None, **kwargs: values.append(value))
+    assert values == [snd.E1.position]
+    assert readback._inputs_subscribed
+
+
+def test_SplitAndDelay_stop_sends_every_stop_and_reports_confirmations(snd):
+    motors = []
+    for device in snd._towers + snd._diagnostics:
+        motors += device._find_devices((AeroBase, EccBase))
+    stopped = []
+
+    def putter(motor, confirm):
+        def put(value, callback=None, **kwargs):
+            stopped.append(motor.name)
+            if confirm:
+                callback()
+        return put
+
+    for i, motor in enumerate(motors):
+        # Leave one motor that never confirms
+        motor.motor_stop.put = putter(motor, i != 0)
+    # A move in progress fails without waiting for the motor to settle
+    move = DeviceStatus(snd.t1.L)
+    snd.t1.L.subscribe(move._finished, event_type=snd.t1.L._SUB_REQ_DONE,
+                       run=False)
+    confirmed = snd.stop(timeout=0.1, print_status=False)
+    assert move.done and not move.success
+    # The failed move stops its motor a second time
+    assert sorted(set(stopped)) == sorted(motor.name for motor in motors)
+    assert list(confirmed) == [motor.name for motor in motors]
+    assert [name for name, done in confirmed.items() if not done] == [
+        motors[0].name]
+    # The tower and diagnostic motors are all included
+    assert snd.t1.L.name in confirmed
+    assert snd.t1.chi2.name in confirmed
+    assert snd.dcc.y.name in confirmed
+
+
+def test_SplitAndDelay_ready_readies_every_motor(snd):
+    snd.t1.disable()
+    assert not snd.t1.L.enabled
+    assert snd.ready(timeout=5, print_status=False) == []
+    for device in snd._towers + snd._diagnostics:
+        for motor in device._find_devices((AeroBase, EccBase)):
+            assert motor.enabled
+            if isinstance(motor, AeroBase):
+                assert motor.state_component.get() == "Go"
+
+
+@pytest.fixture(scope='function')
+def beam_path_snd(snd):
+    # Record the checks and moves instead of moving the fake motors
+    snd.calls = []
+    for device in snd._towers + snd._diagnostics:
+        motor = device.x
+
+        def check_status(position, motor=motor):
+            snd.calls.append(('check', motor.name))
+
+        def move(position, wait=False, check_status=True, motor=motor):
+            snd.calls.append(('move', motor.name))
+            motor.user_readback.sim_put(position)
+            status = DeviceStatus(motor)
+            status._finished()
+            return status
+        motor.check_status = check_status
+        motor.move = move
+    snd.t2.pos_inserted = snd.t3.pos_inserted = 10
+    snd.update_beam_paths()
+    return snd
+
+
+def test_SplitAndDelay_set_beam_path_checks_everything_before_moving(
+        beam_path_snd):
+    snd = beam_path_snd
+    status = snd.set_beam_path('full snd')
+    assert len(status) == len(snd.beam_paths['full snd'])
+    kinds = [kind for kind, _ in snd.calls]
+    assert kinds == sorted(kinds)
+    assert snd.beam_path == 'full snd'
+    assert snd.t2.x.position == 10
+    assert snd.dcc.blocked is False
+    snd.set_beam_path('bypass')
+    assert snd.beam_path == 'bypass'
+    assert snd.t1.x.position == snd.t1.pos_removed
+
+
+def test_SplitAndDelay_set_beam_path_moves_nothing_if_a_check_fails(
+        beam_path_snd):
+    snd = beam_path_snd
+
+    def bad_check(position):
+        raise MotorDisabled("Disabled")
+    snd.t4.x.check_status = bad_check
+    with pytest.raises(MotorDisabled):
+        snd.set_beam_path('delay only')
+    assert not [kind for kind, _ in snd.calls if kind == 'move']
+    # Towers without a position for the state can't be used
+    snd.t2.pos_inserted = None
+    with pytest.raises(ValueError):
+        snd.set_beam_path('cc only')
+    with pytest.raises(ValueError):
+        snd.set_beam_path('sideways')
+
+
+def test_SplitAndDelay_only_has_beam_paths_with_positions(snd):
+    assert snd.t2.pos_inserted is None
+    assert set(snd.beam_paths) == {'bypass', 'delay only'}
+    snd.t2.pos_inserted = snd.t3.pos_inserted = 10
+    assert set(snd.update_beam_paths()) == {'cc only', 'full snd'}
+    assert set(snd.beam_paths) == set(SplitAndDelay.beam_paths)
+    assert snd.update_beam_paths() == []
+
+
+def test_SplitAndDelay_beam_paths_are_per_instance(beam_path_snd):
+    snd = beam_path_snd
+    snd.beam_paths['no t1'] = {'t1': 'removed'}
+    snd.beam_paths['bypass']['t1'] = 'inserted'
+    assert 'no t1' not in SplitAndDelay.beam_paths
+    assert SplitAndDelay.beam_paths['bypass']['t1'] == 'removed'
+
+
+def test_SplitAndDelay_beam_path_reads_each_motor_once(
+        beam_path_snd, monkeypatch):
+    snd = beam_path_snd
+    snd.set_beam_path('full snd')
+    reads = []
+
+    def position(self):
+        reads.append(self.name)
+        return self.user_readback.get()
+    for device in snd._towers + snd._diagnostics:
+        monkeypatch.setattr(type(device.x), 'position', property(position))
+    assert snd.beam_path == 'full snd'
+    assert sorted(reads) == sorted(set(reads))
+
+
+def test_linear_scan_checks_macro_motor_trajectories(snd, fresh_RE):
+    checked, moved = [], []
+
+    def check(E2, use_diag=True):
+        checked.append(E2)
+        if E2 > 8200:
+            raise LimitError("Beyond the limits")
+
+    def move(E2, diag_pos, use_diag=True):
+        moved.append(E2)
+        status = DeviceStatus(snd.E2)
+        status._finished()
+        return [status]
+    snd.E2._check_towers_and_diagnostics = check
+    snd.E2._move_towers_and_diagnostics = move
+
+    fresh_RE(linear_scan(snd.E2, 8000, 8200, 3, return_to_start=False))
+    assert checked[:3] == [8000, 8100, 8200]
+    assert moved == [8000, 8100, 8200]
+
+    # Nothing moves if any step of the trajectory is bad
+    moved.clear()
+    with pytest.raises(LimitError):
+        fresh_RE(linear_scan(snd.E2, 8000, 8400, 3, return_to_start=False))
+    assert not moved
@@ -2,6 +2,8 @@
 Tests for pyutils.pyutils
 """
 import logging
+import subprocess
+import sys
 from collections.abc import Iterable
 from math import isnan
 from pathlib import Path
@@ -76,3 +78,18 @@ def test_nan_if_no_parent_works_for_methods_and_properties():
     tst.parent = True
     assert tst.tst_property is True
     assert tst.tst_method() is True
+
+
+def test_import_times_reports_modules():
+    times = utils.import_times(["json", "not_a_real_module"])
+    assert list(times.keys()) == ["json", "not_a_real_module"]
+    assert times["json"] >= 0
+    assert isnan(times["not_a_real_module"])
+
+
+def test_importing_motors_does_not_import_heavy_dependencies():
+    code = ("import sys; import hxrsnd.sndsystem; "
+            "print(any(mod in sys.modules for mod in "
+            "['pandas', 'lmfit', 'pswalker.plans']))")
+    out = subprocess.check_output([sys.executable, "-c", code])
+    assert out.decode().strip() == "False"
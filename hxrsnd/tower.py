@@ -208,29 +208,78 @@ class TowerBase(SndDevice):
                 logger.error(err)
                 raise e
 
-    def stop(self):
+    def stop(self, success=False, timeout=1, print_status=False):
         """
-        Stops the motions of all the motors.
+        Stops the motions of all the motors at once.
+
+        Parameters
+        ----------
+        success : bool, optional
+            Unused, accepted so the tower can be stopped like any device.
+
+        timeout : float, optional
+            Time in seconds to wait for the motors to confirm the stop.
+
+        print_status : bool, optional
+            Print the motors that did not confirm the stop.
+
+        Returns
+        -------
+        confirmed : OrderedDict
+            Mapping of each motor name to whether it confirmed the stop.
         """
-        self._apply_all("stop", (AeroBase, EccBase), print_set=False)
+        return self._stop_motors(self._find_devices((AeroBase, EccBase)),
+                                 timeout=timeout, print_status=print_status)
 
-    def enable(self):
+    def enable(self, timeout=None):
         """
-        Enables all the aerotech motors.
+        Enables all the aerotech motors at once.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Time in seconds to wait for all the motors.
+
+        Returns
+        -------
+        failed : list
+            Names of the motors that did not enable.
         """
-        self._apply_all("enable", (AeroBase, EccBase), print_set=False)
+        return self._apply_all_at_once("enable", (AeroBase, EccBase),
+                                       timeout=timeout)
 
-    def disable(self):
+    def disable(self, timeout=None):
         """
-        Disables all the aerotech motors.
+        Disables all the aerotech motors at once.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Time in seconds to wait for all the motors.
+
+        Returns
+        -------
+        failed : list
+            Names of the motors that did not disable.
         """
-        self._apply_all("disable", (AeroBase, EccBase), print_set=False)
+        return self._apply_all_at_once("disable", (AeroBase, EccBase),
+                                       timeout=timeout)
 
-    def clear(self):
+    def clear(self, timeout=None):
         """
-        Disables all the aerotech motors.
+        Clears the errors of all the aerotech motors at once.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Time in seconds to wait for all the motors.
+
+        Returns
+        -------
+        failed : list
+            Names of the motors that did not clear.
         """
-        self._apply_all("clear", AeroBase, print_set=False)
+        return self._apply_all_at_once("clear", AeroBase, timeout=timeout)
 
     def status(self, status="", offset=0, print_status=True, newline=False,
                short=True):
@@ -3,6 +3,9 @@ Script for small utility functions used in HXRSnD
 """
 import inspect
 import logging
+import subprocess
+import sys
+from collections import OrderedDict
 from collections.abc import Iterable
 from functools import wraps
 from math import nan
@@ -185,3 +188,51 @@ def nan_if_no_parent(method):
         else:
             return nan
     return inner
+
+
+def import_times(modules=("hxrsnd", "hxrsnd.sndsystem", "snd_devices"),
+                 print_report=True):
+    """
+    Imports each of the inputted modules in a fresh interpreter and reports how
+    long each import took. Using a new interpreter for each module means the
+    times include everything the module pulls in, regardless of what has
+    already been imported in the current session.
+
+    Parameters
+    ----------
+    modules : iterable, optional
+        Names of the modules to time.
+
+    print_report : bool, optional
+        Print the table of import times.
+
+    Returns
+    -------
+    times : OrderedDict
+        Import time in seconds of each module. Modules that failed to import
+        are given a time of nan.
+    """
+    code = ("import time; t0 = time.perf_counter(); import {0}; "
+            "print(time.perf_counter() - t0)")
+    times = OrderedDict()
+    for module in as_list(modules):
+        try:
+            out = subprocess.check_output([sys.executable, "-c",
+                                           code.format(module)],
+                                          stderr=subprocess.DEVNULL)
+            times[module] = float(out.decode().strip().split("\n")[-1])
+        except (subprocess.CalledProcessError, ValueError):
+            logger.warning("Failed to import module '{0}'.".format(module))
+            times[module] = nan
+
+    # Build the report
+    report = "\n{0}{1:<30}|{2:^16}\n{3}{4}".format(
+        " "*2, "Module", "Import Time (s)", " "*2, "-"*47)
+    for module, tm in times.items():
+        report += "\n{0}{1:<30}|{2:^16.3f}".format(" "*2, module, tm)
+
+    if print_report:
+        logger.info(report)
+    else:
+        logger.debug(report)
+    return times
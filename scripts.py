@@ -22,16 +22,16 @@ it will pass.
 """
 # Imports from the Python standard library go here
 import logging
+from inspect import signature
 
 # Imports from the third-party modules go here
-import numpy as np
-from ophyd import Component as Cmp
-from ophyd import Device, EpicsSignal
+from bluesky import RunEngine
 from ophyd.sim import hw
-from ophyd.status import wait as status_wait
 
 # Imports from the HXRSnD module go here
 import snd_devices
+from hxrsnd.notepad import NotepadScanStatus
+from hxrsnd.plans.daq import daq_ascan
 
 # Imports from other SLAC modules go here
 
@@ -72,81 +72,26 @@ hw = hw()  # Fake hardware for testing
 fake_motor = hw.motor
 
 
-class NotepadScanStatus(Device):
-    istep = Cmp(EpicsSignal, ":ISTEP")
-    isscan = Cmp(EpicsSignal, ":ISSCAN")
-    nshots = Cmp(EpicsSignal, ":NSHOTS")
-    nsteps = Cmp(EpicsSignal, ":NSTEPS")
-    var0 = Cmp(EpicsSignal, ":SCANVAR00")
-    var1 = Cmp(EpicsSignal, ":SCANVAR01")
-    var2 = Cmp(EpicsSignal, ":SCANVAR02")
-    var0_max = Cmp(EpicsSignal, ":MAX00")
-    var1_max = Cmp(EpicsSignal, ":MAX01")
-    var2_max = Cmp(EpicsSignal, ":MAX02")
-    var0_min = Cmp(EpicsSignal, ":MIN00")
-    var1_min = Cmp(EpicsSignal, ":MIN01")
-    var2_min = Cmp(EpicsSignal, ":MIN02")
-
-    def clean_fields(self):
-        for sig_name in self.signal_names:
-            sig = getattr(self, sig_name)
-            val = sig.value
-            if isinstance(val, (int, float)):
-                sig.put(0)
-            elif isinstance(val, str):
-                sig.put('')
-
-
 notepad_scan_status = NotepadScanStatus('XCS:SCAN', name='xcs_scan_status')
 
 
 def ascan(motor, start, stop, num, events_per_point=360, record=False,
           controls=None, **kwargs):
     """
-    Quick re-implementation of old python for the transition
+    Runs :func:`hxrsnd.plans.daq.daq_ascan` with the session DAQ and the XCS
+    notepad PVs, returning the time spent at each step.
     """
-    daq = snd_devices.daq
-    events = events_per_point
-    status = notepad_scan_status
-    status.clean_fields()
-    if controls is None:
-        controls = {}
-    start_pos = motor.position
-
-    def get_controls(motor, extra_controls):
-        out_arr = {motor.name: motor}
-        out_arr.update(extra_controls)
-        return out_arr
-
-    try:
-        scan_controls = get_controls(motor, controls)
-        daq.configure(record=record, controls=scan_controls)
-
-        status.isscan.put(1)
-        status.nshots.put(events_per_point)
-        status.nsteps.put(num)
-        status.var0.put(motor.name)
-        status.var0_max.put(max((start, stop)))
-        status.var0_min.put(min((start, stop)))
-
-        for i, step in enumerate(np.linspace(start, stop, num)):
-            logger.info('Beginning step {}'.format(step))
-            try:
-                mstat = motor.set(step, verify_move=False, **kwargs)
-            except TypeError:
-                mstat = motor.set(step, **kwargs)
-            status.istep.put(i)
-            status_wait(mstat)
-            scan_controls = get_controls(motor, controls)
-            daq.begin(events=events, controls=scan_controls)
-            logger.info('Waiting for {} events ...'.format(events))
-            daq.wait()
-    finally:
-        logger.info('DONE!')
-        status.clean_fields()
-        daq.end_run()
-        daq.disconnect()
-        try:
-            motor.set(start_pos, verify_move=False, **kwargs)
-        except TypeError:
-            motor.set(start_pos, **kwargs)
+    RE = snd_devices.snd.RE or RunEngine({})
+    timing = []
+    # Don't prompt for confirmation at every step with the SnD motors
+    if 'verify_move' in signature(motor.set).parameters:
+        kwargs.setdefault('verify_move', False)
+
+    def plan():
+        timing.append((yield from daq_ascan(
+            snd_devices.daq, motor, start, stop, num,
+            events_per_point=events_per_point, record=record,
+            controls=controls, notepad=notepad_scan_status, **kwargs)))
+    RE(plan())
+    logger.info('DONE!')
+    return timing[0] if timing else None